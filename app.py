@@ -1,13 +1,21 @@
 import streamlit as st
 import sys
 import os
+import time
+from collections import namedtuple
 from datetime import datetime
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from summarizer import Policy_Summarizer
-from extractor import PolicyExtractor
-from database import init_db, save_policy_to_db, load_policies_from_db
+# Streamlit reruns this script on every interaction: keep module-level work
+# cheap and leave the model clients to load_models
+import telemetry
+from blob_store import get_blob_store
+from database import (init_db, save_policy_to_db, list_policies, get_policy_text, search_policies, purge_stale_analyses,
+                      list_policy_versions, get_policy_version)
+from fact_store import BOOLEAN_FACTS, CATEGORICAL_FACTS, get_fact_matrix
+from ingest import ingest_file
+from samples import available_samples, load_precomputed_analyses, sample_text
 
 # Page config
 st.set_page_config(
@@ -16,29 +24,42 @@ st.set_page_config(
     layout="wide"
 )
 
-policy_dir = "data/companies"
-
-# Dynamically generate available_policies from files in data/companies
-def get_available_policies():
-    policies = {}
-    for fname in os.listdir(policy_dir):
-        if fname.endswith('.txt'):
-            key = os.path.splitext(fname)[0].capitalize()
-            policies[key] = fname
-    return policies
-
-available_policies = get_available_policies()
-
 # Initialize models (cache them for performance)
 @st.cache_resource
 def load_models():
+    from summarizer import Policy_Summarizer
+    from extractor import PolicyExtractor
+    from pipeline import AnalysisPipeline
+
     summarizer = Policy_Summarizer()
     extractor = PolicyExtractor()
+    pipeline = AnalysisPipeline(summarizer, extractor)
     
-    return summarizer, extractor
+    return summarizer, extractor, pipeline
+
+# Initialize the database once per process, not on every rerun
+@st.cache_resource
+def setup_database():
+    from pipeline import PIPELINE_VERSION
 
-# Initialize database when the app starts
-init_db()
+    init_db()
+    removed = purge_stale_analyses(PIPELINE_VERSION)
+    matrix = get_fact_matrix()
+    if removed or matrix.stale:
+        matrix.rebuild(PIPELINE_VERSION)
+    load_precomputed_analyses()
+    return True
+
+setup_database()
+
+# Session state holds blob store keys, not policy texts or analyses, so a
+# session's memory does not grow with the size of the policies it opens
+SessionReport = namedtuple('SessionReport', ['website_name', 'date', 'policy_key', 'analysis_key'])
+
+def show_policy(policy_text, website_name):
+    """Puts a policy in the editor"""
+    st.session_state.current_policy_key = get_blob_store().put_text(policy_text or "")
+    st.session_state.current_website = website_name
 
 def save_policy(website_name, policy_text):
     """Save a policy to the database"""
@@ -50,22 +71,31 @@ def main():
     ### Your Personal Privacy Policy Assistant
     Paste privacy policies from websites you use to understand what data they collect and how they use it.
     """)
-    
-    # Load models
-    with st.spinner("Loading AI models..."):
-        summarizer, extractor= load_models()
 
     # Sidebar for sample policies
     st.sidebar.header("📚 Sample Policies")
+    available_policies = available_samples()
     selected_company = st.sidebar.selectbox(
         "Load a sample policy:", 
         ["None"] + list(available_policies.keys())
     )
 
-    if selected_company != "None":
-        with open(os.path.join(policy_dir, available_policies[selected_company]), "r", encoding="utf-8") as f:
-            st.session_state.current_policy = f.read()
-            st.session_state.current_website = selected_company
+    # Load the sample when the selection changes, not on every rerun
+    if selected_company != st.session_state.get('loaded_sample', "None"):
+        st.session_state.loaded_sample = selected_company
+        if selected_company != "None":
+            show_policy(sample_text(available_policies[selected_company]), selected_company)
+
+    # Sidebar for saved policies (texts are fetched only when one is opened)
+    st.sidebar.header("🗄️ Saved Policies")
+    search_query = st.sidebar.text_input("Search saved policies:", placeholder="e.g., retention, cookies")
+    saved_policies = search_policies(search_query) if search_query.strip() else list_policies(limit=10)
+    for saved in saved_policies:
+        if st.sidebar.button(f"🗂️ {saved['website_name']} ({saved['date']})", key=f"saved_{saved['website_name']}"):
+            show_policy(get_policy_text(saved['website_name']), saved['website_name'])
+            st.rerun()
+        if saved.get('snippet'):
+            st.sidebar.caption(saved['snippet'])
 
     # New: Sidebar for Recent Reports
     st.sidebar.header("📈 Recent Reports")
@@ -74,26 +104,62 @@ def main():
 
     if st.session_state.recent_reports:
         for i, report_entry in enumerate(st.session_state.recent_reports):
-            if st.sidebar.button(f"📄 {report_entry['website_name']} ({report_entry['date']})", key=f"recent_report_{i}"):
-                st.session_state.current_policy = report_entry['policy_text']
-                st.session_state.current_website = report_entry['website_name']
-                st.session_state.analysis_to_display = report_entry['full_analysis']
+            if st.sidebar.button(f"📄 {report_entry.website_name} ({report_entry.date})", key=f"recent_report_{i}"):
+                st.session_state.current_policy_key = report_entry.policy_key
+                st.session_state.current_website = report_entry.website_name
+                st.session_state.analysis_to_display = report_entry.analysis_key
                 st.rerun()
     else:
         st.sidebar.info("No recent reports. Analyze a policy to see it here!")
 
+    # Timing breakdown of the last analysis run in this session
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        if not telemetry.enabled():
+            st.caption("Telemetry is off (TELEMETRY=off).")
+        elif st.session_state.get('last_trace'):
+            last_trace = st.session_state.last_trace
+            st.markdown(f"**Last analysis:** {last_trace['duration_ms'] / 1000:.2f} s")
+            st.dataframe(
+                [{'Stage': row['stage'], 'Total (ms)': row['total_ms'], 'Calls': row['calls'],
+                  'Share': f"{row['share']:.0%}"} for row in last_trace['breakdown']],
+                hide_index=True, use_container_width=True
+            )
+            st.caption("Stages run concurrently, so shares can add up to more than 100%.")
+        else:
+            st.caption("Analyze a policy to see where the time goes.")
+        st.download_button("Metrics (Prometheus)", telemetry.export_prometheus(), file_name="metrics.prom")
+
     # Main interface
     st.subheader("📄 Privacy Policy")
+    uploaded = st.file_uploader("Upload a policy page (HTML, PDF or text):", type=["html", "htm", "pdf", "txt"])
+    # Ingest an upload once, not on every rerun; navigation, banners and repeated headers are stripped
+    if uploaded is not None and (uploaded.name, uploaded.size) != st.session_state.get('loaded_upload'):
+        st.session_state.loaded_upload = (uploaded.name, uploaded.size)
+        ingested = ingest_file(uploaded, filename=uploaded.name)
+        show_policy(ingested.text, st.session_state.get('current_website') or os.path.splitext(uploaded.name)[0])
+        st.caption(f"📥 {uploaded.name}: {ingested.source_bytes / 1024:.0f} KB of {ingested.source_format.upper()} "
+                   f"→ {len(ingested.text) / 1024:.0f} KB of text in {len(ingested.paragraphs)} paragraphs, "
+                   f"{ingested.dropped_blocks} boilerplate blocks removed")
     website_name = st.text_input("Website Name:", 
                                  value=st.session_state.get('current_website', ''),
                                  placeholder="e.g., Facebook, Google, etc.")
     policy_text = st.text_area(
         "Paste the privacy policy here:",
-        value=st.session_state.get('current_policy', ''),
+        value=get_blob_store().get_text(st.session_state.get('current_policy_key')) or '',
         height=300,
         placeholder="Copy and paste the privacy policy text here..."
     )
     
+    # Earlier saved versions of this website's policy
+    versions = list_policy_versions(website_name) if website_name else []
+    if len(versions) > 1:
+        with st.expander(f"🕓 Version history ({len(versions)} versions)"):
+            for version in versions:
+                label = f"v{version['version']} - {version['date']} ({version['stored_bytes'] / 1024:.1f} KB stored)"
+                if st.button(label, key=f"version_{version['version']}"):
+                    show_policy(get_policy_version(website_name, version['version']), website_name)
+                    st.rerun()
+
     col1, col2 = st.columns([1, 1])
     with col1:
         if st.button("💾 Save Policy", type="secondary", use_container_width=True):
@@ -109,7 +175,7 @@ def main():
     st.markdown("<hr style='height:1px;border:none;color:#333;background-color:#333;' />", unsafe_allow_html=True)
 
     if st.button("🔄 Reset/Clear Input", use_container_width=True):
-        st.session_state.current_policy = ""
+        st.session_state.current_policy_key = None
         st.session_state.current_website = ""
         if 'analysis_to_display' in st.session_state:
             del st.session_state.analysis_to_display
@@ -124,103 +190,219 @@ def main():
         if website_name and policy_text:
             save_policy(website_name, policy_text)
 
-        with st.spinner("Analyzing policy(May take 30 seconds for large files as we are using small model)..."):
-            # Generate summary
-            summary = summarizer.summarize_policy(policy_text)
-            
-            # Extract key information
-            extracted_facts = extractor.extract_facts(policy_text)
-
-            # Store full analysis results in session state for re-display
-            full_analysis_results = {
-                'summary': summary,
-                'extracted_facts': extracted_facts
-            }
-            st.session_state.analysis_to_display = full_analysis_results
-
-            # Add to recent reports (temporary, session-based)
-            if 'recent_reports' not in st.session_state:
-                st.session_state.recent_reports = []
-
-            # Add to the beginning of the list for most recent at top
-            st.session_state.recent_reports.insert(0, {
-                'website_name': website_name if website_name else "Unnamed Policy",
-                'date': datetime.now().strftime("%H:%M:%S"), # Use HH:MM:SS for brevity
-                'policy_text': policy_text, 
-                'full_analysis': full_analysis_results 
-            })
-            # Limit recent reports to a reasonable number, e.g., 5
-            st.session_state.recent_reports = st.session_state.recent_reports[:5]
+        # Models load on the first analysis, so the page itself renders without them
+        with st.spinner("Loading AI models..."):
+            summarizer, extractor, pipeline = load_models()
+
+        # Results fill in as they arrive. Any click or edit reruns the script, which
+        # closes the stream and cancels the model calls still queued or retrying.
+        st.button("⏹️ Cancel analysis")
+        status = st.empty()
+        live = st.empty()
+        started = time.perf_counter()
+        first_result = None
+        events = pipeline.stream(policy_text, website_name=website_name or None)
+        try:
+            with telemetry.trace("ui:analyze") as analysis_trace:
+                for event in events:
+                    if first_result is None:
+                        first_result = time.perf_counter() - started
+                    pending = event.analysis.get('pending')
+                    if pending:
+                        status.info(f"⏳ First results in {first_result * 1000:.0f} ms - still working on: {', '.join(pending)}")
+                    with live.container():
+                        render_analysis(event.analysis)
+        finally:
+            events.close()
+        status.empty()
+        live.empty()
+        full_analysis_results = event.analysis
+        st.session_state.last_trace = analysis_trace.to_dict() if analysis_trace else None
+        st.session_state.analysis_timing = {
+            'first_result_ms': first_result * 1000,
+            'total_s': time.perf_counter() - started,
+        }
+        if full_analysis_results.get('timed_out'):
+            st.warning(f"⏱️ Time limit reached - showing partial results. Unfinished: {', '.join(full_analysis_results['timed_out'])}")
+        if full_analysis_results.get('from_store'):
+            st.info(f"⚡ Loaded saved analysis of this policy in {(time.perf_counter() - started) * 1000:.0f} ms")
+        elif full_analysis_results.get('similar_to'):
+            st.info(f"🧬 Near-duplicate of an analyzed policy ({full_analysis_results['similar_to']['similarity']:.0%} similar): "
+                    f"reused {full_analysis_results['reused_tasks']} unchanged parts")
+        elif full_analysis_results.get('reused_tasks'):
+            st.info(f"♻️ Reused {full_analysis_results['reused_tasks']} unchanged parts from the previous version")
+
+        # Keep only the blob store key of the results in session state for re-display
+        stored_analysis = {k: v for k, v in full_analysis_results.items() if k != 'from_store'}
+        analysis_key = get_blob_store().put_json(stored_analysis)
+        st.session_state.analysis_to_display = analysis_key
+
+        # Add to recent reports (temporary, session-based)
+        if 'recent_reports' not in st.session_state:
+            st.session_state.recent_reports = []
+
+        # Add to the beginning of the list for most recent at top
+        st.session_state.recent_reports.insert(0, SessionReport(
+            website_name if website_name else "Unnamed Policy",
+            datetime.now().strftime("%H:%M:%S"), # Use HH:MM:SS for brevity
+            get_blob_store().put_text(policy_text),
+            analysis_key
+        ))
+        # Limit recent reports to a reasonable number, e.g., 5
+        st.session_state.recent_reports = st.session_state.recent_reports[:5]
 
     # Display analysis results if available in session state
     if 'analysis_to_display' in st.session_state:
-        display_results = st.session_state.analysis_to_display
-        extracted_facts_display = display_results['extracted_facts']
-
-        with st.expander("📝 Policy Summary", expanded=True):
-            st.markdown(display_results['summary'])
-            
-        # Display critical information
-        st.subheader("⚠️ Critical Information")
-        
-        # Create three columns for different types of information
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown("#### 📊 Data Collection")
-            if extracted_facts_display.get('collects_emails'):
-                st.warning("This website collects email addresses")
-            if extracted_facts_display.get('uses_tracking'):
-                st.warning("This website uses tracking/analytics")
-            if extracted_facts_display.get('collects_location'):
-                st.warning("This website collects location data")
-        
-        with col2:
-            st.markdown("#### 🤝 Data Sharing")
-            if extracted_facts_display.get('shares_data'):
-                st.error("This website shares data with third parties")
-            
-            st.markdown("#### ⏳ Data Retention")
-            retention = extracted_facts_display.get('retention_duration', 'unknown')
-            display_retention = retention if retention != 'unknown' else 'not mentioned in policy'
-            st.markdown(f"<div style='background-color:#B22222;padding:10px;border-radius:5px;color:#FFFFFF;'><b>Data is retained for:</b> {display_retention}</div>", unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown("#### 👤 Your Rights")
-            if extracted_facts_display.get('right_to_delete'):
-                st.success("You have the right to request data deletion")
-            if extracted_facts_display.get('right_to_access'):
-                st.success("You have the right to access your data")
-            if extracted_facts_display.get('data_portability'):
-                st.success("You have the right to export your data")
-            if extracted_facts_display.get('right_to_correction'):
-                st.success("You have the right to correct your data")
-        
-        # Detailed Analysis
-        st.subheader("🔍 Detailed Analysis")
-        col1, col2 = st.columns(2)
+        timing = st.session_state.get('analysis_timing')
+        if timing:
+            st.caption(f"⏱️ First results in {timing['first_result_ms']:.0f} ms, complete in {timing['total_s']:.1f} s")
+        displayed_analysis = get_blob_store().get_json(st.session_state.analysis_to_display)
+        if displayed_analysis is not None:
+            render_analysis(displayed_analysis)
+        else:
+            st.info("This report has expired from the server's cache. Analyze the policy again to see it.")
+
+    render_comparison()
+
+def render_analysis(display_results):
+    """Renders an analysis; pieces still being computed show as pending."""
+    extracted_facts_display = display_results['extracted_facts']
+
+    with st.expander("📝 Policy Summary", expanded=True):
+        st.markdown(display_results['summary'] or "⏳ Summarizing...")
         
-        with col1:
-            st.markdown("#### Data Collection & Usage")
-            for k, v in extracted_facts_display.items():
-                if k in ['collects_emails', 'uses_tracking', 'collects_location', 'shares_data']:
-                    if v is True:
-                        st.markdown(f"✅ {k.replace('_', ' ').title()}")
-                    elif v is False:
-                        st.markdown(f"❌ {k.replace('_', ' ').title()}")
-                    elif v != "unknown":
-                        st.markdown(f"ℹ️ {k.replace('_', ' ').title()}: {v}")
+    # Display critical information
+    st.subheader("⚠️ Critical Information")
+    
+    # Create three columns for different types of information
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown("#### 📊 Data Collection")
+        if extracted_facts_display.get('collects_emails'):
+            st.warning("This website collects email addresses")
+        if extracted_facts_display.get('uses_tracking'):
+            st.warning("This website uses tracking/analytics")
+        if extracted_facts_display.get('collects_location'):
+            st.warning("This website collects location data")
+    
+    with col2:
+        st.markdown("#### 🤝 Data Sharing")
+        if extracted_facts_display.get('shares_data'):
+            st.error("This website shares data with third parties")
         
-        with col2:
-            st.markdown("#### User Rights & Controls")
-            for k, v in extracted_facts_display.items():
-                if k in ['right_to_delete', 'right_to_access', 'data_portability', 'right_to_correction', 'opt_out_rights']:
-                    if v is True:
-                        st.markdown(f"✅ {k.replace('_', ' ').title()}")
-                    elif v is False:
-                        st.markdown(f"❌ {k.replace('_', ' ').title()}")
-                    elif v != "unknown":
-                        st.markdown(f"ℹ️ {k.replace('_', ' ').title()}: {v}")
+        st.markdown("#### ⏳ Data Retention")
+        retention = extracted_facts_display.get('retention_duration', 'unknown')
+        display_retention = retention if retention != 'unknown' else 'not mentioned in policy'
+        st.markdown(f"<div style='background-color:#B22222;padding:10px;border-radius:5px;color:#FFFFFF;'><b>Data is retained for:</b> {display_retention}</div>", unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown("#### 👤 Your Rights")
+        if extracted_facts_display.get('right_to_delete'):
+            st.success("You have the right to request data deletion")
+        if extracted_facts_display.get('right_to_access'):
+            st.success("You have the right to access your data")
+        if extracted_facts_display.get('data_portability'):
+            st.success("You have the right to export your data")
+        if extracted_facts_display.get('right_to_correction'):
+            st.success("You have the right to correct your data")
+    
+    # Detailed Analysis
+    st.subheader("🔍 Detailed Analysis")
+    fact_tiers = extracted_facts_display.get('fact_tiers')
+    if fact_tiers:
+        st.caption("Answered by: " + ", ".join(
+            f"{k.replace('_', ' ')} ({tier})" for k, tier in fact_tiers.items()
+        ))
+    fact_status = extracted_facts_display.get('fact_status') or {}
+    for status, label in (('pending', "⏳ Still being analyzed, keyword answer shown"),
+                          ('timed_out', "⏱️ Timed out, keyword answer shown"), ('fallback', "↩️ Keyword fallback")):
+        facts = [k.replace('_', ' ') for k, v in fact_status.items() if v == status]
+        if facts:
+            st.caption(f"{label}: {', '.join(facts)}")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("#### Data Collection & Usage")
+        for k, v in extracted_facts_display.items():
+            if k in ['collects_emails', 'uses_tracking', 'collects_location', 'shares_data']:
+                if v is True:
+                    st.markdown(f"✅ {k.replace('_', ' ').title()}")
+                elif v is False:
+                    st.markdown(f"❌ {k.replace('_', ' ').title()}")
+                elif v != "unknown":
+                    st.markdown(f"ℹ️ {k.replace('_', ' ').title()}: {v}")
+    
+    with col2:
+        st.markdown("#### User Rights & Controls")
+        for k, v in extracted_facts_display.items():
+            if k in ['right_to_delete', 'right_to_access', 'data_portability', 'right_to_correction', 'opt_out_rights']:
+                if v is True:
+                    st.markdown(f"✅ {k.replace('_', ' ').title()}")
+                elif v is False:
+                    st.markdown(f"❌ {k.replace('_', ' ').title()}")
+                elif v != "unknown":
+                    st.markdown(f"ℹ️ {k.replace('_', ' ').title()}: {v}")
+
+    fact_evidence = extracted_facts_display.get('fact_evidence')
+    if fact_evidence:
+        with st.expander("🔎 Evidence"):
+            for k, spans in fact_evidence.items():
+                st.markdown(f"**{k.replace('_', ' ').title()}**")
+                for span in spans:
+                    st.caption(span['text'])
+
+@st.cache_data(max_entries=64)
+def compare_policies(matrix_version, conditions):
+    """(matching count, first 200 matches, totals, query ms) for the matrix at `matrix_version`."""
+    matrix = get_fact_matrix()
+    conditions = dict(conditions)
+    started = time.perf_counter()
+    total = matrix.count(**conditions)
+    matches = matrix.where(limit=200, **conditions)
+    totals = matrix.aggregate(**conditions)
+    return total, matches, totals, (time.perf_counter() - started) * 1000
+
+def render_comparison():
+    """Filters and aggregates the facts of every analyzed policy."""
+    matrix = get_fact_matrix()
+    with st.expander(f"📊 Compare analyzed policies ({len(matrix)})"):
+        if not len(matrix):
+            st.caption("Analyze some policies to compare them here.")
+            return
+        choices = {"Any": None, "Yes": [True], "No or not stated": [False, None], "No": [False], "Not stated": [None]}
+        conditions = {}
+        filter_columns = st.columns(3)
+        for i, fact in enumerate(BOOLEAN_FACTS):
+            choice = filter_columns[i % 3].selectbox(fact.replace('_', ' ').title(), list(choices), key=f"compare_{fact}")
+            if choices[choice] is not None:
+                conditions[fact] = tuple(choices[choice])
+
+        # Reruns that change neither the filters nor the matrix reuse the last result
+        total, matches, totals, query_ms = compare_policies(matrix.version, tuple(sorted(conditions.items())))
+        st.caption(f"{total} of {len(matrix)} policies match ({query_ms:.1f} ms)")
+
+        marks = {True: "✅", False: "❌", None: "—"}
+        st.dataframe(
+            [dict({'Policy': row['website_name'] or row['content_hash'][:12]},
+                  **{fact.replace('_', ' ').title(): marks[row[fact]] for fact in BOOLEAN_FACTS},
+                  **{fact.replace('_', ' ').title(): row[fact] or "—" for fact in CATEGORICAL_FACTS})
+             for row in matches],
+            hide_index=True, use_container_width=True
+        )
+        if total > len(matches):
+            st.caption(f"Showing the first {len(matches)}.")
+
+        st.markdown("#### Across the matching policies")
+        st.dataframe(
+            [{'Fact': fact.replace('_', ' ').title(), 'Yes': totals[fact].get(True, 0),
+              'No': totals[fact].get(False, 0), 'Not stated': totals[fact].get(None, 0)} for fact in BOOLEAN_FACTS],
+            hide_index=True, use_container_width=True
+        )
+        for fact in CATEGORICAL_FACTS:
+            counts = sorted(((value, n) for value, n in totals[fact].items() if value is not None), key=lambda item: -item[1])
+            if counts:
+                st.caption(f"{fact.replace('_', ' ').title()}: " + ", ".join(f"{value} ({n})" for value, n in counts[:8]))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,216 @@
+"""
+Measures app.py's cold start and the work repeated on every Streamlit rerun.
+
+Streamlit itself isn't needed: the script's module-level and per-rerun work
+is replayed outside it, before (every rerun initializes the database, lists
+data/companies and reads the selected sample; models import at startup) and
+after (database set up once per process, samples memoized by mtime, model
+modules imported on the first analysis). That comparison covers the sample
+listing and database setup only.
+
+The whole data path of a rerun that shows an analysis is timed step by step
+as well: sample listing, saved-policy list or search, the editor's and the
+displayed analysis' blob store reads, version history, the metrics export
+and the comparison view, queried afresh and from a cache keyed on the matrix
+version as app.py's st.cache_data does. Streamlit's own rendering is not
+included.
+
+Also builds a precomputed-analysis file for the samples with cli.py against
+the mock inference server and reports how long loading it takes and what
+analyzing a sample costs afterwards.
+
+Usage: python benchmarks/bench_app_startup.py [--reruns 200]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+COLD_START_BEFORE = """
+import telemetry
+from summarizer import Policy_Summarizer
+from extractor import PolicyExtractor
+from pipeline import AnalysisPipeline, PIPELINE_VERSION
+from database import init_db, purge_stale_analyses
+init_db()
+purge_stale_analyses(PIPELINE_VERSION)
+"""
+
+COLD_START_AFTER = """
+import telemetry
+from database import init_db, purge_stale_analyses
+from fact_store import get_fact_matrix
+from samples import available_samples, load_precomputed_analyses, sample_text
+from pipeline import PIPELINE_VERSION
+init_db()
+removed = purge_stale_analyses(PIPELINE_VERSION)
+matrix = get_fact_matrix()
+if removed or matrix.stale:
+    matrix.rebuild(PIPELINE_VERSION)
+load_precomputed_analyses()
+"""
+
+
+def cold_start(code, env, runs):
+    """Median seconds for a fresh interpreter to run `code`, minus a bare interpreter's start."""
+    def timed(source):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import sys; sys.path.append({os.path.join(ROOT, 'src')!r})\n{source}"],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - start
+    baseline = statistics.median(timed("pass") for _ in range(runs))
+    return statistics.median(timed(code) for _ in range(runs)) - baseline
+
+
+def rerun_before(sample):
+    from database import init_db, purge_stale_analyses
+    from pipeline import PIPELINE_VERSION
+
+    init_db()
+    purge_stale_analyses(PIPELINE_VERSION)
+    policies = {os.path.splitext(fname)[0].capitalize(): fname
+                for fname in os.listdir(POLICY_DIR) if fname.endswith('.txt')}
+    with open(os.path.join(POLICY_DIR, policies[sample]), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def rerun_after(sample):
+    from samples import available_samples, sample_text
+
+    return sample_text(available_samples(POLICY_DIR)[sample])
+
+
+def rerun_steps(session, search_query=""):
+    """(step, fn) pairs replaying the data work of one app.py rerun that shows an analysis."""
+    import telemetry
+    from blob_store import get_blob_store
+    from database import list_policies, list_policy_versions, search_policies
+    from fact_store import get_fact_matrix
+    from samples import available_samples
+
+    def compare_uncached():
+        matrix = get_fact_matrix()
+        return matrix.count(), matrix.where(limit=200), matrix.aggregate()
+
+    # Stands in for st.cache_data, which also stores pickled results and unpickles them on a hit
+    comparisons = {}
+
+    def compare_cached():
+        matrix = get_fact_matrix()
+        key = (matrix.version, ())
+        if key not in comparisons:
+            comparisons[key] = pickle.dumps(compare_uncached())
+        return len(matrix), pickle.loads(comparisons[key])
+
+    return [
+        ("sample listing", lambda: available_samples(POLICY_DIR)),
+        ("saved policies", lambda: search_policies(search_query) if search_query.strip() else list_policies(limit=10)),
+        ("editor text", lambda: get_blob_store().get_text(session['policy_key'])),
+        ("version history", lambda: list_policy_versions(session['website_name'])),
+        ("metrics export", telemetry.export_prometheus),
+        ("displayed analysis", lambda: get_blob_store().get_json(session['analysis_key'])),
+        ("comparison, uncached", compare_uncached),
+        ("comparison, cached", compare_cached),
+    ]
+
+
+def per_call(fn, arg, reruns):
+    fn(arg)
+    start = time.perf_counter()
+    for _ in range(reruns):
+        fn(arg)
+    return (time.perf_counter() - start) / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=200, help="reruns to average the per-rerun cost over")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh interpreters per cold start measurement")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, POLICY_DB_PATH=os.path.join(tmp, "cold.db"), INFERENCE_CACHE="off")
+    os.environ.update(POLICY_DB_PATH=os.path.join(tmp, "policies.db"), INFERENCE_CACHE="off")
+
+    before_cold = cold_start(COLD_START_BEFORE, env, args.cold_runs)
+    after_cold = cold_start(COLD_START_AFTER, env, args.cold_runs)
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        import database
+        database.init_db()
+        sample = sorted(os.path.splitext(f)[0].capitalize() for f in os.listdir(POLICY_DIR) if f.endswith('.txt'))[0]
+        before_rerun = per_call(rerun_before, sample, args.reruns)
+        after_rerun = per_call(rerun_after, sample, args.reruns)
+
+        artifact = os.path.join(tmp, "sample_analyses.jsonl")
+        with MockInferenceServer(latency=0.1) as mock:
+            os.environ["HF_API_URL"] = mock.url
+            subprocess.run([sys.executable, os.path.join(ROOT, "cli.py"), POLICY_DIR, "--no-store",
+                            "--output", artifact, "--checkpoint", artifact + ".checkpoint"],
+                           env=dict(env, HF_API_URL=mock.url), check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            from extractor import PolicyExtractor
+            from pipeline import AnalysisPipeline
+            from samples import available_samples, load_precomputed_analyses, sample_text
+            from summarizer import Policy_Summarizer
+
+            pipeline = AnalysisPipeline(Policy_Summarizer(), PolicyExtractor())
+            text = sample_text(available_samples(POLICY_DIR)[sample])
+            mock.reset_stats()
+            start = time.perf_counter()
+            pipeline.analyze(text)
+            fresh, fresh_requests = time.perf_counter() - start, mock.total_requests
+            database.get_connection().execute("DELETE FROM analyses")
+
+            start = time.perf_counter()
+            loaded = load_precomputed_analyses(artifact)
+            load_time = time.perf_counter() - start
+            mock.reset_stats()
+            start = time.perf_counter()
+            analysis = pipeline.analyze(text)
+            precomputed, precomputed_requests = time.perf_counter() - start, mock.total_requests
+
+            # A session showing that analysis of a policy with a few saved versions
+            from blob_store import get_blob_store
+            from fact_store import get_fact_matrix
+            for revision in range(3):
+                database.save_policy_to_db(sample, text + "\n" * revision)
+            session = {'website_name': sample, 'policy_key': get_blob_store().put_text(text),
+                       'analysis_key': get_blob_store().put_json({k: v for k, v in analysis.items() if k != 'from_store'})}
+            steps = [(step, per_call(lambda fn: fn(), fn, args.reruns)) for step, fn in rerun_steps(session)]
+            search = per_call(lambda fn: fn(), rerun_steps(session, "retention cookies")[1][1], args.reruns)
+            matrix_rows = len(get_fact_matrix())
+    finally:
+        sys.stdout = stdout
+
+    print(f"cold start (imports + database setup, median of {args.cold_runs}): "
+          f"{before_cold * 1000:.0f} ms -> {after_cold * 1000:.0f} ms")
+    print(f"sample listing and database setup per rerun (mean of {args.reruns}): "
+          f"{before_rerun * 1e6:.0f} us -> {after_rerun * 1e6:.1f} us")
+    print(f"\nrerun data path showing an analysis (mean of {args.reruns}; {matrix_rows} policies in the fact matrix):")
+    for step, seconds in steps:
+        print(f"  {step:<22}{seconds * 1e6:>10.1f} us")
+    print(f"  {'saved policies search':<22}{search * 1e6:>10.1f} us (instead of the list when the sidebar search is used)")
+    shared = sum(seconds for step, seconds in steps if not step.startswith("comparison"))
+    cached, uncached = (dict(steps)[f"comparison, {kind}"] for kind in ("cached", "uncached"))
+    print(f"  {'total':<22}{(shared + uncached) * 1e6:>10.1f} us with the comparison uncached, "
+          f"{(shared + cached) * 1e6:.1f} us cached")
+    print(f"precomputed analyses: {loaded} loaded in {load_time * 1000:.1f} ms; analyzing {sample} "
+          f"{fresh:.2f} s / {fresh_requests} requests -> {precomputed * 1000:.1f} ms / {precomputed_requests} requests "
+          f"(from_store={analysis['from_store']})")
+
+
+if __name__ == "__main__":
+    main()
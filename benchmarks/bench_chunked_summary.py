@@ -0,0 +1,58 @@
+"""
+Map-reduce summarization on the bundled policies.
+
+Reports how many summarization calls each policy needs with chunking, then
+edits one paragraph of a policy and shows that re-summarizing it only sends
+the chunks on the edited branch to the (mock) API; the rest come from the
+inference cache.
+
+Usage: python benchmarks/bench_chunked_summary.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, MockInferenceServer() as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import inference_cache
+        from chunking import split_into_chunks
+        from summarizer import Policy_Summarizer
+        inference_cache._default_cache = inference_cache.InferenceCache(path=os.path.join(tmp, "cache.db"))
+        summarizer = Policy_Summarizer()
+
+        print(f"\n{'document':<18}{'chars':>8}{'chunks':>8}{'calls':>7}")
+        for fname in sorted(os.listdir(POLICY_DIR)):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                text = f.read()
+            mock.reset_stats()
+            summarizer.summarize_text(text)
+            print(f"{fname:<18}{len(text):>8}{len(split_into_chunks(text)):>8}{mock.total_requests:>7}")
+
+        with open(os.path.join(POLICY_DIR, "aws.txt"), "r", encoding="utf-8") as f:
+            text = f.read()
+        lines = text.split("\n")
+        middle = len(lines) // 2
+        lines[middle] = lines[middle] + " We may update this paragraph from time to time."
+        edited = "\n".join(lines)
+
+        before, after = split_into_chunks(text), split_into_chunks(edited)
+        changed = len(set(after) - set(before))
+        mock.reset_stats()
+        summarizer.summarize_text(edited)
+        print(f"\naws.txt with one paragraph edited: {changed}/{len(after)} chunks changed, "
+              f"{mock.total_requests} API calls (cold run of the same text needs "
+              f"{len(after)} + reduce calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures what the local rule tier saves in extract_facts.
+
+Runs extract_facts over the bundled policies twice against the mock
+inference server: remote-only (threshold above 1, every fact goes to the
+models) and with the default cascade. Reports requests, KB sent and time per
+document, which tier answered each classified fact, and how many final facts
+differ between the two runs. The mock charges latency per zero-shot label,
+like the real model, so fewer undecided facts make a faster request. The
+mock's zero-shot scores are synthetic, so agreement here says nothing about
+accuracy against the real model.
+
+Usage: python benchmarks/bench_classifier_cascade.py [--latency 0.2] [--threshold 0.85]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def run(mock, extractor, text):
+    from extractor import NLP_CATEGORIES
+
+    mock.reset_stats()
+    start = time.perf_counter()
+    facts = extractor.extract_facts(text)
+    elapsed = time.perf_counter() - start
+    requests, sent = mock.total_requests, mock.bytes_received
+    tiers = {key: facts['fact_tiers'][key] for key in list(NLP_CATEGORIES) + ['retention_duration']}
+    return facts, tiers, requests, sent, elapsed
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds per request")
+    parser.add_argument("--latency-per-label", type=float, default=0.1, help="mock seconds per zero-shot label")
+    parser.add_argument("--threshold", type=float, default=None, help="local confidence threshold (default: LOCAL_CONFIDENCE_THRESHOLD)")
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+
+    with MockInferenceServer(latency=args.latency, latency_per_label=args.latency_per_label) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import extractor as extractor_module
+        threshold = extractor_module.LOCAL_CONFIDENCE_THRESHOLD if args.threshold is None else args.threshold
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            remote_only = extractor_module.PolicyExtractor(threshold=1.01)
+            cascade = extractor_module.PolicyExtractor(threshold=threshold)
+            rows = []
+            for fname in sorted(os.listdir(POLICY_DIR)):
+                with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                    text = f.read()
+                rows.append((fname, run(mock, remote_only, text), run(mock, cascade, text)))
+        finally:
+            sys.stdout = stdout
+
+    print(f"threshold {threshold}, mock latency {args.latency:.2f}s per request "
+          f"+ {args.latency_per_label:.2f}s per zero-shot label\n")
+    print(f"{'document':<18}{'requests':>14}{'KB sent':>18}{'seconds':>16}{'local facts':>13}{'differ':>8}")
+    totals = Counter()
+    tier_counts = Counter()
+    for fname, (remote_facts, _, remote_requests, remote_bytes, remote_time), \
+            (facts, tiers, requests, sent, elapsed) in rows:
+        classified = list(tiers)
+        local = sum(1 for tier in tiers.values() if tier == "rules")
+        tier_counts.update(tiers.values())
+        differ = sum(1 for key in remote_facts if not key.startswith('fact_') and remote_facts[key] != facts.get(key))
+        totals.update(remote_requests=remote_requests, requests=requests, remote_time=remote_time, elapsed=elapsed,
+                      local=local, classified=len(classified), differ=differ)
+        print(f"{fname:<18}{remote_requests:>6} -> {requests:<5}{remote_bytes / 1024:>8.1f} -> {sent / 1024:<6.1f}"
+              f"{remote_time:>7.2f} -> {elapsed:<5.2f}{local:>7}/{len(classified):<5}{differ:>8}")
+
+    print(f"\nrequests: {totals['remote_requests']} -> {totals['requests']} "
+          f"({(1 - totals['requests'] / totals['remote_requests']) * 100:.0f}% saved)")
+    print(f"time: {totals['remote_time']:.2f}s -> {totals['elapsed']:.2f}s")
+    print(f"facts answered locally: {totals['local']}/{totals['classified']}; by tier: {dict(tier_counts)}")
+    print(f"final facts differing from remote-only: {totals['differ']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Policy store at scale: saves thousands of synthetic policies into a scratch
+database, then times paginated metadata listing, lazy text fetch and
+full-text search.
+
+Usage: python benchmarks/bench_database.py [--policies 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def timed(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:<34}{(time.perf_counter() - start) / repeat * 1000:>9.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policies", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["POLICY_DB_PATH"] = os.path.join(tmp, "policies.db")
+        import database
+        database.init_db()
+
+        corpus = []
+        for fname in sorted(os.listdir(POLICY_DIR)):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                corpus.append(f.read())
+
+        start = time.perf_counter()
+        conn = database.get_connection()
+        with database._lock:
+            for i in range(args.policies):
+                conn.execute(
+                    "INSERT INTO policies (website_name, policy_text, date_saved) VALUES (?, ?, ?)",
+                    (f"site-{i:06d}", corpus[i % len(corpus)] + f"\nContact privacy@site-{i:06d}.example", f"2026-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}")
+                )
+            conn.commit()
+        print(f"inserted {args.policies} policies in {time.perf_counter() - start:.1f}s")
+
+        timed("save_policy_to_db (upsert)", lambda: database.save_policy_to_db("site-000001", corpus[0]), repeat=5)
+        timed("list_policies (page of 50)", lambda: database.list_policies(limit=50, offset=1000))
+        timed("get_policy_text", lambda: database.get_policy_text("site-004242"))
+        hits = timed("search_policies('retention law')", lambda: database.search_policies("retention law"))
+        timed("search_policies('site-004242')", lambda: database.search_policies("site-004242"))
+        timed("load_policies_from_db (everything)", database.load_policies_from_db, repeat=1)
+        print(f"top hit: {hits[0]['website_name']} - {hits[0]['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
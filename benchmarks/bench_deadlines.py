@@ -0,0 +1,129 @@
+"""
+Measures analysis tail latency with hedged requests and a deadline.
+
+Runs --analyses analyses of the bundled policies, --concurrency at a time,
+against a mock inference server whose latency is jittered and where a small
+fraction of requests stall for --stall seconds (a hung call). Three setups,
+each on a fresh gateway warmed up with one pass over the policies so hedge
+delays come from observed latencies:
+
+- baseline: no hedging, no deadline
+- hedged: calls slower than the model's p95 get a duplicate request
+- hedged + deadline: also returns partial results after --deadline seconds
+
+Reports p50/p95/p99/max analysis time, requests sent, hedges, and the status
+of every extracted fact (complete, fallback or timed out).
+
+Usage: python benchmarks/bench_deadlines.py [--analyses 48] [--deadline 2.0] [--stall 5.0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def counter(name):
+    import telemetry
+    return sum(c['value'] for c in telemetry.metrics.snapshot()['counters'] if c['name'] == name)
+
+
+def run_setup(mock, texts, args, hedge_quantile, deadline):
+    import database
+    import telemetry
+    from extractor import PolicyExtractor
+    from inference_client import InferenceClient
+    from inference_gateway import InferenceGateway
+    from pipeline import AnalysisPipeline
+    from summarizer import Policy_Summarizer
+
+    client = InferenceClient(api_url=mock.url, backoff_base=0.01, backoff_cap=0.05)
+    gateway = InferenceGateway(client, hedge_quantile=hedge_quantile)
+    summarizer, extractor = Policy_Summarizer(), PolicyExtractor()
+    summarizer.client = extractor.client = gateway
+    pipeline = AnalysisPipeline(summarizer, extractor, similarity_threshold=None, deadline=deadline)
+
+    def analyze(i):
+        # A distinct first line per analysis, so no analysis is loaded from the store
+        text = f"Policy copy {i}\n{texts[i % len(texts)]}"
+        start = time.perf_counter()
+        analysis = pipeline.analyze(text)
+        return time.perf_counter() - start, analysis
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(analyze, range(-len(texts), 0)))
+        mock.reset_stats()
+        telemetry.metrics.reset()
+        outcomes = list(pool.map(analyze, range(args.analyses)))
+    database.get_connection().execute("DELETE FROM analyses")
+    statuses = Counter(status for _, analysis in outcomes
+                       for status in analysis['extracted_facts'].get('fact_status', {}).values())
+    times = [seconds for seconds, _ in outcomes]
+    return {
+        'p50': percentile(times, 0.5), 'p95': percentile(times, 0.95), 'p99': percentile(times, 0.99),
+        'max': max(times), 'requests': mock.total_requests, 'hedges': counter("gateway_hedges_total"),
+        'hedge_wins': counter("gateway_hedge_wins_total"),
+        'partial': sum(1 for _, analysis in outcomes if analysis.get('timed_out')), 'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--analyses", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="mock seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.5, help="relative spread of the mock latency")
+    parser.add_argument("--stall-rate", type=float, default=0.03, help="fraction of requests that stall")
+    parser.add_argument("--stall", type=float, default=5.0, help="seconds a stalled request takes")
+    parser.add_argument("--deadline", type=float, default=2.0, help="analysis deadline in seconds")
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+    os.environ["POLICY_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "policies.db")
+
+    texts = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            texts.append(f.read())
+
+    with MockInferenceServer(latency=args.latency, jitter=args.jitter, slow_rate=args.stall_rate,
+                             slow_latency=args.stall) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import database
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            database.init_db()
+            rows = []
+            for label, hedge_quantile, deadline in (("baseline", None, None), ("hedged", 0.95, None),
+                                                    (f"hedged + {args.deadline:g}s deadline", 0.95, args.deadline)):
+                mock.reset_stats(seed=0)
+                rows.append((label, run_setup(mock, texts, args, hedge_quantile, deadline)))
+        finally:
+            sys.stdout = stdout
+
+    print(f"{args.analyses} analyses, {args.concurrency} at a time; mock {args.latency:.2f}s ±{args.jitter:.0%} "
+          f"per request, {args.stall_rate:.0%} of requests stall {args.stall:g}s\n")
+    print(f"{'setup':<26}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7}{'requests':>10}{'hedges':>12}{'partial':>9}"
+          f"  fact status")
+    for label, r in rows:
+        statuses = ", ".join(f"{status} {n}" for status, n in sorted(r['statuses'].items()))
+        print(f"{label:<26}{r['p50']:>7.2f}{r['p95']:>7.2f}{r['p99']:>7.2f}{r['max']:>7.2f}{r['requests']:>10}"
+              f"{r['hedges']:>6} ({r['hedge_wins']:>2} won){r['partial']:>5}  {statuses}")
+
+
+if __name__ == "__main__":
+    main()
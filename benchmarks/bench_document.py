@@ -0,0 +1,65 @@
+"""
+Section extraction through PolicyDocument vs repeated sentence scans.
+
+Checks the keyword index returns exactly what the old split/lower scan did
+for every section keyword list, times both, and shows that PolicyDocument's
+memory grows linearly with document size.
+
+Usage: python benchmarks/bench_document.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+
+from document import PolicyDocument
+from summarizer import SECTION_KEYWORDS, Policy_Summarizer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def legacy_extract_section(text, keywords):
+    sentences = text.split('. ')
+    section_sentences = [s for s in sentences if any(k.lower() in s.lower() for k in keywords)]
+    return '. '.join(section_sentences) if section_sentences else ""
+
+
+def main():
+    summarizer = Policy_Summarizer()
+    legacy_total = indexed_total = 0.0
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            text = PolicyDocument(f.read()).text
+
+        start = time.perf_counter()
+        legacy = [legacy_extract_section(text, k) for k in SECTION_KEYWORDS.values()]
+        legacy_total += time.perf_counter() - start
+
+        start = time.perf_counter()
+        document = PolicyDocument(text)
+        indexed = [summarizer._extract_section(document, k) for k in SECTION_KEYWORDS.values()]
+        indexed_total += time.perf_counter() - start
+
+        assert legacy == indexed, f"sections differ for {fname}"
+    print(f"all sections of data/companies: legacy {legacy_total * 1000:.1f} ms, "
+          f"PolicyDocument (build + lookups) {indexed_total * 1000:.1f} ms")
+
+    with open(os.path.join(POLICY_DIR, "aws.txt"), "r", encoding="utf-8") as f:
+        base = f.read()
+    print(f"\n{'size KB':>8}{'doc KB':>9}{'bytes/char':>12}")
+    for factor in (1, 4, 16, 64):
+        text = "\n".join([base] * factor)
+        tracemalloc.start()
+        document = PolicyDocument(text)
+        for keywords in SECTION_KEYWORDS.values():
+            document.sentences_with(keywords)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{len(text) / 1024:>8.0f}{used / 1024:>9.0f}{used / len(text):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
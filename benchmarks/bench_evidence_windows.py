@@ -0,0 +1,103 @@
+"""
+Compares whole-text and evidence-window zero-shot classification.
+
+Classifies every NLP fact of each bundled policy (the 80-300 line samples)
+and of growing synthetic policies (a sample followed by the other samples)
+against the mock inference server: once sending the whole text per fact, the
+way nlp_extraction did before evidence windows, and once sending only each
+fact's evidence window. The mock charges latency per KB like the real
+model's encoder. Reports KB sent and seconds per fact, and how many of the
+lines the rule tier cites for a fact overlap its window (a cheap proxy for
+the window keeping the evidence that matters; the mock's zero-shot scores
+are synthetic, so its answers say nothing about accuracy).
+
+Usage: python benchmarks/bench_evidence_windows.py [--latency 0.05] [--latency-per-kb 0.02]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def run(mock, extractor, text, evidence):
+    mock.reset_stats()
+    start = time.perf_counter()
+    facts = extractor.nlp_extraction(text, batched=False, evidence=evidence)
+    elapsed = time.perf_counter() - start
+    return facts, mock.total_requests, mock.bytes_received, elapsed
+
+
+def cue_coverage(extractor, text):
+    """(rule-cited lines overlapping the fact's window, rule-cited lines) over all facts."""
+    from document import as_document
+    from extractor import NLP_CATEGORIES
+    document = as_document(text)
+    verdicts = extractor.rules.classify(document, NLP_CATEGORIES)
+    covered = cited = 0
+    for key, verdict in verdicts.items():
+        window = extractor.evidence_window(document, key)
+        for start, end in verdict.evidence or []:
+            cited += 1
+            covered += any(start < e and s < end for s, e in window)
+    return covered, cited
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per request")
+    parser.add_argument("--latency-per-kb", type=float, default=0.02, help="mock seconds per KB sent")
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+    # Whole-text latency grows with size, which hedging would read as a tail and duplicate
+    os.environ["INFERENCE_HEDGE_PERCENTILE"] = "0"
+
+    samples = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            samples.append((fname, f.read()))
+    largest = max(samples, key=lambda sample: len(sample[1]))
+    rest = [text for fname, text in samples if fname != largest[0]]
+    corpus = list(samples) + [
+        (f"{largest[0]}+{n}", "\n".join([largest[1]] + rest[:n])) for n in (2, 4, len(rest))
+    ]
+
+    with MockInferenceServer(latency=args.latency, latency_per_kb=args.latency_per_kb) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        from extractor import PolicyExtractor
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            extractor = PolicyExtractor()
+            rows = []
+            for name, text in corpus:
+                _, whole_requests, whole_sent, whole_s = run(mock, extractor, text, False)
+                facts, requests, sent, elapsed = run(mock, extractor, text, True)
+                start = time.perf_counter()
+                for key in facts:
+                    extractor.evidence_window(text, key)
+                retrieval = (time.perf_counter() - start) / len(facts)
+                rows.append((name, len(text), whole_requests, whole_sent, whole_s, len(facts), requests, sent,
+                             elapsed, retrieval, cue_coverage(extractor, text)))
+        finally:
+            sys.stdout = stdout
+
+    print(f"mock latency {args.latency:.2f}s per request + {args.latency_per_kb:.3f}s per KB\n")
+    print(f"{'document':<22}{'KB':>7}{'KB sent per fact':>22}{'seconds per fact':>22}{'pick ms':>9}{'cues kept':>11}")
+    for name, size, whole_requests, whole_sent, whole_s, n, requests, sent, elapsed, retrieval, (covered, cited) in rows:
+        print(f"{name:<22}{size / 1024:>7.1f}{whole_sent / 1024 / whole_requests:>10.1f} -> {sent / 1024 / n:<7.2f}"
+              f"{whole_s / n:>12.3f} -> {elapsed / n:<7.3f}{retrieval * 1000:>9.2f}{covered:>6}/{cited:<4}")
+    whole = sum(r[3] for r in rows)
+    windowed = sum(r[7] for r in rows)
+    print(f"\ntotal sent {whole / 1024:.0f} KB -> {windowed / 1024:.0f} KB "
+          f"({(1 - windowed / whole) * 100:.0f}% less); facts without evidence skip the request")
+
+
+if __name__ == "__main__":
+    main()
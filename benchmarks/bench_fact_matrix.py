@@ -0,0 +1,172 @@
+"""
+Measures the columnar fact matrix over a large synthetic corpus.
+
+Fills a scratch database with --policies synthetic analyses, rebuilds the
+fact matrix from them, then times queries ("shares data but no deletion
+right" and friends), listing, aggregation and one incremental update. For
+comparison it runs the same filter as a Python scan over fact dicts and as a
+json_extract query over the analyses table. Last, several processes record
+new policies into one fresh matrix at once, as the CLI, the service and the
+app can, and every policy must end up in its own row with its own facts.
+The matrix version, which app.py caches comparison results on, must stay
+put across queries and move with every recorded policy, in any process.
+
+Usage: python benchmarks/bench_fact_matrix.py [--policies 100000]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+
+
+def synthetic_facts(rng):
+    facts = {fact: rng.choice([True, True, False, None]) for fact in (
+        'collects_emails', 'uses_tracking', 'collects_location', 'shares_data',
+        'right_to_delete', 'right_to_access', 'data_portability', 'opt_out_rights', 'right_to_correction')}
+    facts['retention_duration'] = rng.choice(['unknown', 'for 30 days', 'up to 7 years', 'as long as necessary'])
+    if rng.random() < 0.5:
+        facts['minimum_age'] = rng.choice(['13', '16', '18'])
+    return facts
+
+
+def record_policies(worker, count):
+    """Records `count` new policies, each worker with its own minimum age category."""
+    sys.stdout = open(os.devnull, "w")
+    from fact_store import get_fact_matrix
+    matrix = get_fact_matrix()
+    for i in range(count):
+        matrix.record(f"{worker:032x}{i:032x}", f"worker {worker} policy {i}", {'minimum_age': str(10 + worker)})
+
+
+def check_matrix():
+    """(rows, policies with another worker's facts, stale, version) of the matrix as a new process sees it."""
+    from fact_store import FactMatrix
+    matrix = FactMatrix()
+    misplaced = sum(1 for row in matrix.where() if row['minimum_age'] != str(10 + int(row['key'].split()[1])))
+    return len(matrix), misplaced, matrix.stale, matrix.version
+
+
+def concurrent_writers(tmp, workers, count):
+    """Runs `workers` processes recording into a fresh database and matrix at once."""
+    os.environ["POLICY_DB_PATH"] = os.path.join(tmp, "writers.db")
+    os.environ["FACT_MATRIX_PATH"] = os.path.join(tmp, "writers.bin")
+    # Fresh interpreters, so they pick up the paths above
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers) as pool:
+        pool.apply(quiet_init_db)
+        pool.starmap(record_policies, [(w, count) for w in range(workers)])
+    with context.Pool(1) as pool:
+        return pool.apply(check_matrix)
+
+
+def quiet_init_db():
+    sys.stdout = open(os.devnull, "w")
+    import database
+    database.init_db()
+
+
+def timed(fn, repeat=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policies", type=int, default=100000)
+    parser.add_argument("--writers", type=int, default=4, help="processes recording at once")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    os.environ["POLICY_DB_PATH"] = os.path.join(tmp, "policies.db")
+    os.environ["FACT_MATRIX_PATH"] = os.path.join(tmp, "facts.bin")
+
+    import database
+    from fact_store import get_fact_matrix
+    from pipeline import PIPELINE_VERSION
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        database.init_db()
+        rng = random.Random(0)
+        corpus = [(f"{i:064x}", synthetic_facts(rng)) for i in range(args.policies)]
+        conn = database.get_connection()
+        conn.executemany(
+            "INSERT INTO analyses (content_hash, pipeline_version, summary, extracted_facts, date_analyzed) "
+            "VALUES (?, ?, '', ?, '')",
+            [(digest, PIPELINE_VERSION, json.dumps(facts)) for digest, facts in corpus]
+        )
+        conn.commit()
+
+        matrix = get_fact_matrix()
+        start = time.perf_counter()
+        matrix.rebuild(PIPELINE_VERSION)
+        rebuild = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+    size = os.path.getsize(matrix.path)
+
+    queries = [
+        ("shares data, no deletion right", {'shares_data': True, 'right_to_delete': [False, None]}),
+        ("tracking + location, no opt-out", {'uses_tracking': True, 'collects_location': True, 'opt_out_rights': [False, None]}),
+        ("minimum age 13, retained 7 years", {'minimum_age': '13', 'retention_period': '7 years'}),
+    ]
+    print(f"{args.policies} policies, matrix file {size / 1024:.0f} KB, rebuilt from policies.db in {rebuild:.2f}s\n")
+    print(f"{'query':<36}{'matches':>9}{'matrix ms':>11}{'dict scan ms':>14}{'SQL json ms':>13}")
+    dicts = [facts for _, facts in corpus]
+    for label, conditions in queries:
+        matrix_s, count = timed(lambda: matrix.count(**conditions))
+
+        def scan():
+            return sum(1 for facts in dicts if all(
+                facts.get(fact) in (values if isinstance(values, list) else [values])
+                for fact, values in conditions.items() if fact != 'retention_period'
+            ) and ('retention_period' not in conditions or 'up to 7 years' == facts.get('retention_duration')))
+        scan_s, scan_count = timed(scan, repeat=3)
+
+        clauses, params = [], []
+        for fact, values in conditions.items():
+            column = 'retention_duration' if fact == 'retention_period' else fact
+            values = ['up to 7 years'] if fact == 'retention_period' else (values if isinstance(values, list) else [values])
+            sql_values = [json.dumps(v) for v in values if v is not None]
+            clause = f"json_extract(extracted_facts, '$.{column}') IN (SELECT value FROM json_each(?))"
+            if None in values:
+                clause = f"({clause} OR json_extract(extracted_facts, '$.{column}') IS NULL)"
+            clauses.append(clause)
+            params.append("[" + ",".join(sql_values) + "]")
+        sql = f"SELECT COUNT(*) FROM analyses WHERE {' AND '.join(clauses)}"
+        sql_s, (sql_count,) = timed(lambda: conn.execute(sql, params).fetchone(), repeat=3)
+        assert count == scan_count == sql_count, (label, count, scan_count, sql_count)
+        print(f"{label:<36}{count:>9}{matrix_s * 1000:>11.2f}{scan_s * 1000:>14.1f}{sql_s * 1000:>13.1f}")
+
+    version = matrix.version
+    list_s, rows = timed(lambda: matrix.where(limit=200, **queries[0][1]))
+    aggregate_s, _ = timed(lambda: matrix.aggregate(**queries[0][1]))
+    all_s, _ = timed(lambda: matrix.aggregate())
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        queried = matrix.version
+        update_s, _ = timed(lambda: matrix.record("f" * 64, "New Site", synthetic_facts(rng)), repeat=50)
+    finally:
+        sys.stdout = stdout
+    assert queried == version and matrix.version == version + 51, (version, queried, matrix.version)
+    print(f"\nlist first {len(rows)} matches: {list_s * 1000:.2f} ms; aggregate all facts over matches: "
+          f"{aggregate_s * 1000:.2f} ms, over everything: {all_s * 1000:.2f} ms; record one analysis: {update_s * 1000:.2f} ms")
+
+    count = 200
+    rows, misplaced, stale, version = concurrent_writers(tmp, args.writers, count)
+    print(f"\n{args.writers} processes recording {count} policies each: {rows} rows, "
+          f"{misplaced} with another process's facts, stale {stale}, matrix version {version}")
+    assert rows == args.writers * count == version and not misplaced and not stale
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Measures the inference gateway against calling the inference client directly.
+
+1. Concurrent sessions: several sessions analyze the same policy at once
+   (inference cache off, so nothing is answered from it). Reports model
+   requests and wall time with and without the gateway, which single-flights
+   identical calls and micro-batches compatible ones.
+2. Priorities: a bulk job floods a gateway with two calls in flight, then an
+   interactive call arrives. Reports the interactive call's latency with
+   interactive priority and with the same priority as the bulk job.
+3. Rate limiting: fires distinct requests through a gateway limited to
+   --rate requests per minute and reports the achieved request rate.
+4. Coalesced deadlines: a caller with a deadline shorter than the mock
+   latency and one with a long deadline ask the same thing at once. Reports
+   what each got and how many requests reached the mock.
+5. Joined priority: with bulk calls queued behind two in flight, an
+   interactive call asks the same thing as the last queued bulk call. It
+   must be served before the other queued bulk calls; reports how many of
+   them finished first.
+
+Usage: python benchmarks/bench_gateway.py [--latency 0.2] [--sessions 4] [--rate 300]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def concurrent_sessions(mock, client, sessions, text):
+    from extractor import PolicyExtractor
+    from pipeline import AnalysisPipeline
+    from summarizer import Policy_Summarizer
+
+    pipelines = []
+    for _ in range(sessions):
+        summarizer, extractor = Policy_Summarizer(), PolicyExtractor()
+        summarizer.client = extractor.client = client
+        pipelines.append(AnalysisPipeline(summarizer, extractor))
+    mock.reset_stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        analyses = list(pool.map(lambda pipeline: pipeline.run(text), pipelines))
+    elapsed = time.perf_counter() - start
+    same = all(a['summary'] == analyses[0]['summary'] and a['extracted_facts'] == analyses[0]['extracted_facts']
+               for a in analyses)
+    return mock.total_requests, elapsed, same
+
+
+def interactive_latency(gateway, priority, flood):
+    import cancellation
+    from inference_gateway import BULK
+
+    def bulk(i):
+        cancellation.bind(gateway.query, cancellation.CancelToken(BULK))(
+            "facebook/bart-large-cnn", {"inputs": f"bulk document {i}"})
+
+    with ThreadPoolExecutor(max_workers=flood) as pool:
+        for i in range(flood):
+            pool.submit(bulk, i)
+        time.sleep(0.05)
+        start = time.perf_counter()
+        cancellation.bind(gateway.query, cancellation.CancelToken(priority))(
+            "facebook/bart-large-cnn", {"inputs": "interactive document"})
+        return time.perf_counter() - start
+
+
+def rate_limited(gateway, count):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        list(pool.map(lambda i: gateway.query("facebook/bart-large-cnn", {"inputs": f"document {i}"}), range(count)))
+    return time.perf_counter() - start
+
+
+def coalesced_deadlines(mock, gateway, latency):
+    import cancellation
+
+    def ask(timeout):
+        try:
+            result = cancellation.bind(gateway.query, cancellation.CancelToken(timeout=timeout))(
+                "facebook/bart-large-cnn", {"inputs": "shared document"})
+            return "result" if result is not None else "None"
+        except cancellation.DeadlineExceeded:
+            return "DeadlineExceeded"
+
+    mock.reset_stats()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        short, long = pool.submit(ask, latency / 2), pool.submit(ask, 10.0)
+        outcomes = short.result(), long.result()
+    return outcomes, mock.total_requests
+
+
+def joined_priority(gateway, flood):
+    import cancellation
+    from inference_gateway import BULK, INTERACTIVE
+
+    finished = {}
+
+    def ask(priority, document, label):
+        cancellation.bind(gateway.query, cancellation.CancelToken(priority))(
+            "facebook/bart-large-cnn", {"inputs": document})
+        finished[label] = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=flood + 1) as pool:
+        for i in range(flood):
+            pool.submit(ask, BULK, f"queued bulk document {i}", i)
+            # Queued in submission order
+            time.sleep(0.01)
+        pool.submit(ask, INTERACTIVE, f"queued bulk document {flood - 1}", "interactive")
+    # The two calls in flight when the interactive caller joined finish first whatever its priority
+    return sum(1 for label, at in finished.items() if label not in ("interactive", flood - 1)
+               and at < finished["interactive"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds per request")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions analyzing the same policy")
+    parser.add_argument("--rate", type=float, default=300, help="requests per minute for the rate limit test")
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+
+    with MockInferenceServer(latency=args.latency) as mock:
+        import inference_client
+        from inference_gateway import BULK, INTERACTIVE, InferenceGateway
+
+        client = inference_client.InferenceClient(api_url=mock.url, backoff_base=0.01, backoff_cap=0.05)
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            rows = []
+            for fname in sorted(os.listdir(POLICY_DIR)):
+                with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                    text = f.read()
+                direct = concurrent_sessions(mock, client, args.sessions, text)
+                gateway = concurrent_sessions(mock, InferenceGateway(client), args.sessions, text)
+                rows.append((fname, direct, gateway))
+
+            flood = 12
+            latencies = {}
+            for label, priority in (("interactive", INTERACTIVE), ("same as bulk", BULK)):
+                latencies[label] = interactive_latency(InferenceGateway(client, max_in_flight=2, max_batch=1),
+                                                       priority, flood)
+
+            count = 30
+            limited = InferenceGateway(client, max_batch=1, requests_per_minute=args.rate, burst=5)
+            limited_elapsed = rate_limited(limited, count)
+
+            deadline_outcomes, deadline_requests = coalesced_deadlines(mock, InferenceGateway(client), args.latency)
+            served_before = joined_priority(InferenceGateway(client, max_in_flight=2, max_batch=1), flood)
+        finally:
+            sys.stdout = stdout
+
+    print(f"mock latency {args.latency:.2f}s per request, {args.sessions} concurrent sessions per policy\n")
+    print(f"{'document':<18}{'requests':>16}{'seconds':>16}{'same results':>14}")
+    for fname, (requests, elapsed, same), (gw_requests, gw_elapsed, gw_same) in rows:
+        print(f"{fname:<18}{requests:>7} -> {gw_requests:<6}{elapsed:>8.2f} -> {gw_elapsed:<5.2f}"
+              f"{str(same and gw_same):>14}")
+    direct_total = sum(r[1][0] for r in rows)
+    gateway_total = sum(r[2][0] for r in rows)
+    print(f"\nrequests: {direct_total} -> {gateway_total} ({(1 - gateway_total / direct_total) * 100:.0f}% saved)")
+    print(f"\ninteractive call behind {flood} bulk calls (2 in flight): "
+          + ", ".join(f"{label} priority {seconds:.2f}s" for label, seconds in latencies.items()))
+    print(f"rate limit {args.rate:.0f}/min, burst 5: {count} requests in {limited_elapsed:.2f}s "
+          f"= {count / limited_elapsed * 60:.0f}/min (expected about "
+          f"{count / (max(0, count - 5) * 60 / args.rate + args.latency) * 60:.0f}/min)")
+    print(f"same call, deadlines {args.latency / 2:.2f}s and 10s: {deadline_outcomes[0]} and {deadline_outcomes[1]}, "
+          f"{deadline_requests} request(s) upstream")
+    print(f"interactive call joining the last of {flood} queued bulk calls (2 in flight): "
+          f"{served_before} other bulk calls finished before it")
+    assert served_before <= 2, "the joined interactive call waited behind queued bulk calls"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measures re-analysis of a lightly edited policy.
+
+For each bundled policy: saves and analyzes it, edits one sentence in one
+paragraph, saves the new version and analyzes it again, once from scratch
+and once reusing the previous version's task results. Counts model requests
+with the inference cache off (reuse from version history alone) and on (both
+layers), and reports the storage used by the version history.
+
+Usage: python benchmarks/bench_incremental.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def edit(text):
+    """Changes one word in the middle paragraph of the policy that has one to change."""
+    paragraphs = text.split("\n")
+    i = len(paragraphs) // 2
+    while " the " not in paragraphs[i]:
+        i = (i + 1) % len(paragraphs)
+    paragraphs[i] = paragraphs[i].replace(" the ", " the updated ", 1)
+    return "\n".join(paragraphs)
+
+
+def main():
+    argparse.ArgumentParser().parse_args()
+    tmp = tempfile.mkdtemp()
+    os.environ["POLICY_DB_PATH"] = os.path.join(tmp, "policies.db")
+
+    rows = []
+    with MockInferenceServer() as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import database
+        import inference_cache
+        from document import changed_paragraphs
+        from extractor import PolicyExtractor
+        from pipeline import AnalysisPipeline
+        from summarizer import Policy_Summarizer
+
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            database.init_db()
+            pipeline = AnalysisPipeline(Policy_Summarizer(), PolicyExtractor())
+            for cache in ("off", "on"):
+                os.environ["INFERENCE_CACHE"] = cache
+                # Stored analyses would answer the second pass outright
+                database.get_connection().execute("DELETE FROM analyses")
+                for fname in sorted(os.listdir(POLICY_DIR)):
+                    with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                        text = f.read()
+                    name = f"{cache}-{fname}"
+                    if inference_cache._default_cache is not None:
+                        inference_cache._default_cache.clear()
+                    database.save_policy_to_db(name, text)
+                    mock.reset_stats()
+                    pipeline.analyze(text, website_name=name)
+                    first = mock.total_requests
+
+                    edited = edit(text)
+                    database.save_policy_to_db(name, edited)
+                    mock.reset_stats()
+                    analysis = pipeline.analyze(edited, website_name=name)
+                    rows.append((cache, fname, len(text.splitlines()), len(changed_paragraphs(text, edited)),
+                                 first, mock.total_requests, analysis['reused_tasks'],
+                                 sum(v['stored_bytes'] for v in database.list_policy_versions(name)), 2 * len(text)))
+        finally:
+            sys.stdout = stdout
+
+    print(f"{'cache':<6}{'document':<18}{'lines':>6}{'changed':>8}{'full run':>9}{'re-run':>8}"
+          f"{'reused':>8}{'history KB':>12}{'raw KB':>8}")
+    for cache, fname, lines, changed, first, second, reused, stored, raw in rows:
+        print(f"{cache:<6}{fname:<18}{lines:>6}{changed:>8}{first:>9}{second:>8}{reused:>8}"
+              f"{stored / 1024:>12.1f}{raw / 1024:>8.1f}")
+    for cache in ("off", "on"):
+        full = sum(r[4] for r in rows if r[0] == cache)
+        rerun = sum(r[5] for r in rows if r[0] == cache)
+        print(f"cache {cache}: {full} requests for first analyses, {rerun} to re-analyze after a one-word edit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Checks that re-analyzing an unchanged policy makes no network calls.
+
+Runs a full analysis twice against the mock inference server with a
+throwaway cache file, then again from a fresh cache object (simulating a new
+process) to exercise the SQLite tier.
+
+Usage: python benchmarks/bench_inference_cache.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+
+def main():
+    with open(os.path.join(ROOT, "data", "companies", "aws.txt"), "r", encoding="utf-8") as f:
+        text = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp, MockInferenceServer(latency=0.1) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import inference_cache
+        from extractor import PolicyExtractor
+        from pipeline import AnalysisPipeline
+        from summarizer import Policy_Summarizer
+        pipeline = AnalysisPipeline(Policy_Summarizer(), PolicyExtractor())
+
+        path = os.path.join(tmp, "inference_cache.db")
+        rows = []
+        for label in ("cold", "warm (memory)", "new process (sqlite)"):
+            if label != "warm (memory)":
+                inference_cache._default_cache = inference_cache.InferenceCache(path=path)
+            mock.reset_stats()
+            start = time.perf_counter()
+            result = pipeline.run(text)
+            rows.append((label, mock.total_requests, time.perf_counter() - start, result))
+
+        cache = inference_cache.get_inference_cache()
+        print()
+        for label, requests, elapsed, _ in rows:
+            print(f"{label:<22}{requests:>4} requests {elapsed * 1000:>9.1f} ms")
+        print(f"cache stats (last process): {cache.stats()}")
+        assert rows[1][1] == rows[2][1] == 0
+        assert rows[0][3] == rows[1][3] == rows[2][3]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Exercises the shared InferenceClient against the mock inference server.
+
+Compares per-call latency of bare requests.post (new connection per call)
+with the pooled session, then checks that "model is loading" 503s are
+retried to success and prints the per-model latency histogram. Last, opens
+a model's circuit breaker, cancels the half-open trial call at its deadline
+and checks that the next call after recovery gets through.
+
+Usage: python benchmarks/bench_inference_client.py [--calls 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from cancellation import CancelToken, DeadlineExceeded, bind
+from mock_hf_server import MockInferenceServer
+
+MODEL = "facebook/bart-large-cnn"
+PAYLOAD = {"inputs": "We collect your email address.", "parameters": {"max_length": 20}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+
+    with MockInferenceServer() as mock:
+        from inference_client import InferenceClient
+        client = InferenceClient(api_url=mock.url, backoff_base=0.01)
+
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            requests.post(f"{mock.url}/{MODEL}", json=PAYLOAD).json()
+        bare = (time.perf_counter() - start) / args.calls
+
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            client.query(MODEL, PAYLOAD)
+        pooled = (time.perf_counter() - start) / args.calls
+        print(f"bare requests.post: {bare * 1000:.2f} ms/call, pooled session: {pooled * 1000:.2f} ms/call")
+
+        mock.error_rate = 0.3
+        results = [client.query(MODEL, PAYLOAD) for _ in range(50)]
+        failed = sum(1 for r in results if r is None)
+        print(f"with 30% 503s: {failed}/50 calls failed after retries, {client.retries} retries total")
+        print(f"breakers: {client.breaker_states()}")
+        print(f"latency histogram: {client.latency_stats()[MODEL]}")
+
+        # Open the breaker, then let the half-open trial run past its deadline
+        breaker = client._breaker(MODEL)
+        breaker.cooldown = 0.05
+        mock.error_rate, mock.latency = 1.0, 0.0
+        while breaker.state == "closed":
+            client.query(MODEL, PAYLOAD)
+        time.sleep(breaker.cooldown)
+        mock.error_rate, mock.latency = 0.0, 0.3
+        try:
+            bind(client.query, CancelToken(timeout=0.1))(MODEL, PAYLOAD)
+            print("half-open trial finished before its deadline")
+        except DeadlineExceeded:
+            print(f"half-open trial cancelled at its deadline; breaker {breaker.state}")
+        mock.latency = 0.0
+        recovered = client.query(MODEL, PAYLOAD) is not None
+        print(f"first call after recovery {'succeeded' if recovered else 'FAILED'}; breaker {breaker.state}")
+
+
+if __name__ == "__main__":
+    main()
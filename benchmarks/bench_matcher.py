@@ -0,0 +1,104 @@
+"""
+Micro-benchmark for the pre-API keyword stage of PolicyExtractor.
+
+Compares PolicyMatcher lookups against the previous substring-and-regex
+implementation on the bundled company policies, on all of them joined and
+repeated to ~1 MB, and on a synthetic ~1 MB document of long lines full of
+"until" (the old lazy `until.*?` pattern's worst case), and checks that both
+produce identical facts. The matcher reads a PolicyDocument, which the
+pipeline builds once per analysis for all of its tasks; building it is
+reported separately, while the legacy column includes its own text.lower().
+
+Usage: python benchmarks/bench_matcher.py
+"""
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+
+from document import PolicyDocument
+from extractor import PolicyExtractor
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def legacy_extraction(text):
+    """The substring/regex implementation that PolicyMatcher replaced."""
+    text_lower = text.lower()
+    facts = {}
+    facts['collects_emails'] = any(k in text_lower for k in ['email', 'e-mail', 'email address', 'contact information'])
+    facts['uses_tracking'] = any(k in text_lower for k in ['analytics', 'tracking', 'cookies', 'google analytics', 'facebook pixel'])
+    retention_duration = 'unknown'
+    for pattern in [r'(\d+)\s*(year|month|day)s?', r'(indefinitely|permanently)', r'until.*?(delete|remove)',
+                    r'as long as (necessary|needed)', r'as required by law',
+                    r'for the duration of your (account|relationship)']:
+        match = re.search(pattern, text_lower)
+        if match:
+            retention_duration = match.group(0)
+            break
+    facts['retention_duration'] = retention_duration
+    facts['shares_data'] = any(k in text_lower for k in ['third party', 'third-party', 'share', 'sharing', 'partners'])
+    if any(k in text_lower for k in ['do not share', 'not share', 'no sharing']):
+        facts['shares_data'] = False
+    for pattern in [r'(\d+)\s*years?\s*old', r'age\s*of\s*(\d+)', r'minimum\s*age\s*(\d+)']:
+        match = re.search(pattern, text_lower)
+        if match:
+            facts['minimum_age'] = match.group(1)
+            break
+    facts['collects_location'] = any(k in text_lower for k in ['location', 'gps', 'geolocation', 'ip address', 'country'])
+    facts['right_to_delete'] = any(k in text_lower for k in ['right to delete', 'right to erasure', 'delete your data', 'remove your data'])
+    facts['right_to_access'] = any(k in text_lower for k in ['right to access', 'access your data', 'view your data', 'download your data'])
+    facts['data_portability'] = any(k in text_lower for k in ['data portability', 'export your data', 'transfer your data'])
+    facts['opt_out_rights'] = any(k in text_lower for k in ['opt out', 'opt-out', 'unsubscribe', 'withdraw consent'])
+    facts['right_to_correction'] = any(k in text_lower for k in ['correct your data', 'update your data', 'modify your data'])
+    return facts
+
+
+def matcher_extraction(extractor, document):
+    # A fresh document each time would time its construction; drop the cached scan instead
+    document._scan = None
+    facts = extractor.keyword_extraction(document)
+    facts.update(extractor.extract_user_rights(document))
+    return facts
+
+
+def load_corpus():
+    corpus = {}
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        if fname.endswith('.txt'):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                corpus[fname] = f.read()
+    joined = "\n".join(corpus.values())
+    corpus['all_joined_1mb.txt'] = "\n".join([joined] * (1_000_000 // len(joined)))
+    # Worst case for the old lazy `until.*?` pattern: long lines full of "until" and no match
+    filler = "we keep records until the end of the period and until further notice " * 40
+    corpus['synthetic_1mb.txt'] = "\n".join([filler] * (1_000_000 // len(filler)))
+    return corpus
+
+
+def time_per_kb(fn, arg, size, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed * 1000 / (size / 1024)
+
+
+def main():
+    extractor = PolicyExtractor()
+    print(f"{'document':<22}{'KB':>8}{'legacy ms/KB':>15}{'matcher ms/KB':>16}{'speedup':>10}{'build doc ms/KB':>18}")
+    for name, text in load_corpus().items():
+        document = PolicyDocument(text)
+        assert legacy_extraction(text) == matcher_extraction(extractor, document), f"facts differ for {name}"
+        repeat = 3 if len(text) > 100_000 else 50
+        legacy = time_per_kb(legacy_extraction, text, len(text), repeat)
+        matcher = time_per_kb(lambda d: matcher_extraction(extractor, d), document, len(text), repeat)
+        build = time_per_kb(PolicyDocument, text, len(text), repeat)
+        print(f"{name:<22}{len(text) / 1024:>8.1f}{legacy:>15.4f}{matcher:>16.4f}{legacy / matcher:>9.1f}x{build:>18.4f}")
+
+
+if __name__ == "__main__":
+    main()
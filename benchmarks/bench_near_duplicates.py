@@ -0,0 +1,141 @@
+"""
+Measures near-duplicate reuse and the similarity index's lookup latency.
+
+1. Reuse: analyzes each bundled policy, then two edited copies saved under
+   other names (so there is no version history to reuse): one with a new
+   "last updated" line, one rebranded (company name replaced everywhere and
+   years changed). Reports the similarity found and the model requests with
+   the near-duplicate lookup off and on (inference cache off).
+2. Lookup latency: fills a scratch index with --stored synthetic analyzed
+   policies plus the bundled ones and times find_similar_analyses.
+
+Usage: python benchmarks/bench_near_duplicates.py [--stored 20000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from array import array
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def variants(fname, text):
+    company = os.path.splitext(fname)[0]
+    rebranded = re.sub(re.escape(company), "Acme", text, flags=re.IGNORECASE)
+    rebranded = re.sub(r"\b20\d\d\b", "2026", rebranded)
+    return [("dated", "Last updated: March 3, 2026\n" + text), ("rebranded", rebranded)]
+
+
+def reuse_rows(mock):
+    import database
+    from document import as_document
+    from extractor import PolicyExtractor
+    from pipeline import AnalysisPipeline
+    from summarizer import Policy_Summarizer
+
+    summarizer, extractor = Policy_Summarizer(), PolicyExtractor()
+    cold = AnalysisPipeline(summarizer, extractor, similarity_threshold=None)
+    near = AnalysisPipeline(summarizer, extractor)
+    rows = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            text = f.read()
+        near.analyze(text)
+        for kind, variant in variants(fname, text):
+            digest = as_document(variant).content_hash
+            counts = []
+            for pipeline in (cold, near):
+                mock.reset_stats()
+                analysis = pipeline.analyze(variant)
+                counts.append(mock.total_requests)
+                # Forget the variant's own analysis so the next pass can't load it
+                database.get_connection().execute("DELETE FROM analyses WHERE content_hash = ?", (digest,))
+            similar = analysis.get('similar_to')
+            rows.append((fname, kind, similar['similarity'] if similar else 0.0, counts[0], counts[1],
+                         analysis['reused_tasks']))
+    return rows
+
+
+def lookup_latency(stored, queries):
+    import database
+    from document import as_document
+    from pipeline import PIPELINE_VERSION
+    from similarity import SIGNATURE_BINS
+
+    conn = database.get_connection()
+    rng = random.Random(0)
+    start = time.perf_counter()
+    with database._lock:
+        for i in range(stored):
+            digest = f"synthetic-{i:08d}"
+            signature = array("Q", (rng.getrandbits(32) for _ in range(SIGNATURE_BINS)))
+            database._index_signature(conn, digest, signature)
+            conn.execute("INSERT INTO analyses (content_hash, pipeline_version, summary, extracted_facts, date_analyzed) "
+                         "VALUES (?, ?, '', '{}', '')", (digest, PIPELINE_VERSION))
+        conn.commit()
+    fill = time.perf_counter() - start
+
+    documents = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            documents.append(as_document(variants(fname, f.read())[0][1]))
+    start = time.perf_counter()
+    signatures = [document.minhash() for document in documents]
+    signing = (time.perf_counter() - start) / len(documents)
+
+    found = sum(1 for s in signatures if database.find_similar_analyses(s, PIPELINE_VERSION, 0.8))
+    start = time.perf_counter()
+    for i in range(queries):
+        database.find_similar_analyses(signatures[i % len(signatures)], PIPELINE_VERSION, 0.8)
+    hit = (time.perf_counter() - start) / queries
+    misses = [array("Q", (rng.getrandbits(32) for _ in range(SIGNATURE_BINS))) for _ in range(queries)]
+    start = time.perf_counter()
+    for signature in misses:
+        database.find_similar_analyses(signature, PIPELINE_VERSION, 0.8)
+    miss = (time.perf_counter() - start) / queries
+    return fill, signing, hit, miss, found, len(documents)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stored", type=int, default=20000, help="synthetic analyzed policies in the index")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+    os.environ["POLICY_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "policies.db")
+
+    with MockInferenceServer() as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import database
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            database.init_db()
+            rows = reuse_rows(mock)
+            fill, signing, hit, miss, found, documents = lookup_latency(args.stored, args.queries)
+        finally:
+            sys.stdout = stdout
+
+    print(f"{'document':<18}{'edit':<11}{'similarity':>11}{'requests':>16}{'reused':>8}")
+    for fname, kind, similar, cold, near, reused in rows:
+        print(f"{fname:<18}{kind:<11}{similar:>11.2f}{cold:>7} -> {near:<6}{reused:>8}")
+    for kind in ("dated", "rebranded"):
+        cold = sum(r[3] for r in rows if r[1] == kind)
+        near = sum(r[4] for r in rows if r[1] == kind)
+        print(f"{kind}: {cold} -> {near} requests ({(1 - near / cold) * 100:.0f}% saved)")
+    print(f"\nindex of {args.stored + documents} analyzed policies (filled in {fill:.1f}s): "
+          f"lookup {hit * 1000:.3f} ms with a match, {miss * 1000:.3f} ms without; "
+          f"{found}/{documents} dated copies matched; signing a policy {signing * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
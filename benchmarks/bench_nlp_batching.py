@@ -0,0 +1,61 @@
+"""
+Compares batched and per-category whole-text zero-shot classification in nlp_extraction.
+
+Runs both modes against the local mock inference server and reports requests
+and bytes sent per analysis, then checks the fallback path by making the mock
+reject multi-label batches.
+
+Usage: python benchmarks/bench_nlp_batching.py [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def run(mock, extractor, text, batched):
+    mock.reset_stats()
+    start = time.perf_counter()
+    facts = extractor.nlp_extraction(text, batched=batched, evidence=False)
+    elapsed = time.perf_counter() - start
+    return facts, mock.total_requests, mock.bytes_received, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per request")
+    args = parser.parse_args()
+
+    with MockInferenceServer(latency=args.latency) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        os.environ["INFERENCE_CACHE"] = "off"
+        from extractor import PolicyExtractor
+        extractor = PolicyExtractor()
+
+        print(f"{'document':<18}{'mode':<14}{'requests':>9}{'KB sent':>10}{'seconds':>9}")
+        for fname in sorted(os.listdir(POLICY_DIR)):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                text = f.read()
+            for batched in (False, True):
+                facts, requests, sent, elapsed = run(mock, extractor, text, batched)
+                assert all(v is not None for v in facts.values()), facts
+                mode = "batched" if batched else "per-category"
+                print(f"{fname:<18}{mode:<14}{requests:>9}{sent / 1024:>10.1f}{elapsed:>9.3f}")
+
+        # Batched shape rejected by the server: results must come from the fallback
+        mock.max_labels = 2
+        facts, requests, _, _ = run(mock, extractor, text, True)
+        assert all(v is not None for v in facts.values()) and requests == 1 + len(facts)
+        print(f"fallback check: {requests} requests (1 rejected batch + {len(facts)} per-category)")
+
+
+if __name__ == "__main__":
+    main()
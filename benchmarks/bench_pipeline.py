@@ -0,0 +1,80 @@
+"""
+Measures wall-clock time of one full analysis, sequential vs concurrent.
+
+Runs summarize_policy + extract_facts one after the other with a single
+worker, then AnalysisPipeline.run, against the mock inference server with a
+fixed per-request latency, and checks both produce the same results. Then
+analyzes every bundled policy joined into one, whose summary chunks and
+evidence windows make nested calls, with a few worker limits, and reports
+the peak of requests in flight, which must stay within the limit.
+
+Usage: python benchmarks/bench_pipeline.py [--latency 0.2]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds per request")
+    parser.add_argument("--policy", default=os.path.join(ROOT, "data", "companies", "aws.txt"))
+    args = parser.parse_args()
+
+    with open(args.policy, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    with MockInferenceServer(latency=args.latency) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        os.environ["INFERENCE_CACHE"] = "off"
+        import pipeline
+        from extractor import PolicyExtractor
+        from summarizer import Policy_Summarizer
+        summarizer, extractor = Policy_Summarizer(), PolicyExtractor()
+
+        timings = {}
+        for mode, workers in (("sequential", 1), ("concurrent", pipeline.DEFAULT_MAX_WORKERS)):
+            mock.reset_stats()
+            start = time.perf_counter()
+            result = pipeline.AnalysisPipeline(summarizer, extractor, max_workers=workers).run(text)
+            timings[mode] = (time.perf_counter() - start, mock.total_requests, result)
+
+        texts = []
+        for fname in sorted(os.listdir(os.path.join(ROOT, "data", "companies"))):
+            with open(os.path.join(ROOT, "data", "companies", fname), "r", encoding="utf-8") as f:
+                texts.append(f.read())
+        # No batching, so every call is its own request
+        from inference_gateway import InferenceGateway
+        summarizer.client = extractor.client = InferenceGateway(max_in_flight=64, max_batch=1, hedge_quantile=None)
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            limits = []
+            for workers in (2, 4, pipeline.DEFAULT_MAX_WORKERS):
+                mock.reset_stats()
+                start = time.perf_counter()
+                pipeline.AnalysisPipeline(summarizer, extractor, max_workers=workers).run("\n".join(texts))
+                limits.append((workers, mock.peak_in_flight, mock.total_requests, time.perf_counter() - start))
+        finally:
+            sys.stdout = stdout
+
+    sequential, concurrent = timings["sequential"], timings["concurrent"]
+    assert sequential[2] == concurrent[2], "concurrent results differ from sequential"
+    print(f"\nper-request latency: {args.latency:.2f}s")
+    for mode, (elapsed, requests, _) in timings.items():
+        print(f"{mode:<12}{requests:>4} requests {elapsed:>7.2f}s")
+    print(f"speedup: {sequential[0] / concurrent[0]:.1f}x")
+    print(f"\nall {len(texts)} policies as one ({sum(map(len, texts)) // 1000} KB):")
+    for workers, peak, requests, elapsed in limits:
+        print(f"max_workers {workers:<3}{requests:>5} requests {elapsed:>7.2f}s  peak in flight {peak}")
+        assert peak <= workers, "more requests in flight than the analysis's worker limit"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Full-context vs retrieval-narrowed retention QA on the bundled policies.
+
+The mock server charges latency per KB of request body so the comparison
+reflects encode cost. Reports bytes sent and wall-clock time per policy and
+prints the passages that would be sent for one of them.
+
+Usage: python benchmarks/bench_qa_retrieval.py [--latency-per-kb 0.02]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def timed(mock, fn):
+    mock.reset_stats()
+    start = time.perf_counter()
+    answer = fn()
+    return answer, mock.bytes_received, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-kb", type=float, default=0.02)
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+
+    with MockInferenceServer(latency=args.latency, latency_per_kb=args.latency_per_kb) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        from document import PolicyDocument
+        from extractor import QA_MODEL, RETENTION_QUERY, PolicyExtractor
+        extractor = PolicyExtractor()
+
+        def full_context(text):
+            return extractor._query_api(QA_MODEL, {
+                "inputs": {"question": "How long is user data retained?", "context": text}
+            })
+
+        totals = [0, 0, 0.0, 0.0]
+        print(f"\n{'document':<18}{'full KB':>9}{'narrow KB':>11}{'full s':>8}{'narrow s':>10}")
+        for fname in sorted(os.listdir(POLICY_DIR)):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                text = f.read()
+            _, full_bytes, full_time = timed(mock, lambda: full_context(text))
+            _, narrow_bytes, narrow_time = timed(mock, lambda: extractor.qa_retention_extraction(text))
+            totals = [totals[0] + full_bytes, totals[1] + narrow_bytes, totals[2] + full_time, totals[3] + narrow_time]
+            print(f"{fname:<18}{full_bytes / 1024:>9.1f}{narrow_bytes / 1024:>11.1f}{full_time:>8.3f}{narrow_time:>10.3f}")
+        print(f"{'total':<18}{totals[0] / 1024:>9.1f}{totals[1] / 1024:>11.1f}{totals[2]:>8.3f}{totals[3]:>10.3f}")
+        print(f"bytes: {totals[0] / totals[1]:.1f}x fewer, latency: {totals[2] / totals[3]:.1f}x lower")
+
+        with open(os.path.join(POLICY_DIR, "aws.txt"), "r", encoding="utf-8") as f:
+            passages = PolicyDocument(f.read()).passage_index().top_k(RETENTION_QUERY)
+        print("\naws.txt passages sent to QA:")
+        for passage in passages:
+            print(f"- {passage[:160]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Load test of the HTTP analysis service against the mock inference server.
+
+Starts service.py's AnalysisService in this process, on a scratch database
+with the inference cache off, and runs --clients client threads that
+together submit --analyses policies (bundled policies with a distinct first
+line, so none is loaded from the store). Each client submits one, follows
+its Server-Sent Events until it finishes, and retries after Retry-After
+when the service answers 503. A sampler polls /healthz meanwhile.
+
+Two setups: "roomy" (queue large enough for every client) and "tight"
+(small queue and few workers), where admission pushes back, plus "threads"
+with a worker per client and no queueing, to show what the queue saves.
+
+Reports throughput, submit-to-done and submit-to-first-result latency,
+503s, the peak queue depth and running analyses, and /healthz latency
+under load.
+
+Then two checks on one worker and a queue of 4: jobs cancelled while queued
+must give their slots back, so as many new submissions are accepted; and
+with the blob store slowed down, polls of a finished analysis must not hold
+up /healthz, since blob store I/O stays off the event loop.
+
+Usage: python benchmarks/bench_service.py [--clients 300] [--analyses 600]
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def start_service(workers, queue_size):
+    """Runs an AnalysisService on an event loop thread; returns (service, port)."""
+    from service import AnalysisService, build_pipeline
+
+    service = AnalysisService(build_pipeline(calls_per_analysis=4), workers=workers, queue_size=queue_size)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = asyncio.run_coroutine_threadsafe(service.start("127.0.0.1", 0), loop).result()
+    return service, server.sockets[0].getsockname()[1]
+
+
+def follow(port, text):
+    """Submits one policy and follows it to the end. Returns (seconds, seconds to first result, 503s, status)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    body = json.dumps({'text': text})
+    rejected = 0
+    started = time.perf_counter()
+    while True:
+        conn.request("POST", "/analyses", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+        if response.status != 503:
+            break
+        rejected += 1
+        time.sleep(float(response.getheader("Retry-After", "1")))
+    job_id = payload['id']
+    conn.close()
+
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    conn.request("GET", f"/analyses/{job_id}/events")
+    response = conn.getresponse()
+    first_result = status = None
+    while True:
+        line = response.fp.readline()
+        if not line:
+            break
+        if line.startswith(b"event: "):
+            event = line[7:].strip().decode()
+            if first_result is None and event not in ("queued", "running"):
+                first_result = time.perf_counter() - started
+            if event in ("done", "failed", "cancelled"):
+                status = event
+                break
+    conn.close()
+    return time.perf_counter() - started, first_result, rejected, status
+
+
+def call(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    conn.request(method, path, body, {"Content-Type": "application/json"} if body else {})
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    conn.close()
+    return response.status, payload
+
+
+def cancelled_slots(texts, queue_size=4):
+    """Fills the queue behind one busy worker, cancels the queued jobs, resubmits. Returns the resubmissions' 503s."""
+    service, port = start_service(1, queue_size)
+    submit = lambda i: call(port, "POST", "/analyses", json.dumps({'text': f"Queued copy {i}\n{texts[0]}"}))
+    ids = [submit(i)[1]['id'] for i in range(queue_size + 1)]
+    for job_id in ids:
+        if call(port, "GET", f"/analyses/{job_id}")[1]['status'] == "queued":
+            call(port, "DELETE", f"/analyses/{job_id}")
+    statuses = [submit(i) for i in range(queue_size + 1, 2 * queue_size + 1)]
+    for status, payload in statuses:
+        if status == 202:
+            call(port, "DELETE", f"/analyses/{payload['id']}")
+    call(port, "DELETE", f"/analyses/{ids[0]}")
+    return sum(1 for status, _ in statuses if status == 503)
+
+
+def slow_store_health(texts, delay=0.2, polls=10):
+    """/healthz seconds while `polls` clients poll a finished analysis from a blob store taking `delay` per read."""
+    from blob_store import get_blob_store
+
+    _, port = start_service(1, 4)
+    job_id = call(port, "POST", "/analyses", json.dumps({'text': f"Slow store copy\n{texts[0]}"}))[1]['id']
+    while call(port, "GET", f"/analyses/{job_id}")[1]['status'] not in ("done", "failed", "cancelled"):
+        time.sleep(0.1)
+    store = get_blob_store()
+    get_json = store.get_json
+    store.get_json = lambda key: (time.sleep(delay), get_json(key))[1]
+    try:
+        with ThreadPoolExecutor(max_workers=polls) as pool:
+            pending = [pool.submit(call, port, "GET", f"/analyses/{job_id}") for _ in range(polls)]
+            time.sleep(delay / 4)
+            started = time.perf_counter()
+            call(port, "GET", "/healthz")
+            health = time.perf_counter() - started
+            assert all(f.result()[1]['analysis'] is not None for f in pending)
+    finally:
+        store.get_json = get_json
+    return health
+
+
+def run_setup(mock, texts, args, workers, queue_size):
+    service, port = start_service(workers, queue_size)
+    mock.reset_stats()
+    samples, health_latency = [], []
+    stop = threading.Event()
+
+    def sample():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn.request("GET", "/healthz")
+                response = conn.getresponse()
+                samples.append(json.loads(response.read()))
+            except (OSError, http.client.HTTPException):
+                # Counted at the timeout; a new connection for the next sample
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            health_latency.append(time.perf_counter() - started)
+            time.sleep(0.1)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        outcomes = list(pool.map(lambda i: follow(port, f"Policy copy {i} ({workers}/{queue_size})\n"
+                                                        f"{texts[i % len(texts)]}"), range(args.analyses)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+
+    times = [seconds for seconds, _, _, _ in outcomes]
+    firsts = [first for _, first, _, _ in outcomes if first is not None]
+    return {
+        'throughput': len(outcomes) / elapsed, 'p50': percentile(times, 0.5), 'p95': percentile(times, 0.95),
+        'p99': percentile(times, 0.99), 'first_p50': percentile(firsts, 0.5),
+        'rejected': sum(r for _, _, r, _ in outcomes), 'statuses': Counter(s for _, _, _, s in outcomes),
+        'peak_running': max(s['running'] for s in samples), 'peak_queued': max(s['queued'] for s in samples),
+        'health_p99': percentile(health_latency, 0.99) * 1000, 'requests': mock.total_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=300, help="concurrent client threads")
+    parser.add_argument("--analyses", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per request")
+    parser.add_argument("--in-flight", type=int, default=64, help="INFERENCE_MAX_IN_FLIGHT")
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+    os.environ["POLICY_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "policies.db")
+    os.environ["INFERENCE_MAX_IN_FLIGHT"] = str(args.in_flight)
+
+    texts = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            texts.append(f.read())
+
+    with MockInferenceServer(latency=args.latency, jitter=0.5) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            rows = [(label, run_setup(mock, texts, args, workers, queue_size))
+                    for label, workers, queue_size in (("roomy (32 workers, queue 1024)", 32, 1024),
+                                                       ("tight (8 workers, queue 32)", 8, 32),
+                                                       (f"threads ({args.clients} workers)", args.clients, 1024))]
+            rejected_after_cancel = cancelled_slots(texts)
+            slow_health = slow_store_health(texts)
+        finally:
+            sys.stdout = stdout
+
+    print(f"{args.analyses} analyses from {args.clients} concurrent clients; mock {args.latency:.2f}s per request, "
+          f"{args.in_flight} model calls in flight\n")
+    print(f"{'setup':<34}{'an/s':>7}{'p50':>7}{'p95':>7}{'p99':>7}{'first':>7}{'503s':>7}{'peak run':>10}"
+          f"{'peak queue':>12}{'healthz p99':>13}{'requests':>10}  status")
+    for label, r in rows:
+        statuses = ", ".join(f"{status} {n}" for status, n in sorted(r['statuses'].items(), key=str))
+        print(f"{label:<34}{r['throughput']:>7.1f}{r['p50']:>7.2f}{r['p95']:>7.2f}{r['p99']:>7.2f}"
+              f"{r['first_p50']:>7.2f}{r['rejected']:>7}{r['peak_running']:>10}{r['peak_queued']:>12}"
+              f"{r['health_p99']:>10.1f} ms{r['requests']:>10}  {statuses}")
+    print(f"\n1 worker, queue 4: after cancelling the queued jobs, {rejected_after_cancel}/4 resubmissions got 503")
+    print(f"/healthz while 10 polls read a finished analysis from a blob store taking 0.2s per read: "
+          f"{slow_health * 1000:.0f} ms")
+    assert rejected_after_cancel == 0 and slow_health < 0.2
+
+
+if __name__ == "__main__":
+    main()
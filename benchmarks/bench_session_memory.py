@@ -0,0 +1,173 @@
+"""
+Measures the memory Streamlit sessions hold, before and after moving policy
+texts and analyses into the shared blob store.
+
+Simulates --sessions sessions that each opened --reports reports, picked
+from --policies distinct synthetic policies of a given size (sentences drawn
+at random from the bundled policies). Every session has its own copy of each
+text and analysis, as it does when users paste policies. Two layouts:
+
+- inline: the old session state (current_policy plus recent_reports entries
+  with policy_text and full_analysis)
+- blob store: SessionReport keys in the session; one compressed copy of each
+  value in a BlobStore with a --budget-mb memory tier
+
+Reports traced allocations per session and for the store at 0.1, 1 and 4 MB
+policies, then the latency of reading a text back from memory and from the
+spilled SQLite tier.
+
+Usage: python benchmarks/bench_session_memory.py [--sessions 100] [--policies 8] [--budget-mb 16]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+FACTS = ["data_collection", "third_party_sharing", "data_retention", "cookies", "location_tracking",
+         "children_data", "data_selling", "advertising", "security", "international_transfer"]
+
+# Same shape as the app's, defined here so the bench does not import streamlit
+SessionReport = namedtuple('SessionReport', ['website_name', 'date', 'policy_key', 'analysis_key'])
+
+
+def synthetic_policies(count, size, sentences, rng):
+    policies = []
+    for i in range(count):
+        parts, length = [f"Policy {i}"], 0
+        while length < size:
+            sentence = rng.choice(sentences)
+            parts.append(sentence)
+            length += len(sentence) + 1
+        policies.append("\n".join(parts))
+    return policies
+
+
+def analysis_of(text, rng):
+    """An analysis shaped like the pipeline's, with evidence excerpts from the text."""
+    def excerpt():
+        start = rng.randrange(max(1, len(text) - 300))
+        return {'start': start, 'end': start + 300, 'text': text[start:start + 300]}
+    return {
+        'summary': " ".join(text[i * 400:i * 400 + 300] for i in range(5)),
+        'extracted_facts': {
+            **{fact: rng.choice([True, False, None]) for fact in FACTS},
+            'fact_evidence': {fact: [excerpt() for _ in range(3)] for fact in FACTS},
+            'fact_tiers': {fact: rng.choice(["rules", "local", "remote"]) for fact in FACTS},
+            'fact_status': {fact: "complete" for fact in FACTS},
+        },
+        'reused_tasks': 0,
+    }
+
+
+def traced(build):
+    """Runs build() and returns (its result, bytes it left allocated)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def run_size(size, args, sentences, tmpdir):
+    from blob_store import BlobStore
+
+    rng = random.Random(size)
+    texts = synthetic_policies(args.policies, size, sentences, rng)
+    analyses = [json.dumps(analysis_of(text, rng)) for text in texts]
+    picks = [[rng.randrange(args.policies) for _ in range(args.reports)] for _ in range(args.sessions)]
+
+    def inline():
+        sessions = []
+        for chosen in picks:
+            reports = [{'website_name': f"site {i}", 'date': "12:00:00",
+                        'policy_text': texts[i].encode("utf-8").decode("utf-8"),  # a copy, as pasted
+                        'full_analysis': json.loads(analyses[i])} for i in chosen]
+            sessions.append({'current_policy': reports[0]['policy_text'], 'current_website': f"site {chosen[0]}",
+                             'analysis_to_display': reports[0]['full_analysis'], 'recent_reports': reports})
+        return sessions
+
+    inline_sessions, inline_bytes = traced(inline)
+    del inline_sessions
+
+    store = BlobStore(path=os.path.join(tmpdir, f"blobs-{size}.db"), max_bytes=args.budget_mb * 1024 * 1024)
+
+    def blob_sessions():
+        sessions = []
+        for chosen in picks:
+            # The pasted copy is only alive while it is being stored
+            reports = [SessionReport(f"site {i}", "12:00:00",
+                                     store.put_text(texts[i].encode("utf-8").decode("utf-8")),
+                                     store.put_json(json.loads(analyses[i]))) for i in chosen]
+            sessions.append({'current_policy_key': reports[0].policy_key, 'current_website': reports[0].website_name,
+                             'analysis_to_display': reports[0].analysis_key, 'recent_reports': reports})
+        return sessions
+
+    sessions, _ = traced(blob_sessions)
+    store_bytes = store.stats()['memory_bytes']
+    _, session_bytes = traced(lambda: json.loads(json.dumps(sessions)))
+
+    def latency(keys):
+        start = time.perf_counter()
+        for key in keys:
+            assert store.get_text(key) is not None
+        return (time.perf_counter() - start) / len(keys) * 1000
+
+    keys = [store.put_text(text) for text in texts]
+    hot = latency([keys[-1]] * 20)
+    # Push every policy out of the memory tier, then read one back from SQLite
+    for _ in range(4):
+        store.put(os.urandom(args.budget_mb * 1024 * 1024 // 3))
+    cold = latency([keys[0]])
+    return {
+        'size': size, 'inline': inline_bytes / args.sessions, 'session': session_bytes / args.sessions,
+        'store': store_bytes, 'hot_ms': hot, 'cold_ms': cold,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--reports", type=int, default=5, help="recent reports per session")
+    parser.add_argument("--policies", type=int, default=8, help="distinct policies the sessions open")
+    parser.add_argument("--budget-mb", type=int, default=16, help="blob store memory budget")
+    parser.add_argument("--sizes", default="0.1,1,4", help="policy sizes in MB")
+    args = parser.parse_args()
+
+    sentences = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+            sentences += [s for s in re.split(r"(?<=[.!?])\s+|\n+", f.read()) if len(s) > 20]
+
+    tmpdir = tempfile.mkdtemp()
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        rows = [run_size(int(float(mb) * 1024 * 1024), args, sentences, tmpdir) for mb in args.sizes.split(",")]
+    finally:
+        sys.stdout = stdout
+
+    print(f"{args.sessions} sessions x {args.reports} reports over {args.policies} distinct policies; "
+          f"blob store memory budget {args.budget_mb} MB\n")
+    print(f"{'policy':>8}{'inline/session':>16}{'keys/session':>14}{'store (shared)':>16}"
+          f"{'get hot':>10}{'get spilled':>13}")
+    for r in rows:
+        print(f"{r['size'] / 1024 / 1024:>6.1f}MB{r['inline'] / 1024:>13.0f} KB{r['session'] / 1024:>11.1f} KB"
+              f"{r['store'] / 1024 / 1024:>13.1f} MB{r['hot_ms']:>8.2f}ms{r['cold_ms']:>11.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
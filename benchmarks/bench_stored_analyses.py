@@ -0,0 +1,89 @@
+"""
+Time to re-open a previously analyzed policy through the analyses table.
+
+Analyzes every bundled policy once against the mock inference server (with
+the inference cache off, so only the analyses table can help), then analyzes
+them again and reports both timings. Then bumps the pipeline version to
+show stale rows are ignored and purged. Last, analyzes a policy while the
+mock rejects every zero-shot call, and again once it accepts them: the
+degraded analysis must not be served from the store, and the retry should
+only repeat the calls that failed.
+
+Usage: python benchmarks/bench_stored_analyses.py [--latency 0.2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, MockInferenceServer(latency=args.latency) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        os.environ["INFERENCE_CACHE"] = "off"
+        os.environ["POLICY_DB_PATH"] = os.path.join(tmp, "policies.db")
+        import database
+        import pipeline
+        from extractor import PolicyExtractor
+        from summarizer import Policy_Summarizer
+        database.init_db()
+        analysis_pipeline = pipeline.AnalysisPipeline(Policy_Summarizer(), PolicyExtractor())
+
+        texts = []
+        for fname in sorted(os.listdir(POLICY_DIR)):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                texts.append(f.read())
+
+        rows = []
+        for label in ("first analysis", "re-opened"):
+            mock.reset_stats()
+            start = time.perf_counter()
+            results = [analysis_pipeline.analyze(text) for text in texts]
+            elapsed = (time.perf_counter() - start) / len(texts)
+            rows.append((label, elapsed, mock.total_requests, results))
+
+        pipeline.PIPELINE_VERSION = "bumped"
+        mock.reset_stats()
+        analysis_pipeline.analyze(texts[0])
+        stale_requests = mock.total_requests
+        removed = database.purge_stale_analyses("bumped")
+
+        # A policy with facts only the zero-shot model answered, not the one stored for the bumped version
+        text = next(text for text, analysis in zip(texts[1:], rows[0][3][1:])
+                    if "zero_shot" in analysis['extracted_facts']['fact_tiers'].values())
+        mock.max_labels = 0
+        mock.reset_stats()
+        degraded = analysis_pipeline.analyze(text)
+        degraded_requests = mock.total_requests
+        mock.max_labels = None
+        mock.reset_stats()
+        retried = analysis_pipeline.analyze(text)
+        retry_requests = mock.total_requests
+
+    print()
+    for label, elapsed, requests, _ in rows:
+        print(f"{label:<16}{elapsed * 1000:>10.1f} ms/policy {requests:>5} requests")
+    assert all(r['from_store'] for r in rows[1][3])
+    print(f"after version bump: {stale_requests} requests for a previously stored policy, {removed} stale rows purged")
+    statuses = sorted(set(degraded['extracted_facts']['fact_status'].values()))
+    print(f"zero-shot failing: {degraded_requests} requests, fact statuses {statuses}, complete "
+          f"{pipeline.is_complete(degraded)}; retry: from store {retried['from_store']}, {retry_requests} requests, "
+          f"{retried['reused_tasks']} tasks reused, complete {pipeline.is_complete(retried)}")
+    assert not retried['from_store'] and pipeline.is_complete(retried)
+
+
+if __name__ == "__main__":
+    main()
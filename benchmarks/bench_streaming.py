@@ -0,0 +1,112 @@
+"""
+Measures time-to-first-result and cancellation of streamed analyses.
+
+Streams the analysis of each bundled policy against the mock inference
+server and reports when the keyword facts, the first model result and the
+complete analysis arrived, compared with waiting for analyze(), and how many
+facts the keyword event marks pending (none may be left in the last event,
+nor a final tier on a fact whose task had not finished). Then cancels
+an analysis right after its first model result and reports how quickly it stopped
+and how many model requests were made after the cancel.
+
+Usage: python benchmarks/bench_streaming.py [--latency 0.5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="mock seconds per request")
+    parser.add_argument("--workers", type=int, default=4, help="model calls in flight per analysis")
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+    os.environ["POLICY_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "policies.db")
+
+    with MockInferenceServer(latency=args.latency) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        import database
+        from cancellation import CancelToken, Cancelled
+        from extractor import PolicyExtractor
+        from pipeline import AnalysisPipeline
+        from summarizer import Policy_Summarizer
+
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        rows = []
+        try:
+            database.init_db()
+            pipeline = AnalysisPipeline(Policy_Summarizer(), PolicyExtractor(), max_workers=args.workers)
+            texts = []
+            for fname in sorted(os.listdir(POLICY_DIR)):
+                with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                    texts.append((fname, f.read()))
+
+            for fname, text in texts:
+                mock.reset_stats()
+                streamed = list(pipeline.stream(text))
+                events = [(event.kind, event.elapsed) for event in streamed]
+                first_status = streamed[0].analysis['extracted_facts']['fact_status']
+                first_pending = [key for key, status in first_status.items() if status == "pending"]
+                assert not set(first_pending) & set(streamed[0].analysis['extracted_facts']['fact_tiers']), \
+                    f"{fname}: pending facts given a final tier"
+                assert "pending" not in streamed[-1].analysis['extracted_facts']['fact_status'].values(), \
+                    f"{fname}: facts still pending after the last event"
+                # A fact a model answers in the end was not final while its task ran
+                modelled = [key for key, tier in streamed[-1].analysis['extracted_facts']['fact_tiers'].items()
+                            if tier in ("zero_shot", "qa")]
+                assert set(modelled) <= set(first_pending), f"{fname}: {modelled} reported final before their model ran"
+                if not rows:
+                    full_requests = mock.total_requests
+                database.get_connection().execute("DELETE FROM analyses")
+                start = time.perf_counter()
+                pipeline.analyze(text)
+                blocking = time.perf_counter() - start
+                database.get_connection().execute("DELETE FROM analyses")
+                first_model = next(elapsed for kind, elapsed in events if kind in ("summary", "facts"))
+                rows.append((fname, events[0][1], first_model, events[-1][1], blocking, len(events), len(first_pending)))
+
+            # Cancel right after the first model result arrives
+            fname, text = texts[0]
+            token = CancelToken()
+            mock.reset_stats()
+            stream = pipeline.stream(text, cancel=token)
+            while next(stream).kind == 'keywords':
+                pass
+            token.cancel()
+            cancelled_at = time.perf_counter()
+            requests_at_cancel = mock.total_requests
+            try:
+                for _ in stream:
+                    pass
+            except Cancelled:
+                pass
+            stopped = time.perf_counter() - cancelled_at
+            # Let in-flight calls land so late requests are counted
+            time.sleep(args.latency * 3)
+            late_requests = mock.total_requests - requests_at_cancel
+        finally:
+            sys.stdout = stdout
+
+    print(f"mock latency {args.latency:.2f}s per request, {args.workers} calls in flight\n")
+    print(f"{'document':<18}{'keywords ms':>12}{'first model s':>14}{'complete s':>11}{'analyze() s':>12}{'events':>8}{'pending':>9}")
+    for fname, keywords, first_model, complete, blocking, count, first_pending in rows:
+        print(f"{fname:<18}{keywords * 1000:>12.1f}{first_model:>14.2f}{complete:>11.2f}{blocking:>12.2f}{count:>8}"
+              f"{first_pending:>9}")
+    print(f"\ncancel after first model result ({texts[0][0]}): stream stopped in {stopped * 1000:.0f} ms, "
+          f"{requests_at_cancel} requests made before the cancel, {late_requests} after, of {rows[0][5] - 2} tasks "
+          f"(a full analysis made {full_requests})")
+
+
+if __name__ == "__main__":
+    main()
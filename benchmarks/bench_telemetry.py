@@ -0,0 +1,94 @@
+"""
+Shows what the tracing layer records and what it costs.
+
+Times a bare span and counter increment with telemetry on and off, runs one
+analysis against the mock inference server and prints its trace breakdown
+and a slice of the Prometheus export, then compares end-to-end analysis time
+with telemetry on and off.
+
+Usage: python benchmarks/bench_telemetry.py [--latency 0.02] [--runs 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+
+def per_call_ns(fn, n=200000):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02, help="mock seconds per request")
+    parser.add_argument("--runs", type=int, default=5, help="analyses per mode")
+    parser.add_argument("--policy", default=os.path.join(ROOT, "data", "companies", "microsoft.txt"))
+    args = parser.parse_args()
+    os.environ["INFERENCE_CACHE"] = "off"
+
+    import telemetry
+
+    def one_span():
+        with telemetry.span("bench"):
+            pass
+
+    def one_counter():
+        telemetry.inc("bench_total", model="m")
+
+    for flag in (True, False):
+        telemetry.set_enabled(flag)
+        print(f"telemetry {'on ' if flag else 'off'}: span {per_call_ns(one_span):7.0f} ns, "
+              f"counter {per_call_ns(one_counter):7.0f} ns")
+    telemetry.set_enabled(True)
+    telemetry.metrics.reset()
+
+    with open(args.policy, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    with MockInferenceServer(latency=args.latency) as mock:
+        os.environ["HF_API_URL"] = mock.url
+        from extractor import PolicyExtractor
+        from pipeline import AnalysisPipeline
+        from summarizer import Policy_Summarizer
+        pipeline = AnalysisPipeline(Policy_Summarizer(), PolicyExtractor())
+
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            with telemetry.trace("bench") as trace:
+                pipeline.run(text)
+            timings = {}
+            for flag in (True, False, True, False):
+                telemetry.set_enabled(flag)
+                start = time.perf_counter()
+                for _ in range(args.runs):
+                    pipeline.run(text)
+                timings.setdefault(flag, []).append((time.perf_counter() - start) / args.runs)
+        finally:
+            sys.stdout = stdout
+        telemetry.set_enabled(True)
+
+    print(f"\ntrace of one analysis ({trace.duration * 1000:.0f} ms, {len(trace.spans)} spans):")
+    for row in trace.breakdown():
+        print(f"  {row['stage']:<40}{row['total_ms']:>9.1f} ms {row['calls']:>4} calls {row['share']:>6.0%}")
+
+    print("\nprometheus export (counters):")
+    for line in telemetry.export_prometheus().splitlines():
+        if line.startswith("inference_"):
+            print(f"  {line}")
+
+    on, off = min(timings[True]), min(timings[False])
+    print(f"\nanalysis with telemetry on: {on * 1000:.1f} ms, off: {off * 1000:.1f} ms "
+          f"({(on - off) / off * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Local stand-in for the Hugging Face inference API.
+
+Serves POST /models/<model> with responses shaped like the zero-shot,
+summarization and question-answering endpoints used by the app, and counts
+requests and bytes per model and the peak of concurrent requests so
+benchmarks can compare call patterns offline.
+
+Point the app at it with HF_API_URL=http://127.0.0.1:<port>/models.
+
+Usage: python benchmarks/mock_hf_server.py [--port 8765] [--latency 0.05]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _score(label, text):
+    """Deterministic pseudo-score for a hypothesis given the input text."""
+    words = [w for w in label.lower().split() if len(w) > 3]
+    overlap = sum(1 for w in words if w in text.lower())
+    negated = any(w in label.lower() for w in ("not ", "no ", "cannot"))
+    digest = hashlib.sha256((label + text[:200]).encode("utf-8")).digest()
+    base = (overlap + 1) / (len(words) + 2)
+    return round(min(0.99, base * (0.6 if negated else 1.0) + digest[0] / 2550), 4)
+
+
+def zero_shot(inputs, parameters):
+    labels = parameters.get("candidate_labels", [])
+    if isinstance(labels, str):
+        labels = [label.strip() for label in labels.split(",")]
+    scores = [_score(label, inputs) for label in labels]
+    if not parameters.get("multi_label", False):
+        total = sum(scores) or 1.0
+        scores = [s / total for s in scores]
+    ranked = sorted(zip(labels, scores), key=lambda pair: -pair[1])
+    return {
+        "sequence": inputs,
+        "labels": [label for label, _ in ranked],
+        "scores": [score for _, score in ranked],
+    }
+
+
+def summarization(inputs, parameters):
+    words = inputs.split()
+    return [{"summary_text": " ".join(words[:max(1, parameters.get("max_length", 150) // 2)])}]
+
+
+def question_answering(inputs, parameters):
+    context = inputs.get("context", "")
+    lowered = context.lower()
+    for cue in ("retain", "retention", "keep", "store"):
+        start = lowered.find(cue)
+        if start != -1:
+            end = min(len(context), start + 60)
+            return {"answer": context[start:end], "score": 0.42, "start": start, "end": end}
+    return {"answer": "", "score": 0.001, "start": 0, "end": 0}
+
+
+class MockInferenceServer:
+    """
+    Threaded mock inference server with request/byte counters.
+
+    latency: seconds to sleep before every response.
+    max_labels: zero-shot requests with more candidate labels than this are
+                rejected with 400, to exercise clients' fallback paths.
+    error_rate: fraction of requests answered with a "model is loading" 503.
+    latency_per_kb: extra seconds per KB of request body, to model encode cost.
+    latency_per_label: extra seconds per zero-shot candidate label, since the
+                       real model runs one entailment pass per label.
+    jitter: each delay is scaled by a factor drawn from [1 - jitter, 1 + jitter].
+    slow_rate: fraction of requests that stall for an extra `slow_latency`
+               seconds, the tail a hedged or deadline-bound client has to cut.
+    Error, jitter and stall draws come from a generator seeded with `seed`, so
+    runs with the same request sequence see the same failures.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, max_labels=None, error_rate=0.0, seed=0,
+                 latency_per_kb=0.0, jitter=0.0, latency_per_label=0.0, slow_rate=0.0, slow_latency=0.0):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.latency_per_label = latency_per_label
+        self.jitter = jitter
+        self.latency_per_kb = latency_per_kb
+        self.max_labels = max_labels
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                model = self.path.split("/models/", 1)[-1]
+                status, response = server.handle(model, body)
+                data = json.dumps(response).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client timed out or hedged and hung up
+
+        class Server(ThreadingHTTPServer):
+            # Room for bursts of concurrent clients without connection resets
+            request_queue_size = 256
+            daemon_threads = True
+
+        self.httpd = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/models"
+        self._thread = None
+
+    def reset_stats(self, seed=None):
+        with self.lock:
+            if seed is not None:
+                self._random.seed(seed)
+            self.requests = {}
+            self.bytes_by_model = {}
+            self.bytes_received = 0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+    @property
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    def handle(self, model, body):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return self._respond(model, body)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _respond(self, model, body):
+        with self.lock:
+            self.requests[model] = self.requests.get(model, 0) + 1
+            self.bytes_by_model[model] = self.bytes_by_model.get(model, 0) + len(body)
+            self.bytes_received += len(body)
+        with self.lock:
+            failed = self._random.random() < self.error_rate
+            scale = 1.0 + self._random.uniform(-self.jitter, self.jitter) if self.jitter else 1.0
+            stall = self.slow_latency if self.slow_rate and self._random.random() < self.slow_rate else 0.0
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        inputs = payload.get("inputs") if isinstance(payload, dict) else None
+        parameters = (payload.get("parameters") if isinstance(payload, dict) else None) or {}
+
+        delay = self.latency + self.latency_per_kb * len(body) / 1024
+        if "mnli" in model:
+            delay += self.latency_per_label * len(parameters.get("candidate_labels", []))
+        delay = delay * scale + stall
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, {"error": f"Model {model} is currently loading", "estimated_time": 0.05}
+        if payload is None:
+            return 400, {"error": "Invalid JSON"}
+
+        if "mnli" in model:
+            labels = parameters.get("candidate_labels", [])
+            if self.max_labels is not None and len(labels) > self.max_labels:
+                return 400, {"error": "Too many candidate labels"}
+            if isinstance(inputs, list):
+                return 200, [zero_shot(item, parameters) for item in inputs]
+            return 200, zero_shot(inputs, parameters)
+        if "squad" in model:
+            if isinstance(inputs, list):
+                return 200, [question_answering(item, parameters) for item in inputs]
+            return 200, question_answering(inputs, parameters)
+        if isinstance(inputs, list):
+            return 200, [summarization(item, parameters)[0] for item in inputs]
+        return 200, summarization(inputs, parameters)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Hugging Face inference API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of delay per request")
+    parser.add_argument("--latency-per-kb", type=float, default=0.0, help="extra seconds per KB of request body")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative random spread of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    mock = MockInferenceServer(args.host, args.port, args.latency, error_rate=args.error_rate, seed=args.seed,
+                               latency_per_kb=args.latency_per_kb, jitter=args.jitter)
+    print(f"Mock inference API listening on {mock.url}")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,223 @@
+"""
+Reproducible end-to-end benchmark suite.
+
+Runs the analysis pipeline over the data/companies corpus and synthetic
+policies scaled to multi-MB sizes against the local mock inference server,
+with the inference cache off and a scratch database. Reports, per document:
+
+- keyword extraction (document build + keyword facts + user rights)
+- section extraction for every summary section
+- summarize_policy and extract_facts wall-clock time
+- requests and bytes sent per analysis
+
+then model call latency (mean, p50, p95, p99 per model) and throughput with
+N concurrent analyses, whose latencies are reported per concurrency level.
+Mock latency, jitter and error rate are configurable and seeded, so runs are
+comparable across commits: save one with --json and pass it to --compare.
+
+Usage:
+    python benchmarks/run_suite.py --json before.json
+    python benchmarks/run_suite.py --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from mock_hf_server import MockInferenceServer
+
+POLICY_DIR = os.path.join(ROOT, "data", "companies")
+
+
+def load_corpus(synthetic_mb):
+    corpus = []
+    for fname in sorted(os.listdir(POLICY_DIR)):
+        if fname.endswith('.txt'):
+            with open(os.path.join(POLICY_DIR, fname), "r", encoding="utf-8") as f:
+                corpus.append((os.path.splitext(fname)[0], f.read()))
+    base = "\n".join(text for _, text in corpus)
+    for mb in synthetic_mb:
+        copies = max(1, int(mb * 1024 * 1024 / len(base)))
+        corpus.append((f"synthetic-{mb:g}MB", "\n".join([base] * copies)))
+    return corpus
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def model_latencies(client):
+    """{model: {calls, mean_ms, p50_ms, p95_ms, p99_ms}} of every call the client made."""
+    latencies = {}
+    for model, stats in client.latency_stats().items():
+        if not stats['count']:
+            continue
+        latencies[model] = {'calls': stats['count'], 'mean_ms': round(stats['sum'] / stats['count'] * 1000, 1)}
+        for q in (50, 95, 99):
+            latencies[model][f'p{q}_ms'] = round(client.latency_quantile(model, q / 100, min_samples=1) * 1000, 1)
+    return latencies
+
+
+def run_suite(args):
+    import inference_client
+    from document import PolicyDocument
+    from extractor import PolicyExtractor
+    from pipeline import AnalysisPipeline
+    from summarizer import SECTION_KEYWORDS, Policy_Summarizer
+
+    summarizer, extractor = Policy_Summarizer(), PolicyExtractor()
+    corpus = load_corpus(args.synthetic_mb)
+    documents = []
+
+    with MockInferenceServer(latency=args.latency, latency_per_kb=args.latency_per_kb,
+                             jitter=args.jitter, error_rate=args.error_rate, seed=args.seed) as mock:
+        def use_new_client():
+            # A window holding every call, so the quantiles are exact
+            client = inference_client.InferenceClient(api_url=mock.url, backoff_base=0.01, backoff_cap=0.05,
+                                                      latency_window=1_000_000)
+            inference_client._default_client = summarizer.client = extractor.client = client
+            return client
+
+        client = use_new_client()
+
+        for name, text in corpus:
+            document, keyword_ms = timed(lambda: PolicyDocument(text))
+            _, facts_ms = timed(lambda: (extractor.keyword_extraction(document), extractor.extract_user_rights(document)))
+            _, section_ms = timed(lambda: [summarizer._extract_section(document, k) for k in SECTION_KEYWORDS.values()])
+
+            mock.reset_stats(seed=args.seed)
+            _, summarize_ms = timed(lambda: summarizer.summarize_policy(document))
+            summarize_requests = mock.total_requests
+            _, extract_ms = timed(lambda: extractor.extract_facts(document))
+
+            documents.append({
+                'document': name,
+                'kb': round(len(text) / 1024, 1),
+                'keyword_ms': round(keyword_ms + facts_ms, 2),
+                'section_ms': round(section_ms, 2),
+                'summarize_ms': round(summarize_ms, 1),
+                'extract_ms': round(extract_ms, 1),
+                'requests': mock.total_requests,
+                'summarize_requests': summarize_requests,
+                'kb_sent': round(mock.bytes_received / 1024, 1),
+            })
+
+        model_calls = {'sequential': model_latencies(client)}
+        retries = client.retries
+
+        pipeline = AnalysisPipeline(summarizer, extractor)
+        small = [text for name, text in corpus if not name.startswith("synthetic")]
+        throughput = {}
+        for n in args.concurrency:
+            jobs = [small[i % len(small)] for i in range(max(n, len(small)))]
+            mock.reset_stats(seed=args.seed)
+            client = use_new_client()
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                _, elapsed_ms = timed(lambda: list(pool.map(pipeline.run, jobs)))
+            model_calls[f"{n} concurrent"] = model_latencies(client)
+            retries += client.retries
+            throughput[str(n)] = {
+                'analyses': len(jobs),
+                'analyses_per_s': round(len(jobs) / (elapsed_ms / 1000), 2),
+                'requests_per_analysis': round(mock.total_requests / len(jobs), 1),
+            }
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('json', 'compare')},
+        'documents': documents,
+        'model_calls': model_calls,
+        'throughput': throughput,
+        'retries': retries,
+    }
+
+
+def print_report(results, baseline=None):
+    base_docs = {d['document']: d for d in baseline['documents']} if baseline else {}
+
+    def cell(doc, key, width, digits=1):
+        value = doc[key]
+        old = base_docs.get(doc['document'], {}).get(key)
+        text = f"{value:.{digits}f}"
+        if old:
+            text += f" ({(value - old) / old * 100:+.0f}%)"
+        return f"{text:>{width}}"
+
+    print(f"\nrevision {results['revision']}" + (f" vs {baseline['revision']}" if baseline else ""))
+    columns = [('kb', 'KB', 8, 1), ('keyword_ms', 'keyword ms', 16, 2), ('section_ms', 'section ms', 16, 2),
+               ('summarize_ms', 'summarize ms', 17, 0), ('extract_ms', 'extract ms', 16, 0),
+               ('requests', 'requests', 14, 0), ('kb_sent', 'KB sent', 15, 1)]
+    print(f"{'document':<20}" + "".join(f"{title:>{width}}" for _, title, width, _ in columns))
+    for doc in results['documents']:
+        print(f"{doc['document']:<20}" + "".join(cell(doc, key, width, digits) for key, _, width, digits in columns))
+
+    print(f"\n{'model calls':<36}{'calls':>7}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for phase, models in results['model_calls'].items():
+        print(f"  {phase}")
+        for model, stats in models.items():
+            print(f"    {model:<32}{stats['calls']:>7}" + "".join(
+                f"{stats[key]:>9.1f}" for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms')))
+    print("\nthroughput:")
+    for n, stats in results['throughput'].items():
+        old = baseline['throughput'].get(n) if baseline else None
+        delta = f" ({(stats['analyses_per_s'] - old['analyses_per_s']) / old['analyses_per_s'] * 100:+.0f}%)" if old else ""
+        print(f"  {n:>3} concurrent: {stats['analyses_per_s']:.2f} analyses/s{delta}, "
+              f"{stats['requests_per_analysis']} requests/analysis")
+    print(f"\nretries: {results['retries']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline against a mock inference API.")
+    parser.add_argument("--latency", type=float, default=0.02, help="mock seconds per request")
+    parser.add_argument("--latency-per-kb", type=float, default=0.002, help="mock extra seconds per KB sent")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative spread of mock latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock requests failing with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--synthetic-mb", type=float, nargs="*", default=[1, 4], help="sizes of synthetic policies")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16], help="concurrent analyses to test")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    os.environ["INFERENCE_CACHE"] = "off"
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["POLICY_DB_PATH"] = os.path.join(tmp, "policies.db")
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                results = run_suite(args)
+            finally:
+                sys.stdout = stdout
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
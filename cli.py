@@ -0,0 +1,234 @@
+"""
+Headless bulk analysis of privacy policies.
+
+Analyzes policy files (.txt, or .html/.htm/.pdf, which are cleaned up by
+src/ingest.py), directories of them and JSONL batches with a
+bounded pool of workers and streams one JSON line per document to the output
+as soon as it finishes. Content hashes of complete analyses (no task timed
+out or failed, no fact fell back to keywords) are appended to a checkpoint
+file, so an interrupted run picks up where it stopped and a resumed run
+retries the rest.
+
+Usage:
+    python cli.py data/companies --output analyses.jsonl
+    python cli.py batch.jsonl --workers 8 --text-field body
+
+The output doubles as a precomputed-analysis file for the app (see
+src/samples.py).
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from document import PolicyDocument
+from ingest import ingest_file
+
+ID_FIELDS = ("id", "website_name", "name", "request_id")
+TEXT_FIELDS = ("text", "policy_text", "body")
+POLICY_EXTENSIONS = (".txt", ".html", ".htm", ".pdf")
+
+
+def iter_inputs(paths, text_field=None):
+    """Yields (id, text) for every policy in the given files, directories and JSONL batches, one at a time."""
+    for path in paths:
+        if os.path.isdir(path):
+            for fname in sorted(os.listdir(path)):
+                if fname.lower().endswith(POLICY_EXTENSIONS):
+                    yield from iter_inputs([os.path.join(path, fname)], text_field)
+        elif path.endswith('.jsonl'):
+            with open(path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    fields = (text_field,) if text_field else TEXT_FIELDS
+                    text = next((record[k] for k in fields if isinstance(record.get(k), str)), None)
+                    if text is None:
+                        print(f"⚠️ {path}:{line_number} has no text field, skipping", file=sys.stderr)
+                        continue
+                    doc_id = next((str(record[k]) for k in ID_FIELDS if k in record), f"{path}:{line_number}")
+                    yield doc_id, text
+        elif path.lower().endswith(".txt"):
+            with open(path, "r", encoding="utf-8") as f:
+                yield os.path.splitext(os.path.basename(path))[0], f.read()
+        else:
+            yield os.path.splitext(os.path.basename(path))[0], ingest_file(path).text
+
+
+def count_inputs(paths, text_field=None):
+    """Counts documents without keeping them, for progress and ETA."""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(1 for fname in os.listdir(path) if fname.lower().endswith(POLICY_EXTENSIONS))
+        elif path.endswith('.jsonl'):
+            with open(path, "r", encoding="utf-8") as f:
+                total += sum(1 for line in f if line.strip())
+        else:
+            total += 1
+    return total
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class Progress:
+    """Prints throughput and ETA to stderr at most once a second."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self._last_print = 0.0
+
+    def update(self, failed=False, skipped=False):
+        if skipped:
+            self.skipped += 1
+        else:
+            self.done += 1
+            self.failed += failed
+        self.report()
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_print < 1.0:
+            return
+        self._last_print = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = self.total - self.done - self.skipped
+        eta = f"{remaining / rate:.0f}s" if rate else "?"
+        print(
+            f"\r{self.done + self.skipped}/{self.total} "
+            f"({self.skipped} resumed, {self.failed} failed) {rate:.2f} docs/s, ETA {eta}   ",
+            end="", file=sys.stderr, flush=True
+        )
+
+
+def analyze_one(pipeline, doc_id, document, store):
+    from pipeline import PIPELINE_VERSION, is_complete
+
+    started = time.perf_counter()
+    analysis = pipeline.analyze(document) if store else pipeline.run(document)
+    record = {
+        'id': doc_id,
+        'content_hash': document.content_hash,
+        'pipeline_version': PIPELINE_VERSION,
+        'summary': analysis['summary'],
+        'extracted_facts': analysis['extracted_facts'],
+        'from_store': analysis.get('from_store', False),
+        'complete': is_complete(analysis),
+        'elapsed_s': round(time.perf_counter() - started, 3),
+    }
+    if analysis.get('timed_out'):
+        record['timed_out'] = analysis['timed_out']
+    if analysis.get('failed'):
+        record['failed'] = analysis['failed']
+    return record
+
+
+def run(args):
+    from database import init_db
+    from extractor import PolicyExtractor
+    from cancellation import BULK
+    from pipeline import AnalysisPipeline
+    from summarizer import Policy_Summarizer
+
+    init_db()
+    # Bulk priority, so an app sharing the process's gateway stays responsive
+    pipeline = AnalysisPipeline(Policy_Summarizer(), PolicyExtractor(), max_workers=args.calls_per_document,
+                                priority=BULK, deadline=args.deadline)
+    checkpoint = args.checkpoint or f"{args.output}.checkpoint"
+    completed = load_checkpoint(checkpoint)
+    progress = Progress(count_inputs(args.inputs, args.text_field))
+    write_lock = threading.Lock()
+
+    with open(args.output, "a", encoding="utf-8") as out, \
+            open(checkpoint, "a", encoding="utf-8") as done_log, \
+            ThreadPoolExecutor(max_workers=args.workers) as pool:
+
+        def finish(future, doc_id, content_hash):
+            try:
+                record = future.result()
+                # Partial or degraded results are written, but the document is retried on the next run
+                failed = not record['complete']
+            except Exception as e:
+                record, failed = {'id': doc_id, 'content_hash': content_hash, 'error': str(e)}, True
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if not failed:
+                    done_log.write(content_hash + "\n")
+                    done_log.flush()
+                    completed.add(content_hash)
+                progress.update(failed=failed)
+
+        # At most 2x workers documents are held in memory at any time
+        in_flight = {}
+        for doc_id, text in iter_inputs(args.inputs, args.text_field):
+            document = PolicyDocument(text)
+            if document.content_hash in completed:
+                progress.update(skipped=True)
+                continue
+            if len(in_flight) >= 2 * args.workers:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(future, *in_flight.pop(future))
+            future = pool.submit(analyze_one, pipeline, doc_id, document, not args.no_store)
+            in_flight[future] = (doc_id, document.content_hash)
+        for future in list(in_flight):
+            finish(future, *in_flight.pop(future))
+    progress.report(force=True)
+    print(file=sys.stderr)
+    elapsed = time.perf_counter() - progress.started
+    print(
+        f"✅ {progress.done} analyzed ({progress.failed} failed), {progress.skipped} already done, "
+        f"{elapsed:.1f}s, {progress.done / elapsed if elapsed else 0:.2f} docs/s -> {args.output}",
+        file=sys.stderr
+    )
+    if args.metrics:
+        import telemetry
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            if args.metrics.endswith(".json"):
+                json.dump(telemetry.export_json(), f, indent=2)
+            else:
+                f.write(telemetry.export_prometheus())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze privacy policies in bulk and write JSONL results.")
+    parser.add_argument("inputs", nargs="+", help="policy files (.txt/.html/.pdf), directories of them, or .jsonl batches")
+    parser.add_argument("--output", "-o", default="analyses.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--checkpoint", help="file of completed content hashes (default: <output>.checkpoint)")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="documents analyzed at the same time")
+    parser.add_argument("--calls-per-document", type=int, default=None, help="model calls in flight per document")
+    parser.add_argument("--text-field", help="JSONL field holding the policy text (default: text/policy_text/body)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="seconds per document before its partial results are written (default: no limit)")
+    parser.add_argument("--no-store", action="store_true", help="don't reuse or save analyses in policies.db")
+    parser.add_argument("--metrics", help="write run metrics here (.json for JSON, Prometheus text otherwise)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="show the pipeline's own progress output")
+    args = parser.parse_args()
+
+    if args.verbose:
+        run(args)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+"""
+Headless HTTP service for analyzing privacy policies.
+
+Lets other services submit policies and poll or stream the results as JSON,
+without the Streamlit app. It is built on asyncio streams, not a web
+framework. The event loop only parses requests and hands results to
+clients. Each running analysis runs AnalysisPipeline.stream in one of
+--workers threads.
+
+Submissions are admitted through a bounded queue, so hundreds can be in
+flight while only a few dozen hold threads. Running more analyses than the
+inference gateway has calls in flight only adds threads that wait for it.
+A submission that finds the queue full gets 503 with a Retry-After estimate
+instead of waiting, so callers back off rather than pile up. Analyses
+cancelled while queued give their slot back at once. Blob store reads and
+writes run in threads too, never on the event loop.
+
+    POST   /analyses                  submit a policy -> 202 {"id": ..., "status": "queued", ...}
+                                      JSON {"text", "website_name", "priority", "deadline"}, or the raw
+                                      page (text/html, application/pdf, text/plain), which is ingested
+                                      like an upload, with those fields as query parameters
+    GET    /analyses/{id}             status and the latest, possibly partial, analysis
+    GET    /analyses/{id}/events      Server-Sent Events, one per result as it comes in
+    DELETE /analyses/{id}             cancels a queued or running analysis
+    GET    /policies?q=&limit=        saved policies, full-text searched with q
+    GET    /policies/{name}           a saved policy's text and versions
+    GET    /policies/{name}/analysis  the stored analysis of its current text
+    GET    /healthz                   queue and worker state; 503 while the queue is full
+    GET    /metrics                   Prometheus metrics
+
+Finished analyses are kept in the blob store (src/blob_store.py); the last
+--keep jobs can be polled.
+
+Usage:
+    python service.py --port 8080 --workers 32 --queue 1024
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+import telemetry
+from blob_store import get_blob_store
+from cancellation import BULK, INTERACTIVE, CancelToken, Cancelled
+from database import (get_policy_text, init_db, list_policies, list_policy_versions, load_analysis,
+                      save_policy_to_db, search_policies)
+from document import content_hash, normalize_text
+from ingest import ingest_file
+
+MAX_HEADER_BYTES = 64 * 1024
+PRIORITIES = {"interactive": INTERACTIVE, "bulk": BULK}
+# Raw upload content types, as the file names ingestion detects their format from
+UPLOAD_FILENAMES = {"text/html": "policy.html", "application/xhtml+xml": "policy.html",
+                    "application/pdf": "policy.pdf", "text/plain": "policy.txt"}
+FINISHED = ("done", "failed", "cancelled")
+# Seconds between SSE keep-alive comments while nothing changes
+KEEPALIVE_SECONDS = 15
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Job:
+    """One submitted analysis. Only touched from the event loop."""
+
+    __slots__ = ("id", "website_name", "text_key", "priority", "deadline", "status", "stage", "submitted_at",
+                 "started_at", "finished_at", "analysis", "analysis_key", "error", "version", "changed", "token")
+
+    def __init__(self, text_key, website_name, priority, deadline):
+        self.id = uuid.uuid4().hex
+        self.text_key = text_key
+        self.website_name = website_name
+        self.priority = priority
+        self.deadline = deadline
+        self.status = "queued"
+        self.stage = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.analysis = None
+        self.analysis_key = None
+        self.error = None
+        self.version = 0
+        self.changed = asyncio.Event()
+        self.token = CancelToken(priority)
+
+    def notify(self):
+        """Wakes everyone waiting for a change of this job."""
+        self.version += 1
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self, analysis=None):
+        """The job as JSON. A finished analysis lives in the blob store; the caller reads it and passes it in."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'website_name': self.website_name,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'analysis': self.analysis if analysis is None else analysis,
+        }
+
+
+class AnalysisService:
+    """
+    Job queue, worker pool and HTTP front for one AnalysisPipeline.
+
+    workers: analyses run at the same time, one thread each.
+    queue_size: submitted analyses that may wait for a worker; more get 503.
+    keep: finished jobs whose results stay available.
+    """
+
+    def __init__(self, pipeline, workers=32, queue_size=1024, max_body_bytes=16 * 1024 * 1024, keep=10000):
+        self.pipeline = pipeline
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_body_bytes = max_body_bytes
+        self.keep = keep
+        self.jobs = OrderedDict()
+        self.running = 0
+        # Jobs still waiting for a worker. The queue itself is unbounded, since jobs cancelled while queued stay in it
+        # until a worker skips them; admission counts these instead.
+        self.queued = 0
+        self.queue = None
+        self._mean_seconds = 1.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service-analysis")
+        self._loop = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Starts the workers and the HTTP server; returns the asyncio server."""
+        self._loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        for _ in range(self.workers):
+            self._loop.create_task(self._worker())
+        return await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await self.start(host, port)
+        print(f"🌐 Serving analyses on http://{host}:{server.sockets[0].getsockname()[1]}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    # Workers
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            if job.status != "queued":
+                continue
+            self.queued -= 1
+            job.status = "running"
+            job.started_at = time.time()
+            job.notify()
+            telemetry.observe("service_queue_wait_seconds", job.started_at - job.submitted_at)
+            self.running += 1
+            try:
+                await self._loop.run_in_executor(self._executor, self._run, job)
+                job.status = "done"
+            except Cancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.status, job.error = "failed", str(e)
+            finally:
+                self.running -= 1
+            job.finished_at = time.time()
+            seconds = job.finished_at - job.started_at
+            self._mean_seconds = 0.9 * self._mean_seconds + 0.1 * seconds
+            telemetry.observe("service_analysis_seconds", seconds)
+            telemetry.inc("service_analyses_total", status=job.status)
+            job.notify()
+            self._forget_old_jobs()
+
+    def _run(self, job):
+        """Runs one analysis in a worker thread, publishing each result to the event loop."""
+        text = get_blob_store().get_text(job.text_key)
+        if text is None:
+            raise RuntimeError("The policy text expired before the analysis started")
+        if job.website_name:
+            save_policy_to_db(job.website_name, text)
+        if job.deadline:
+            job.token.set_timeout(job.deadline)
+        events = self.pipeline.stream(text, job.website_name, cancel=job.token)
+        try:
+            for event in events:
+                analysis = {k: v for k, v in event.analysis.items() if k != 'task_results'}
+                analysis_key = get_blob_store().put_json(analysis) if event.kind == "done" else None
+                self._loop.call_soon_threadsafe(self._publish, job, event.kind, analysis, analysis_key)
+        finally:
+            events.close()
+
+    def _publish(self, job, stage, analysis, analysis_key=None):
+        job.stage = stage
+        if analysis_key is not None:
+            # The worker marks the job done and notifies right after this
+            job.analysis_key = analysis_key
+            job.analysis = None
+            return
+        job.analysis = analysis
+        job.notify()
+
+    def _forget_old_jobs(self):
+        while len(self.jobs) > self.keep:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status not in FINISHED:
+                break
+            del self.jobs[oldest.id]
+
+    def retry_after(self):
+        """Seconds until a queue slot likely frees up, from the recent mean analysis time."""
+        return max(1, round(self.queued * self._mean_seconds / self.workers))
+
+    def _full(self):
+        return self.queued >= self.queue_size
+
+    async def _describe(self, job):
+        """job.to_dict(), reading a finished analysis from the blob store in a thread."""
+        analysis = None
+        if job.analysis is None and job.analysis_key is not None:
+            analysis = await self._loop.run_in_executor(None, get_blob_store().get_json, job.analysis_key)
+        return job.to_dict(analysis)
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send(writer, e.status, {'error': e.message}, e.headers, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                started = time.perf_counter()
+                try:
+                    response = await self._route(method, path, query, headers, body, writer)
+                except HTTPError as e:
+                    response = (e.status, {'error': e.message}, e.headers)
+                except Exception as e:
+                    response = (500, {'error': str(e)}, {})
+                telemetry.observe("service_request_seconds", time.perf_counter() - started, method=method)
+                if response is None:
+                    # Streamed; the connection is done
+                    break
+                status, payload, extra = response
+                telemetry.inc("service_requests_total", method=method, status=str(status))
+                await self._send(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Returns (method, path, query, headers, body) of the next request, or None when the client is done."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise HTTPError(400, "Incomplete request")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "Send a Content-Length instead of a chunked body")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Body larger than {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return method.upper(), unquote(url.path), parse_qs(url.query), headers, body
+
+    async def _send(self, writer, status, payload, headers=None, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+        head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _route(self, method, path, query, headers, body, writer):
+        """Returns (status, payload, headers), or None after streaming the response itself."""
+        parts = [part for part in path.split("/") if part]
+        if parts == ["healthz"] and method == "GET":
+            return self._health()
+        if parts == ["metrics"] and method == "GET":
+            return 200, telemetry.export_prometheus() + self._gauges(), {}
+        if parts[:1] == ["analyses"]:
+            if len(parts) == 1:
+                if method != "POST":
+                    raise HTTPError(405, f"{method} not allowed on /analyses", {"Allow": "POST"})
+                return await self._submit(query, headers, body)
+            job = self.jobs.get(parts[1]) if len(parts) > 1 else None
+            if job is None:
+                raise HTTPError(404, "No such analysis")
+            if len(parts) == 2 and method == "GET":
+                return 200, await self._describe(job), {}
+            if len(parts) == 2 and method == "DELETE":
+                return await self._cancel(job)
+            if len(parts) == 3 and parts[2] == "events" and method == "GET":
+                await self._stream(job, writer)
+                return None
+        if parts[:1] == ["policies"] and method == "GET":
+            return await self._policies(parts[1:], query)
+        raise HTTPError(404 if method in ("GET", "POST", "DELETE") else 405, f"No route for {method} {path}")
+
+    async def _submit(self, query, headers, body):
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type == "application/json" or (not content_type and body.lstrip().startswith(b"{")):
+            try:
+                fields = json.loads(body)
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            if not isinstance(fields, dict):
+                raise HTTPError(400, "Expected a JSON object")
+            text = fields.get("text")
+        else:
+            fields = {k: v[-1] for k, v in query.items()}
+            filename = UPLOAD_FILENAMES.get(content_type, fields.get("filename"))
+            ingested = await self._loop.run_in_executor(None, ingest_file, io.BytesIO(body), filename)
+            text = ingested.text
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(400, "No policy text")
+        priority = PRIORITIES.get(fields.get("priority") or "bulk")
+        if priority is None:
+            raise HTTPError(400, f"priority must be one of {', '.join(PRIORITIES)}")
+        try:
+            deadline = float(fields["deadline"]) if fields.get("deadline") else None
+        except (TypeError, ValueError):
+            raise HTTPError(400, "deadline must be a number of seconds")
+
+        if self._full():
+            telemetry.inc("service_rejected_total")
+            raise HTTPError(503, "Analysis queue is full, retry later", {"Retry-After": str(self.retry_after())})
+        # Holds the slot while the text is stored
+        self.queued += 1
+        try:
+            text_key = await self._loop.run_in_executor(None, get_blob_store().put_text, text)
+        except BaseException:
+            self.queued -= 1
+            raise
+        job = Job(text_key, fields.get("website_name") or None, priority, deadline)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return 202, job.to_dict(), {"Location": f"/analyses/{job.id}"}
+
+    async def _cancel(self, job):
+        if job.status in FINISHED:
+            raise HTTPError(409, f"Analysis already {job.status}")
+        if job.status == "queued":
+            # Its queue entry stays until a worker skips it, but the slot is free now
+            self.queued -= 1
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            job.notify()
+        else:
+            # The worker sees it within 0.1 s and marks the job cancelled
+            job.token.cancel()
+        return 202, await self._describe(job), {}
+
+    async def _stream(self, job, writer):
+        """Sends the job as Server-Sent Events: its state now, on every change, and once it finishes."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        telemetry.inc("service_requests_total", method="GET", status="200")
+        sent = -1
+        while True:
+            changed = job.changed
+            if job.version != sent:
+                sent = job.version
+                event = job.status if job.status in FINISHED else job.stage or job.status
+                data = json.dumps(await self._describe(job), ensure_ascii=False)
+                writer.write(f"event: {event}\ndata: {data}\n\n".encode("utf-8"))
+                await writer.drain()
+                if job.status in FINISHED:
+                    return
+            try:
+                await asyncio.wait_for(changed.wait(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                writer.write(b": keep-alive\n\n")
+                await writer.drain()
+
+    async def _policies(self, parts, query):
+        run = self._loop.run_in_executor
+        if not parts:
+            try:
+                limit = min(int(query.get("limit", ["50"])[-1]), 500)
+            except ValueError:
+                raise HTTPError(400, "limit must be a number")
+            q = query.get("q", [""])[-1]
+            policies = await (run(None, search_policies, q, limit) if q.strip() else run(None, list_policies, limit))
+            return 200, {'policies': policies}, {}
+        name = parts[0]
+        text = await run(None, get_policy_text, name)
+        if text is None:
+            raise HTTPError(404, "No such policy")
+        if len(parts) == 1:
+            versions = await run(None, list_policy_versions, name)
+            return 200, {'website_name': name, 'text': text, 'versions': versions}, {}
+        if parts[1:] == ["analysis"]:
+            from pipeline import PIPELINE_VERSION
+
+            analysis = await run(None, load_analysis, content_hash(normalize_text(text)), PIPELINE_VERSION)
+            if analysis is None:
+                raise HTTPError(404, "This policy has not been analyzed yet")
+            return 200, dict(analysis, website_name=name), {}
+        raise HTTPError(404, "No such resource")
+
+    def _health(self):
+        saturated = self._full()
+        return 503 if saturated else 200, {
+            'status': "saturated" if saturated else "ok",
+            'queued': self.queued,
+            'queue_size': self.queue_size,
+            'running': self.running,
+            'workers': self.workers,
+            'jobs': len(self.jobs),
+        }, {"Retry-After": str(self.retry_after())} if saturated else {}
+
+    def _gauges(self):
+        return (f"# TYPE service_queue_depth gauge\nservice_queue_depth {self.queued}\n"
+                f"# TYPE service_running_analyses gauge\nservice_running_analyses {self.running}\n")
+
+
+def build_pipeline(calls_per_analysis=None):
+    from extractor import PolicyExtractor
+    from pipeline import AnalysisPipeline
+    from summarizer import Policy_Summarizer
+
+    init_db()
+    return AnalysisPipeline(Policy_Summarizer(), PolicyExtractor(), max_workers=calls_per_analysis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve privacy policy analyses over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", "-w", type=int, default=32, help="analyses run at the same time")
+    parser.add_argument("--queue", type=int, default=1024, help="analyses that may wait for a worker")
+    parser.add_argument("--calls-per-analysis", type=int, default=4, help="model calls in flight per analysis")
+    parser.add_argument("--max-body-mb", type=float, default=16, help="largest accepted request body")
+    parser.add_argument("--keep", type=int, default=10000, help="finished analyses kept for polling")
+    parser.add_argument("--verbose", "-v", action="store_true", help="show the pipeline's own progress output")
+    args = parser.parse_args()
+
+    service = AnalysisService(build_pipeline(args.calls_per_analysis), workers=args.workers, queue_size=args.queue,
+                              max_body_bytes=int(args.max_body_mb * 1024 * 1024), keep=args.keep)
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
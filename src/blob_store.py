@@ -0,0 +1,179 @@
+"""
+Process-wide content-addressed store for large session values.
+
+Streamlit keeps st.session_state in memory, per session, so every policy
+text or analysis held there is another copy for each session and each
+recent report. Sessions keep the sha256 key of such a value instead, and
+this store holds one zlib-compressed copy of it however many sessions refer
+to it.
+
+The memory tier is an LRU bounded by `max_bytes` of compressed data. Blobs
+it evicts spill to a SQLite file next to policies.db, bounded by
+`max_disk_bytes`, and move back into memory when read again.
+
+    key = get_blob_store().put_text(policy_text)
+    policy_text = get_blob_store().get_text(key)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import telemetry
+from database import DB_PATH
+
+BLOB_STORE_PATH = os.path.join(os.path.dirname(DB_PATH), "session_blobs.db")
+
+
+class BlobStore:
+    """Thread-safe two-tier blob store keyed by the sha256 of the uncompressed bytes."""
+
+    def __init__(self, path=BLOB_STORE_PATH, max_bytes=64 * 1024 * 1024, max_disk_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.spills = 0
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._spills_since_trim = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_accessed ON blobs (accessed_at)")
+
+    def put(self, data):
+        """Stores `data` (bytes) if it is not stored yet and returns its key."""
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                telemetry.inc("blob_store_puts_total", result="duplicate")
+                return key
+        compressed = zlib.compress(data, 1)
+        with self._lock:
+            if key not in self._memory:
+                self._remember(key, compressed)
+        telemetry.inc("blob_store_puts_total", result="stored")
+        return key
+
+    def get(self, key):
+        """Returns the bytes stored under `key`, or None if they were never stored or have been evicted."""
+        with self._lock:
+            compressed = self._memory.get(key)
+            if compressed is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                telemetry.inc("blob_store_lookups_total", result="hit", tier="memory")
+            elif self._conn is not None:
+                row = self._conn.execute("SELECT data FROM blobs WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    compressed = row[0]
+                    self._conn.execute("UPDATE blobs SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, compressed)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    telemetry.inc("blob_store_lookups_total", result="hit", tier="sqlite")
+            if compressed is None:
+                self.misses += 1
+                telemetry.inc("blob_store_lookups_total", result="miss")
+                return None
+        return zlib.decompress(compressed)
+
+    def put_text(self, text):
+        return self.put(text.encode("utf-8"))
+
+    def get_text(self, key):
+        data = self.get(key) if key else None
+        return data.decode("utf-8") if data is not None else None
+
+    def put_json(self, value):
+        """Stores a JSON-serializable value; equal values get the same key."""
+        return self.put(json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+    def get_json(self, key):
+        data = self.get(key) if key else None
+        return json.loads(data) if data is not None else None
+
+    def stats(self):
+        """Returns counters and the memory tier's size for this process."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'spills': self.spills,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._bytes,
+            }
+
+    def _remember(self, key, compressed):
+        self._memory[key] = compressed
+        self._bytes += len(compressed)
+        # Without a disk tier the newest blob stays, even over budget, so it is never lost
+        keep = 0 if self._conn is not None else 1
+        while self._bytes > self.max_bytes and len(self._memory) > keep:
+            evicted, data = self._memory.popitem(last=False)
+            self._bytes -= len(data)
+            if self._conn is not None:
+                self._spill(evicted, data)
+
+    def _spill(self, key, compressed):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs (key, data, size, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, compressed, len(compressed), time.time())
+        )
+        self.spills += 1
+        telemetry.inc("blob_store_spills_total")
+        self._spills_since_trim += 1
+        if self._spills_since_trim >= 50:
+            self._trim()
+
+    def _trim(self):
+        """Drops least recently used spilled blobs until the file holds at most max_disk_bytes."""
+        self._spills_since_trim = 0
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - self.max_disk_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM blobs ORDER BY accessed_at"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM blobs WHERE key = ?", doomed)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Returns the process-wide BlobStore."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = BlobStore(
+                max_bytes=int(os.getenv("BLOB_STORE_MAX_BYTES", 64 * 1024 * 1024)),
+                max_disk_bytes=int(os.getenv("BLOB_STORE_MAX_DISK_BYTES", 1024 * 1024 * 1024)),
+            )
+        return _default_store
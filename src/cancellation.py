@@ -0,0 +1,104 @@
+"""
+Cooperative cancellation of an analysis.
+
+A CancelToken is bound to the threads working on one analysis (run_tasks
+passes it on to its workers). The inference client checks it before every
+request and while backing off, so once it is cancelled no new model calls
+start; requests already on the wire finish or time out on their own. The
+token also carries the analysis's priority for the inference gateway and its
+deadline: past it every check raises DeadlineExceeded, and model calls made
+before it time out no later than it.
+"""
+import threading
+import time
+from functools import wraps
+
+# CancelToken priorities in the inference gateway's queue; lower runs first
+INTERACTIVE = 0
+BULK = 10
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """Raised inside work whose CancelToken was cancelled."""
+
+
+class DeadlineExceeded(Cancelled):
+    """Raised inside work whose CancelToken's deadline has passed."""
+
+
+class CancelToken:
+    """
+    Cancellation flag of one analysis. `priority` orders its model calls in
+    the inference gateway's queue; lower runs first. `timeout` is the
+    seconds from now until the deadline, None for no deadline.
+    """
+
+    def __init__(self, priority=INTERACTIVE, timeout=None):
+        self.priority = priority
+        self.deadline = None
+        self._event = threading.Event()
+        if timeout is not None:
+            self.set_timeout(timeout)
+
+    def set_timeout(self, seconds):
+        """Sets the deadline `seconds` from now."""
+        self.deadline = time.monotonic() + seconds
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self):
+        """Seconds left until the deadline (at least 0), or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+        if self.expired:
+            raise DeadlineExceeded()
+
+    def sleep(self, seconds):
+        """
+        Sleeps like time.sleep, but raises Cancelled as soon as the token is
+        cancelled, and DeadlineExceeded if the deadline comes first.
+        """
+        remaining = self.remaining()
+        if self._event.wait(seconds if remaining is None else min(seconds, remaining)):
+            raise Cancelled()
+        if remaining is not None and remaining < seconds:
+            raise DeadlineExceeded()
+
+
+def current_token():
+    """The CancelToken bound to this thread, or None."""
+    return getattr(_local, "token", None)
+
+
+def bind(fn, token=None):
+    """Wraps `fn` to run with `token` (default: the calling thread's token) bound to its thread."""
+    token = token or current_token()
+    if token is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "token", None)
+        _local.token = token
+        try:
+            token.raise_if_cancelled()
+            return fn(*args, **kwargs)
+        finally:
+            _local.token = previous
+    return wrapper
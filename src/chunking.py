@@ -0,0 +1,69 @@
+import re
+import zlib
+
+# Roughly what facebook/bart-large-cnn reads within its 1024-token window
+CHUNK_CHARS = 3000
+
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(text):
+    """Splits text into sentences on terminal punctuation followed by whitespace."""
+    return [s.strip() for s in SENTENCE_BREAK.split(text) if s.strip()]
+
+
+def _split_oversized(sentence, budget):
+    """Splits a single sentence longer than the budget on word boundaries."""
+    pieces, current = [], ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > budget:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {word}" if current else word[:budget]
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _units(text, budget):
+    """Paragraphs that fit the budget, otherwise their sentences (or word runs)."""
+    units = []
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= budget:
+            units.append(paragraph)
+            continue
+        for sentence in split_sentences(paragraph):
+            units.extend([sentence] if len(sentence) <= budget else _split_oversized(sentence, budget))
+    return units
+
+
+def _is_anchor(unit):
+    """Content-defined boundary: about one unit in four ends a chunk once it is half full."""
+    return zlib.crc32(unit.encode("utf-8")) % 4 == 0
+
+
+def split_into_chunks(text, budget=CHUNK_CHARS):
+    """
+    Splits text into chunks of at most `budget` characters on paragraph and
+    sentence boundaries.
+
+    Chunk boundaries are content-defined, so editing one paragraph changes
+    only the chunk holding it (and at most its neighbour) and every other
+    chunk comes out byte-for-byte the same as before.
+    """
+    chunks, current, size = [], [], 0
+    for unit in _units(text, budget):
+        if current and size + len(unit) + 1 > budget:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += len(unit) + 1
+        if size >= budget // 2 and _is_anchor(unit):
+            chunks.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
@@ -1,53 +1,491 @@
 import sqlite3
+import json
 import os
+import threading
+import zlib
 from datetime import datetime
 
+import similarity
+import telemetry
+from document import apply_delta, normalize_text, paragraph_delta
+from document import content_hash as text_hash
+
 DATABASE_NAME = "policies.db"
-DB_PATH = os.path.join(os.path.dirname(__file__), os.pardir, DATABASE_NAME)
+DB_PATH = os.getenv("POLICY_DB_PATH", os.path.join(os.path.dirname(__file__), os.pardir, DATABASE_NAME))
 
-def init_db():
-    """Initializes the SQLite database and creates the policies table if it doesn't exist."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS policies (
-            website_name TEXT PRIMARY KEY,
-            policy_text TEXT NOT NULL,
-            date_saved TEXT NOT NULL
-        )
+# Every this many versions of a policy is stored in full, bounding how many
+# deltas have to be applied to rebuild one
+SNAPSHOT_EVERY = 10
+
+_connection = None
+_lock = threading.RLock()
+_fts_enabled = False
+
+def get_connection():
+    """Returns the process-wide SQLite connection, opening it in WAL mode on first use.
+
+    The connection is shared across threads; callers serialize access through `_lock`.
+    """
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+            _connection.execute("PRAGMA journal_mode=WAL")
+            _connection.execute("PRAGMA synchronous=NORMAL")
+        return _connection
+
+def _create_fts(cursor):
+    """Creates the FTS5 index over policy texts if this SQLite build supports it."""
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'policies_fts'"
+    ).fetchone()
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS policies_fts USING fts5(
+                website_name, policy_text, content='policies', content_rowid='rowid'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable ({e}); falling back to LIKE search")
+        return False
+    # Keep the index in step with the policies table
+    cursor.executescript("""
+        CREATE TRIGGER IF NOT EXISTS policies_ai AFTER INSERT ON policies BEGIN
+            INSERT INTO policies_fts(rowid, website_name, policy_text)
+            VALUES (new.rowid, new.website_name, new.policy_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS policies_ad AFTER DELETE ON policies BEGIN
+            INSERT INTO policies_fts(policies_fts, rowid, website_name, policy_text)
+            VALUES ('delete', old.rowid, old.website_name, old.policy_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS policies_au AFTER UPDATE ON policies BEGIN
+            INSERT INTO policies_fts(policies_fts, rowid, website_name, policy_text)
+            VALUES ('delete', old.rowid, old.website_name, old.policy_text);
+            INSERT INTO policies_fts(rowid, website_name, policy_text)
+            VALUES (new.rowid, new.website_name, new.policy_text);
+        END;
     """)
-    conn.commit()
-    conn.close()
+    if not exists:
+        # Index policies saved before full-text search existed
+        cursor.execute("INSERT INTO policies_fts(policies_fts) VALUES ('rebuild')")
+    return True
+
+@telemetry.timed("db:init_db")
+def init_db():
+    """Initializes the SQLite database and creates the policies table and search index if they don't exist."""
+    global _fts_enabled
+    with _lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS policies (
+                website_name TEXT PRIMARY KEY,
+                policy_text TEXT NOT NULL,
+                date_saved TEXT NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_policies_date ON policies (date_saved DESC, website_name)")
+        _fts_enabled = _create_fts(cursor)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                content_hash TEXT NOT NULL,
+                pipeline_version TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                extracted_facts TEXT NOT NULL,
+                date_analyzed TEXT NOT NULL,
+                PRIMARY KEY (content_hash, pipeline_version)
+            )
+        """)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(analyses)")}
+        if "task_results" not in columns:
+            cursor.execute("ALTER TABLE analyses ADD COLUMN task_results TEXT")
+        # 0 for an analysis some task failed in: only its task results are kept for reuse
+        if "complete" not in columns:
+            cursor.execute("ALTER TABLE analyses ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS policy_versions (
+                website_name TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                is_snapshot INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                date_saved TEXT NOT NULL,
+                PRIMARY KEY (website_name, version)
+            )
+        """)
+        # MinHash signatures and their LSH band keys, for near-duplicate lookups
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS policy_signatures (
+                content_hash TEXT PRIMARY KEY,
+                signature BLOB NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS policy_lsh (
+                band_key INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                PRIMARY KEY (band_key, content_hash)
+            ) WITHOUT ROWID
+        """)
+        # Row keys and category dictionaries of the fact matrix (see fact_store.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fact_rows (
+                row INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                website_name TEXT,
+                content_hash TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fact_values (
+                fact TEXT NOT NULL,
+                code INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (fact, code)
+            )
+        """)
+        # Policies saved before versioning start their history with the current text
+        for website_name, policy_text, date_saved in cursor.execute("""
+            SELECT website_name, policy_text, date_saved FROM policies
+            WHERE website_name NOT IN (SELECT website_name FROM policy_versions)
+        """).fetchall():
+            _add_version(cursor, website_name, policy_text, date_saved)
+        # Policies saved before the near-duplicate index get their signatures
+        for (policy_text,) in cursor.execute("""
+            SELECT policy_text FROM policies
+            WHERE website_name NOT IN (
+                SELECT v.website_name FROM policy_versions AS v JOIN policy_signatures AS s USING (content_hash)
+            )
+        """).fetchall():
+            normalized = normalize_text(policy_text)
+            _index_signature(cursor, text_hash(normalized), similarity.minhash(normalized))
+        conn.commit()
     print(f"Database initialized at {DB_PATH}")
 
+@telemetry.timed("db:save_policy_to_db")
 def save_policy_to_db(website_name: str, policy_text: str):
     """Saves a privacy policy to the database. Updates if website_name exists, inserts otherwise."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
     date_saved = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    try:
-        cursor.execute(
-            "INSERT INTO policies (website_name, policy_text, date_saved) VALUES (?, ?, ?)",
+    with _lock:
+        conn = get_connection()
+        conn.execute(
+            """
+            INSERT INTO policies (website_name, policy_text, date_saved) VALUES (?, ?, ?)
+            ON CONFLICT(website_name) DO UPDATE SET
+                policy_text = excluded.policy_text, date_saved = excluded.date_saved
+            """,
             (website_name, policy_text, date_saved)
         )
-    except sqlite3.IntegrityError:
-        # If website_name already exists, update the existing record
-        cursor.execute(
-            "UPDATE policies SET policy_text = ?, date_saved = ? WHERE website_name = ?",
-            (policy_text, date_saved, website_name)
+        version = _add_version(conn, website_name, policy_text, date_saved)
+        normalized = normalize_text(policy_text)
+        _index_signature(conn, text_hash(normalized), similarity.minhash(normalized))
+        conn.commit()
+    print(f"Policy for {website_name} saved/updated in database (version {version}).")
+
+def _add_version(conn, website_name, policy_text, date_saved):
+    """
+    Appends policy_text to the website's history unless it matches the latest
+    version. Stores a zlib-compressed paragraph delta against the previous
+    version, or the full text every SNAPSHOT_EVERY versions. Returns the
+    version number of the text.
+    """
+    digest = text_hash(normalize_text(policy_text))
+    latest = conn.execute(
+        "SELECT version, content_hash FROM policy_versions WHERE website_name = ? ORDER BY version DESC LIMIT 1",
+        (website_name,)
+    ).fetchone()
+    if latest is not None and latest[1] == digest:
+        return latest[0]
+    version = latest[0] + 1 if latest else 1
+    if latest is None or (version - 1) % SNAPSHOT_EVERY == 0:
+        is_snapshot, payload = 1, policy_text
+    else:
+        previous = _rebuild_version(conn, website_name, latest[0])
+        is_snapshot, payload = 0, json.dumps(paragraph_delta(previous, policy_text), ensure_ascii=False)
+    conn.execute(
+        "INSERT INTO policy_versions (website_name, version, content_hash, is_snapshot, data, date_saved) VALUES (?, ?, ?, ?, ?, ?)",
+        (website_name, version, digest, is_snapshot, zlib.compress(payload.encode("utf-8")), date_saved)
+    )
+    return version
+
+def _rebuild_version(conn, website_name, version):
+    """Text of one version: the nearest snapshot at or before it with the later deltas applied."""
+    rows = conn.execute(
+        """
+        SELECT is_snapshot, data FROM policy_versions
+        WHERE website_name = ? AND version <= ? AND version >= (
+            SELECT MAX(version) FROM policy_versions WHERE website_name = ? AND version <= ? AND is_snapshot = 1
         )
-    conn.commit()
-    conn.close()
-    print(f"Policy for {website_name} saved/updated in database.")
+        ORDER BY version
+        """,
+        (website_name, version, website_name, version)
+    ).fetchall()
+    text = None
+    for is_snapshot, data in rows:
+        payload = zlib.decompress(data).decode("utf-8")
+        text = payload if is_snapshot else apply_delta(text, json.loads(payload))
+    return text
+
+@telemetry.timed("db:list_policy_versions")
+def list_policy_versions(website_name: str):
+    """Versions of a website's policy, newest first, with their stored (compressed) size."""
+    with _lock:
+        rows = get_connection().execute(
+            """
+            SELECT version, content_hash, date_saved, is_snapshot, length(data) FROM policy_versions
+            WHERE website_name = ? ORDER BY version DESC
+            """,
+            (website_name,)
+        ).fetchall()
+    return [
+        {'version': version, 'content_hash': digest, 'date': date, 'snapshot': bool(snapshot), 'stored_bytes': size}
+        for version, digest, date, snapshot, size in rows
+    ]
+
+@telemetry.timed("db:get_policy_version")
+def get_policy_version(website_name: str, version: int):
+    """Rebuilds the text of one version of a website's policy, or None if it doesn't exist."""
+    with _lock:
+        return _rebuild_version(get_connection(), website_name, version)
+
+@telemetry.timed("db:list_policies")
+def list_policies(limit: int = 50, offset: int = 0):
+    """Lists saved policy names and dates, newest first, without loading their texts."""
+    with _lock:
+        rows = get_connection().execute(
+            "SELECT website_name, date_saved FROM policies ORDER BY date_saved DESC, website_name LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+    return [{'website_name': name, 'date': date} for name, date in rows]
+
+@telemetry.timed("db:count_policies")
+def count_policies():
+    """Returns the number of saved policies."""
+    with _lock:
+        return get_connection().execute("SELECT COUNT(*) FROM policies").fetchone()[0]
+
+@telemetry.timed("db:get_policy_text")
+def get_policy_text(website_name: str):
+    """Fetches the text of one saved policy, or None if it doesn't exist."""
+    with _lock:
+        row = get_connection().execute(
+            "SELECT policy_text FROM policies WHERE website_name = ?", (website_name,)
+        ).fetchone()
+    return row[0] if row else None
+
+@telemetry.timed("db:search_policies")
+def search_policies(query: str, limit: int = 20):
+    """Full-text search over saved policies. Returns names, dates and a short snippet, best match first."""
+    terms = [t for t in query.replace('"', ' ').split() if t]
+    if not terms:
+        return []
+    with _lock:
+        conn = get_connection()
+        if _fts_enabled:
+            # Quote each term so user input can't inject FTS5 query syntax
+            match = " ".join(f'"{t}"' for t in terms)
+            rows = conn.execute(
+                """
+                SELECT p.website_name, p.date_saved,
+                       snippet(policies_fts, 1, '**', '**', '...', 12)
+                FROM policies_fts JOIN policies p ON p.rowid = policies_fts.rowid
+                WHERE policies_fts MATCH ? ORDER BY rank LIMIT ?
+                """,
+                (match, limit)
+            ).fetchall()
+        else:
+            clauses = " AND ".join("policy_text LIKE ?" for _ in terms)
+            rows = conn.execute(
+                f"SELECT website_name, date_saved, substr(policy_text, 1, 80) FROM policies WHERE {clauses} LIMIT ?",
+                [f"%{t}%" for t in terms] + [limit]
+            ).fetchall()
+    return [{'website_name': name, 'date': date, 'snippet': snippet} for name, date, snippet in rows]
 
+@telemetry.timed("db:save_analysis")
+def save_analysis(content_hash: str, pipeline_version: str, analysis: dict, complete: bool = True):
+    """
+    Stores the summary and extracted facts of an analysis under the policy's
+    content hash, with the per-task results later versions can reuse.
+    An analysis that is not `complete` is never returned by load_analysis;
+    the next analysis of the content reuses its task results and retries the rest.
+    """
+    date_analyzed = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    task_results = analysis.get('task_results')
+    with _lock:
+        conn = get_connection()
+        conn.execute(
+            """
+            INSERT INTO analyses (content_hash, pipeline_version, summary, extracted_facts, date_analyzed, task_results,
+                                  complete)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(content_hash, pipeline_version) DO UPDATE SET
+                summary = excluded.summary, extracted_facts = excluded.extracted_facts,
+                date_analyzed = excluded.date_analyzed, task_results = excluded.task_results,
+                complete = excluded.complete
+            """,
+            (content_hash, pipeline_version, analysis['summary'], json.dumps(analysis['extracted_facts']), date_analyzed,
+             json.dumps(task_results) if task_results is not None else None, int(complete))
+        )
+        conn.commit()
+
+@telemetry.timed("db:load_analysis")
+def load_analysis(content_hash: str, pipeline_version: str):
+    """Returns a stored complete analysis for this content and pipeline version, or None."""
+    with _lock:
+        row = get_connection().execute(
+            """
+            SELECT summary, extracted_facts FROM analyses
+            WHERE content_hash = ? AND pipeline_version = ? AND complete
+            """,
+            (content_hash, pipeline_version)
+        ).fetchone()
+    if row is None:
+        return None
+    return {'summary': row[0], 'extracted_facts': json.loads(row[1])}
+
+@telemetry.timed("db:load_task_results")
+def load_task_results(content_hash: str, pipeline_version: str):
+    """Per-task results stored with an analysis, keyed by task fingerprint, or {}."""
+    with _lock:
+        row = get_connection().execute(
+            "SELECT task_results FROM analyses WHERE content_hash = ? AND pipeline_version = ?",
+            (content_hash, pipeline_version)
+        ).fetchone()
+    return json.loads(row[0]) if row and row[0] else {}
+
+@telemetry.timed("db:index_signature")
+def index_signature(content_hash: str, signature):
+    """Adds a policy's MinHash signature to the near-duplicate index (no-op if it is already there)."""
+    with _lock:
+        conn = get_connection()
+        _index_signature(conn, content_hash, signature)
+        conn.commit()
+
+def _index_signature(conn, content_hash, signature):
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO policy_signatures (content_hash, signature) VALUES (?, ?)",
+        (content_hash, similarity.to_bytes(signature))
+    )
+    if cursor.rowcount:
+        conn.executemany(
+            "INSERT OR IGNORE INTO policy_lsh (band_key, content_hash) VALUES (?, ?)",
+            [(key, content_hash) for key in similarity.band_keys(signature)]
+        )
+
+@telemetry.timed("db:find_similar_analyses")
+def find_similar_analyses(signature, pipeline_version: str, threshold: float, limit: int = 1, exclude: str = None):
+    """
+    Analyzed policies (for this pipeline version) whose estimated similarity
+    to `signature` is at least `threshold`, as (content_hash, similarity)
+    pairs, most similar first. Only policies sharing an LSH band with the
+    signature are compared.
+    """
+    keys = similarity.band_keys(signature)
+    placeholders = ",".join("?" * len(keys))
+    with _lock:
+        rows = get_connection().execute(
+            f"""
+            SELECT s.content_hash, s.signature FROM (
+                SELECT l.content_hash, COUNT(*) AS bands FROM policy_lsh AS l
+                JOIN analyses AS a ON a.content_hash = l.content_hash AND a.pipeline_version = ?
+                WHERE l.band_key IN ({placeholders}) AND l.content_hash IS NOT ?
+                GROUP BY l.content_hash ORDER BY bands DESC LIMIT 50
+            ) AS c
+            JOIN policy_signatures AS s ON s.content_hash = c.content_hash
+            """,
+            [pipeline_version] + keys + [exclude]
+        ).fetchall()
+    matches = [(digest, similarity.similarity(signature, similarity.from_bytes(data))) for digest, data in rows]
+    matches = sorted((match for match in matches if match[1] >= threshold), key=lambda match: -match[1])
+    return matches[:limit]
+
+@telemetry.timed("db:list_analyzed_facts")
+def list_analyzed_facts(pipeline_version: str):
+    """
+    (content_hash, website_name, extracted_facts) of every complete analysis
+    for this pipeline version, oldest first. website_name is a website whose policy
+    had that content, or None.
+    """
+    with _lock:
+        rows = get_connection().execute(
+            """
+            SELECT a.content_hash, (
+                SELECT v.website_name FROM policy_versions AS v
+                WHERE v.content_hash = a.content_hash ORDER BY v.date_saved DESC LIMIT 1
+            ), a.extracted_facts
+            FROM analyses AS a WHERE a.pipeline_version = ? AND a.complete ORDER BY a.date_analyzed
+            """,
+            (pipeline_version,)
+        ).fetchall()
+    return [(digest, website_name, json.loads(facts)) for digest, website_name, facts in rows]
+
+@telemetry.timed("db:list_fact_rows")
+def list_fact_rows():
+    """(row, key, website_name, content_hash) of every fact matrix row, by row."""
+    with _lock:
+        return get_connection().execute(
+            "SELECT row, key, website_name, content_hash FROM fact_rows ORDER BY row"
+        ).fetchall()
+
+@telemetry.timed("db:save_fact_rows")
+def save_fact_rows(rows):
+    """Inserts or updates fact matrix rows given as (row, key, website_name, content_hash)."""
+    with _lock:
+        conn = get_connection()
+        conn.executemany(
+            """
+            INSERT INTO fact_rows (row, key, website_name, content_hash) VALUES (?, ?, ?, ?)
+            ON CONFLICT(row) DO UPDATE SET website_name = excluded.website_name, content_hash = excluded.content_hash
+            """,
+            rows
+        )
+        conn.commit()
+
+@telemetry.timed("db:list_fact_values")
+def list_fact_values():
+    """{fact: {value: code}} of the categorical facts in the fact matrix."""
+    values = {}
+    with _lock:
+        for fact, code, value in get_connection().execute("SELECT fact, code, value FROM fact_values"):
+            values.setdefault(fact, {})[value] = code
+    return values
+
+@telemetry.timed("db:save_fact_value")
+def save_fact_value(fact: str, code: int, value: str):
+    with _lock:
+        conn = get_connection()
+        conn.execute("INSERT OR REPLACE INTO fact_values (fact, code, value) VALUES (?, ?, ?)", (fact, code, value))
+        conn.commit()
+
+@telemetry.timed("db:clear_fact_rows")
+def clear_fact_rows():
+    """Forgets every fact matrix row and category, before a rebuild."""
+    with _lock:
+        conn = get_connection()
+        conn.execute("DELETE FROM fact_rows")
+        conn.execute("DELETE FROM fact_values")
+        conn.commit()
+
+@telemetry.timed("db:purge_stale_analyses")
+def purge_stale_analyses(pipeline_version: str):
+    """Deletes analyses produced by any other pipeline version. Returns the number removed."""
+    with _lock:
+        conn = get_connection()
+        removed = conn.execute("DELETE FROM analyses WHERE pipeline_version != ?", (pipeline_version,)).rowcount
+        conn.commit()
+    if removed:
+        print(f"Removed {removed} stale analyses (pipeline version {pipeline_version} is current).")
+    return removed
+
+@telemetry.timed("db:load_policies_from_db")
 def load_policies_from_db():
-    """Loads all saved policies from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT website_name, policy_text, date_saved FROM policies")
-    policies = cursor.fetchall()
-    conn.close()
-    
+    """Loads all saved policies from the database.
+
+    Reads every full text into memory; prefer list_policies and get_policy_text.
+    """
+    with _lock:
+        policies = get_connection().execute("SELECT website_name, policy_text, date_saved FROM policies").fetchall()
+
     # Convert list of tuples to dictionary for easier use in app.py
     loaded_policies = {}
     for website_name, policy_text, date_saved in policies:
@@ -62,5 +500,5 @@ if __name__ == "__main__":
     init_db()
     # Example usage:
     # save_policy_to_db("Test Website", "This is a test policy.")
-    # policies = load_policies_from_db()
-    # print(policies) 
\ No newline at end of file
+    # policies = list_policies()
+    # print(policies)
@@ -0,0 +1,178 @@
+import difflib
+import hashlib
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_right
+
+from retrieval import PassageIndex
+from similarity import minhash
+
+# Sentence separator used by section extraction and bullet formatting
+SENTENCE_SEPARATOR = ". "
+
+
+def normalize_text(text):
+    """Unifies line endings and Unicode composition so equal policies compare equal."""
+    return unicodedata.normalize("NFC", text.replace("\r\n", "\n").replace("\r", "\n"))
+
+
+def content_hash(text):
+    """sha256 hex digest of already normalized text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _boundaries(text, separator):
+    """Start and end offsets of the pieces text.split(separator) would return."""
+    starts, ends = array("l"), array("l")
+    start = 0
+    step = len(separator)
+    while True:
+        at = text.find(separator, start)
+        if at == -1:
+            starts.append(start)
+            ends.append(len(text))
+            return starts, ends
+        starts.append(start)
+        ends.append(at)
+        start = at + step
+
+
+def paragraph_delta(old, new):
+    """
+    Paragraph-level delta that turns `old` into `new`: a list of ["=", i, j]
+    (copy old paragraphs i..j-1) and ["+", [paragraphs]] (insert) operations.
+    """
+    a, b = old.split("\n"), new.split("\n")
+    delta = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            delta.append(["=", i1, i2])
+        elif j2 > j1:
+            delta.append(["+", b[j1:j2]])
+    return delta
+
+
+def apply_delta(old, delta):
+    """Rebuilds the new text from `old` and a paragraph_delta."""
+    a = old.split("\n")
+    b = []
+    for op in delta:
+        if op[0] == "=":
+            b.extend(a[op[1]:op[2]])
+        else:
+            b.extend(op[1])
+    return "\n".join(b)
+
+
+def changed_paragraphs(old, new):
+    """Indices of the paragraphs of `new` that are not in `old` unchanged."""
+    changed = []
+    position = 0
+    for op in paragraph_delta(old, new):
+        count = op[2] - op[1] if op[0] == "=" else len(op[1])
+        if op[0] == "+":
+            changed.extend(range(position, position + count))
+        position += count
+    return changed
+
+
+class PolicyDocument:
+    """
+    A policy preprocessed once per analysis and shared by the summarizer and
+    the extractor.
+
+    Holds the normalized text, its lowercased form, sentence and paragraph
+    boundaries as offset arrays, and a keyword-to-sentence inverted index that
+    is filled in lazily per keyword. Everything is linear in the text size.
+    """
+
+    def __init__(self, text):
+        self.text = normalize_text(text)
+        self.lower = self.text.lower()
+        if len(self.lower) != len(self.text):
+            # A few characters lowercase to two; keep offsets aligned with the text
+            self.lower = "".join(c if len(c.lower()) != 1 else c.lower() for c in self.text)
+        self.sentence_starts, self.sentence_ends = _boundaries(self.text, SENTENCE_SEPARATOR)
+        self.paragraph_starts, self.paragraph_ends = _boundaries(self.text, "\n")
+        self._keyword_index = {}
+        self._scan = None
+        self._passage_index = None
+        self._minhash = None
+        self._lock = threading.Lock()
+
+    @property
+    def content_hash(self):
+        """sha256 of the normalized text; identifies the policy content in stored analyses."""
+        return content_hash(self.text)
+
+    def __len__(self):
+        return len(self.text)
+
+    @property
+    def sentence_count(self):
+        return len(self.sentence_starts)
+
+    def sentence(self, i):
+        return self.text[self.sentence_starts[i]:self.sentence_ends[i]]
+
+    def paragraphs(self):
+        return [self.text[s:e] for s, e in zip(self.paragraph_starts, self.paragraph_ends)]
+
+    def sentence_ids(self, keyword):
+        """Sorted ids of the sentences that contain `keyword` (case-insensitive)."""
+        keyword = keyword.lower()
+        ids = self._keyword_index.get(keyword)
+        if ids is None:
+            ids = array("l")
+            lower, starts = self.lower, self.sentence_starts
+            at = lower.find(keyword)
+            while at != -1:
+                i = bisect_right(starts, at) - 1
+                if not ids or ids[-1] != i:
+                    ids.append(i)
+                # Later hits in the same sentence add nothing, so skip past it
+                at = lower.find(keyword, max(at + 1, self.sentence_ends[i]))
+            self._keyword_index[keyword] = ids
+        return ids
+
+    def sentences_with(self, keywords):
+        """Sentences containing any of the keywords, in document order."""
+        ids = sorted(set().union(*(self.sentence_ids(k) for k in keywords))) if keywords else []
+        return [self.sentence(i) for i in ids]
+
+    def scan(self, matcher):
+        """Runs the keyword matcher over the lowered text once and keeps the result."""
+        with self._lock:
+            if self._scan is None or self._scan[0] is not matcher:
+                self._scan = (matcher, matcher.scan(self.lower))
+            return self._scan[1]
+
+    def passage_index(self):
+        """The BM25 passage index over this document, built on first use."""
+        with self._lock:
+            if self._passage_index is None:
+                self._passage_index = PassageIndex(self.text)
+            return self._passage_index
+
+    def minhash(self):
+        """MinHash signature of the text for near-duplicate lookups, computed on first use."""
+        with self._lock:
+            if self._minhash is None:
+                self._minhash = minhash(self.text)
+            return self._minhash
+
+
+_last_document = None
+_last_document_lock = threading.Lock()
+
+
+def as_document(text):
+    """Returns `text` as a PolicyDocument, reusing the last one built for the same string."""
+    global _last_document
+    if isinstance(text, PolicyDocument):
+        return text
+    with _last_document_lock:
+        if _last_document is None or _last_document[0] != text:
+            _last_document = (text, PolicyDocument(text))
+        return _last_document[1]
@@ -1,9 +1,283 @@
-import re
-import requests
 import os
-from dotenv import load_dotenv
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import namedtuple
+from functools import partial
+import telemetry
+from cancellation import Cancelled, DeadlineExceeded
+from matcher import LineRule, PolicyMatcher
+from inference_gateway import get_inference_gateway
+from document import as_document
+from pipeline import run_tasks
+
+# Keyword groups looked up by keyword_extraction and extract_user_rights
+KEYWORD_GROUPS = {
+    # Data Collection
+    'email': ['email', 'e-mail', 'email address', 'contact information'],
+    'tracking': ['analytics', 'tracking', 'cookies', 'google analytics', 'facebook pixel'],
+    'location': ['location', 'gps', 'geolocation', 'ip address', 'country'],
+    # Data Sharing
+    'sharing': ['third party', 'third-party', 'share', 'sharing', 'partners'],
+    'no_sharing': ['do not share', 'not share', 'no sharing'],
+    # User Rights
+    'delete': ['right to delete', 'right to erasure', 'delete your data', 'remove your data'],
+    'access': ['right to access', 'access your data', 'view your data', 'download your data'],
+    'portability': ['data portability', 'export your data', 'transfer your data'],
+    'optout': ['opt out', 'opt-out', 'unsubscribe', 'withdraw consent'],
+    'correction': ['correct your data', 'update your data', 'modify your data'],
+}
+
+# Pattern families in priority order; the first entry that matches anywhere wins
+PATTERN_FAMILIES = {
+    'retention': [
+        ('period', r'(\d+)\s*(year|month|day)s?'),
+        ('forever', r'(indefinitely|permanently)'),
+        ('until_deleted', LineRule('until', ['delete', 'remove'])),
+        ('as_needed', r'as long as (necessary|needed)'),
+        ('legal', r'as required by law'),
+        ('account', r'for the duration of your (account|relationship)'),
+    ],
+    'age': [
+        ('years_old', r'(\d+)\s*years?\s*old'),
+        ('age_of', r'age\s*of\s*(\d+)'),
+        ('minimum_age', r'minimum\s*age\s*(\d+)'),
+    ],
+}
+
+POLICY_MATCHER = PolicyMatcher(KEYWORD_GROUPS, PATTERN_FAMILIES)
+
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+QA_MODEL = "deepset/roberta-base-squad2"
+
+# Terms used to pick the passages that the retention QA model reads
+RETENTION_QUERY = (
+    "retain retains retained retention keep keeps kept store stored storage "
+    "delete deleted deletion erase period duration long years months days "
+    "necessary required law account closed"
+)
+
+# Zero-shot labels per fact: (label meaning True, label meaning False)
+NLP_CATEGORIES = {
+    'collects_emails': ["collects email addresses", "does not collect emails"],
+    'uses_tracking': ["uses tracking tools", "no tracking or analytics"],
+    'shares_data': ["shares data with third parties", "does not share user data"],
+    'right_to_delete': ["users can delete their data", "users cannot delete their data"],
+    'right_to_access': ["users can access their data", "users cannot access their data"],
+    'data_portability': ["users can export their data", "users cannot export their data"]
+}
+
+# Terms used to pick each fact's evidence window for the zero-shot model
+EVIDENCE_QUERIES = {
+    'collects_emails': "email e-mail address contact information collect collects provide",
+    'uses_tracking': "cookies analytics tracking track pixel beacon advertising technologies",
+    'shares_data': "share shares sharing third parties disclose partners service providers sell",
+    'right_to_delete': "delete deletion erase erasure remove account request rights",
+    'right_to_access': "access copy request rights personal information obtain",
+    'data_portability': "portability export transfer machine readable format copy",
+}
+
+# Characters of evidence the zero-shot model reads per fact, however long the policy
+EVIDENCE_CHARS = int(os.getenv("EVIDENCE_CHARS", "1500"))
+
+# Sentence cues the local rule tier counts per fact: (cues for True, cues for False).
+# A sentence with a False cue only counts against the fact, so "we do not share
+# your data" is not also read as sharing.
+RULE_CUES = {
+    'collects_emails': (
+        ["email address", "e-mail address", "your email", "contact information"],
+        ["do not collect email", "don't collect email", "not collect your email"],
+    ),
+    'uses_tracking': (
+        ["cookies", "analytics", "tracking technolog", "pixel", "web beacon"],
+        ["do not use cookies", "don't use cookies", "no tracking"],
+    ),
+    'shares_data': (
+        ["third part", "share your", "service providers", "disclose your", "we may share"],
+        ["do not share", "don't share", "never share", "will not share"],
+    ),
+    'right_to_delete': (
+        ["delete your", "deletion of your", "erasure", "right to delete", "remove your"],
+        ["cannot delete", "unable to delete", "not be able to delete"],
+    ),
+    'right_to_access': (
+        ["access your", "right to access", "copy of your", "request access"],
+        ["cannot access", "unable to access your"],
+    ),
+    'data_portability': (
+        ["portability", "export your", "machine-readable", "transfer your data"],
+        ["cannot export"],
+    ),
+}
+
+# Cues that a retention period match is about keeping user data
+RETENTION_CUES = ["retain", "retention", "keep", "store", "delete"]
+
+# Facts the local tier answers with less confidence than this go to the remote model.
+# Set above 1 to send every fact to the remote model.
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.85"))
+
+# One tier's answer for one fact; value is None when the tier could not decide.
+# evidence is the (start, end) spans of the document text the answer rests on.
+Verdict = namedtuple("Verdict", ["value", "confidence", "tier", "evidence"], defaults=(None,))
+
+# 'fact_status' values: answered as intended (a keyword answer counts when the
+# models had nothing to decide on), keyword answer standing in for a model call
+# that failed, keyword answer because the analysis deadline passed first.
+# TIMED_OUT and FALLBACK are also the tiers of verdicts the deadline cut or
+# whose model call failed. While a streamed analysis is still running, facts
+# whose task has not finished are PENDING, with the keyword answer and no tier.
+COMPLETE, FALLBACK, TIMED_OUT, PENDING = "complete", "fallback", "timed_out", "pending"
+
+
+class ClassifierBackend(ABC):
+    """
+    A tier of the fact classification cascade.
+
+    `classify` returns {fact: Verdict} for the requested categories (a subset
+    of NLP_CATEGORIES). Facts it leaves out or answers with a value of None
+    are undecided.
+    """
+
+    name = "backend"
+
+    @abstractmethod
+    def classify(self, document, categories):
+        """Returns {fact: Verdict} for the facts in `categories` this tier can answer."""
+
+
+class RuleClassifier(ClassifierBackend):
+    """
+    CPU-only tier: counts sentences with cues for and against each fact.
+
+    Confidence grows with the margin between the two counts and shrinks when
+    the policy says both, so a fact backed by several unambiguous sentences
+    is answered locally and a contested or unmentioned one is not.
+    """
+
+    name = "rules"
+
+    def __init__(self, cues=RULE_CUES):
+        self.cues = cues
+
+    def classify(self, document, categories):
+        document = as_document(document)
+        verdicts = {}
+        for key in categories:
+            if key not in self.cues:
+                continue
+            positive, negative = self.cues[key]
+            against = set().union(*(document.sentence_ids(cue) for cue in negative))
+            support = set().union(*(document.sentence_ids(cue) for cue in positive)) - against
+            value, confidence = self._score(len(support), len(against))
+            cues = positive if value else negative
+            evidence = [self._cited_line(document, i, cues) for i in sorted(support if value else against)[:3]]
+            verdicts[key] = Verdict(value, confidence, self.name, evidence)
+        return verdicts
+
+    @staticmethod
+    def _cited_line(document, i, cues):
+        """(start, end) of the line within sentence i holding its first cue; sentences can span many lines."""
+        start, end = document.sentence_starts[i], document.sentence_ends[i]
+        at = min((p for p in (document.lower.find(cue, start, end) for cue in cues) if p != -1), default=start)
+        line_start = document.text.rfind("\n", start, at) + 1 or start
+        line_end = document.text.find("\n", at, end)
+        return max(start, line_start), end if line_end == -1 else line_end
+
+    @staticmethod
+    def _score(support, against):
+        if support == against:
+            return None, 0.0
+        margin = abs(support - against)
+        confidence = (1 - 0.5 ** margin) * margin / (support + against)
+        return support > against, round(confidence, 3)
+
+    def retention(self, document):
+        """Verdict on the retention period: confident only for an explicit period stated next to a retention cue."""
+        document = as_document(document)
+        span = document.scan(POLICY_MATCHER).first('retention')
+        if span is None:
+            return Verdict(None, 0.0, self.name)
+        i = bisect_right(document.sentence_starts, span.start) - 1
+        sentence = document.lower[document.sentence_starts[i]:document.sentence_ends[i]]
+        cued = any(cue in sentence for cue in RETENTION_CUES)
+        if span.name == 'period' and cued:
+            return Verdict(span.text, 0.9, self.name)
+        return Verdict(span.text, 0.5 if cued else 0.3, self.name)
+
+
+class ZeroShotClassifier(ClassifierBackend):
+    """
+    Remote tier: zero-shot classification through the extractor's inference client.
+
+    With `evidence` on, each fact is classified over its own evidence window
+    rather than the whole policy; otherwise `batched` picks one multi-label
+    request or one request per fact over the whole text.
+    """
+
+    name = "zero_shot"
+
+    def __init__(self, extractor, batched=True, evidence=True):
+        self.extractor = extractor
+        self.batched = batched
+        self.evidence = evidence
+
+    def classify(self, document, categories):
+        if self.evidence:
+            answers = self.extractor.classify_evidence(document, categories)
+        else:
+            values = self.extractor.nlp_extraction(document, batched=self.batched, categories=categories, evidence=False)
+            answers = {key: (value, None) for key, value in values.items()}
+        verdicts = {}
+        for key, (value, spans) in answers.items():
+            if value is not None:
+                verdicts[key] = Verdict(value, 1.0, self.name, spans)
+            else:
+                # Only a fact without an evidence window had no request; any other None is a failed one
+                verdicts[key] = Verdict(None, 0.0, FALLBACK if spans or not self.evidence else self.name)
+        return verdicts
+
+
+class ClassifierCascade:
+    """
+    Asks each tier in turn about the facts still undecided.
+
+    A tier's verdict is kept when its confidence reaches `threshold`; the last
+    tier's verdict is always kept. Facts no tier could decide end up as a
+    Verdict with value None, and tier TIMED_OUT if the analysis deadline
+    stopped a tier before it answered or FALLBACK if a tier's model call
+    for it failed.
+    """
+
+    def __init__(self, tiers, threshold=LOCAL_CONFIDENCE_THRESHOLD):
+        self.tiers = list(tiers)
+        self.threshold = threshold
+
+    def classify(self, document, categories=NLP_CATEGORIES):
+        pending = {key: categories[key] for key in categories}
+        verdicts = {}
+        failed = set()
+        for i, tier in enumerate(self.tiers):
+            if not pending:
+                break
+            last = i == len(self.tiers) - 1
+            try:
+                with telemetry.span(f"classify:{tier.name}"):
+                    answers = tier.classify(document, pending)
+            except DeadlineExceeded:
+                for key in pending:
+                    verdicts[key] = Verdict(None, 0.0, TIMED_OUT)
+                return verdicts
+            for key, verdict in answers.items():
+                if verdict.value is None and verdict.tier == FALLBACK:
+                    failed.add(key)
+                if key in pending and verdict.value is not None and (last or verdict.confidence >= self.threshold):
+                    verdicts[key] = verdict
+                    del pending[key]
+                    telemetry.inc("classifier_facts_total", tier=tier.name)
+        for key in pending:
+            verdicts[key] = Verdict(None, 0.0, FALLBACK if key in failed else None)
+        return verdicts
 
-load_dotenv()
 
 class PolicyExtractor:
     """
@@ -11,213 +285,371 @@ class PolicyExtractor:
     Uses Hugging Face API for NLP tasks.
     """
     
-    def __init__(self):
+    def __init__(self, tiers=None, threshold=LOCAL_CONFIDENCE_THRESHOLD):
+        """
+        `tiers` is the classifier cascade, cheapest first; by default local
+        rules backed by remote zero-shot classification. Facts and retention
+        periods the rules answer with at least `threshold` confidence skip the
+        remote models.
+        """
         print("\n=== Initializing Policy Extractor ===")
-        self.api_url = "https://api-inference.huggingface.co/models"
-        self.headers = {"Authorization": f"Bearer {os.getenv('ACCESS_TOKEN')}"}
+        self.client = get_inference_gateway()
+        self.rules = RuleClassifier()
+        self.cascade = ClassifierCascade(tiers or [self.rules, ZeroShotClassifier(self)], threshold)
 
     def _query_api(self, model, payload):
-        """Generic method to query Hugging Face API"""
-        try:
-            response = requests.post(
-                f"{self.api_url}/{model}",
-                headers=self.headers,
-                json=payload
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"API Error: {str(e)}")
-            return None
+        """Generic method to query Hugging Face API through the shared inference gateway"""
+        return self.client.query(model, payload)
 
     def extract_facts(self, text):
         """
         Main method to extract user-relevant facts from privacy policy text.
         """
+        with telemetry.trace("extract_facts"):
+            document = as_document(text)
+            return self.assemble_facts(document, run_tasks(self.fact_tasks(document)))
+
+    def fact_tasks(self, text):
+        """
+        Returns the independent (name, callable) model calls for fact extraction.
+        The retention QA call is left out when the rules already found a clear period.
+        """
+        text = as_document(text)
         print("\n=== Starting Fact Extraction ===")
         print(f"Input text length: {len(text)} characters")
-        
+        tasks = [('nlp', partial(self.cascade.classify, text))]
+        if self.rules.retention(text).confidence < self.cascade.threshold:
+            # Keyed by the passages the QA model reads, so edits elsewhere keep its result reusable
+            tasks.append(('qa_retention', partial(self.answer_retention, self.retention_passages(text))))
+        return tasks
+
+    def assemble_facts(self, text, results, pending=()):
+        """
+        Merges keyword facts with the (name, result, error) outcomes of fact_tasks.
+        'fact_tiers' records which tier answered each fact and 'fact_evidence'
+        the passages ({start, end, text}) its answer rests on, where it has any.
+        'fact_status' marks each finished fact COMPLETE, FALLBACK or TIMED_OUT,
+        and the facts of the fact_tasks named in `pending`, not finished yet, PENDING.
+        """
+        text = as_document(text)
+        outcomes = {key: (result, error) for key, result, error in results}
+
         # Basic keyword extraction
         print("\n--- Starting Keyword Extraction ---")
-        basic_facts = self.keyword_extraction(text)
+        with telemetry.span("keyword_extraction"):
+            basic_facts = self.keyword_extraction(text)
+        tiers = {key: "keywords" for key in basic_facts}
+        status = {key: COMPLETE for key in basic_facts}
+        evidence = {}
+        # Facts a classifier tier answered; keyword rights only fill in the others
+        settled = set()
         print("✅ Completed keyword extraction")
 
-        # NLP extraction using API
-        print("\n--- Starting NLP Extraction (API) ---")
-        try:
-            nlp_facts = self.nlp_extraction(text)
-            basic_facts.update(nlp_facts)
-            print("✅ Completed NLP extraction")
-        except Exception as e:
-            print(f'❌ NLP extraction failed: {str(e)}')
+        # Classification cascade: local rules, then the API for what they could not settle
+        print("\n--- Starting NLP Extraction (rules + API) ---")
+        verdicts, error = outcomes.get('nlp', ({}, None))
+        if 'nlp' in pending:
+            for key in NLP_CATEGORIES:
+                status[key] = PENDING
+                tiers.pop(key, None)
+            print("⏳ NLP extraction still running")
+        elif error is None:
+            for key, verdict in verdicts.items():
+                if verdict.value is not None:
+                    basic_facts[key] = verdict.value
+                    tiers[key] = verdict.tier
+                    status[key] = COMPLETE
+                    settled.add(key)
+                    if verdict.evidence:
+                        evidence[key] = [
+                            {'start': start, 'end': end, 'text': text.text[start:end]} for start, end in verdict.evidence
+                        ]
+                elif verdict.tier in (TIMED_OUT, FALLBACK):
+                    status[key] = verdict.tier
+            local = sum(1 for verdict in verdicts.values() if verdict.tier == self.rules.name)
+            print(f"✅ Completed NLP extraction ({local}/{len(verdicts)} facts answered locally)")
+        else:
+            status.update((key, TIMED_OUT if isinstance(error, DeadlineExceeded) else FALLBACK) for key in NLP_CATEGORIES)
+            # The local tier's confident answers don't need the models that failed
+            for key, verdict in self.rules.classify(text, NLP_CATEGORIES).items():
+                if verdict.value is not None and verdict.confidence >= self.cascade.threshold:
+                    basic_facts[key] = verdict.value
+                    tiers[key] = verdict.tier
+                    status[key] = COMPLETE
+                    settled.add(key)
+            print(f'❌ NLP extraction failed: {str(error)}')
 
         # Extract user rights
         print("\n--- Starting User Rights Extraction ---")
         try:
-            rights_facts = self.extract_user_rights(text)
-            basic_facts.update(rights_facts)
-            print("✅ Completed user rights extraction")
+            with telemetry.span("user_rights_extraction"):
+                rights_facts = self.extract_user_rights(text)
+            for key, value in rights_facts.items():
+                if key in settled:
+                    continue
+                basic_facts[key] = value
+                if status.get(key) == PENDING:
+                    continue
+                tiers[key] = "keywords"
+                # Standing in for a classifier that failed or timed out keeps that status
+                status.setdefault(key, COMPLETE)
+            print(f"✅ Completed user rights extraction ({len(set(rights_facts) - settled)} from keywords)")
         except Exception as e:
             print(f'❌ User rights extraction failed: {str(e)}')
 
         # Extract retention duration (prioritize QA, fallback to keyword)
         print("\n--- Starting Retention Extraction ---")
         initial_retention = basic_facts.get('retention_duration', 'unknown') # Get keyword-based retention
-        try:
-            qa_retention = self.qa_retention_extraction(text)
-            # Use QA result if it's not 'Not found' or 'Error'
-            if qa_retention not in ["Not found (QA API)", "Error (QA API)"]:
-                basic_facts['retention_duration'] = qa_retention
-                print("✅ Completed retention extraction (QA model used)")
-            else:
-                basic_facts['retention_duration'] = initial_retention # Fallback to keyword
-                print("✅ Completed retention extraction (Keyword fallback used)")
-        except Exception as e:
-            print(f'❌ Retention extraction failed: {str(e)} - falling back to keyword')
+        qa_retention, error = outcomes.get('qa_retention', (None, None))
+        if 'qa_retention' in pending:
+            status['retention_duration'] = PENDING
+            tiers.pop('retention_duration', None)
+            print("⏳ Retention extraction still running (QA model)")
+        elif 'qa_retention' not in outcomes:
+            # The rules found an explicit period, which is the keyword result
+            tiers['retention_duration'] = self.rules.name
+            print("✅ Completed retention extraction (rules, QA skipped)")
+        elif error is not None:
+            print(f'❌ Retention extraction failed: {str(error)} - falling back to keyword')
             basic_facts['retention_duration'] = initial_retention # Ensure fallback on error
+            status['retention_duration'] = TIMED_OUT if isinstance(error, DeadlineExceeded) else FALLBACK
+        elif qa_retention not in ["Not found (QA API)", "Error (QA API)"]:
+            # Use QA result if it's not 'Not found' or 'Error'
+            basic_facts['retention_duration'] = qa_retention
+            tiers['retention_duration'] = "qa"
+            print("✅ Completed retention extraction (QA model used)")
+        else:
+            basic_facts['retention_duration'] = initial_retention # Fallback to keyword
+            if qa_retention == "Error (QA API)":
+                status['retention_duration'] = FALLBACK
+            print("✅ Completed retention extraction (Keyword fallback used)")
 
+        basic_facts['fact_tiers'] = tiers
+        basic_facts['fact_status'] = status
+        basic_facts['fact_evidence'] = evidence
         return basic_facts
     
     def keyword_extraction(self, text):
         """Extracts facts using keyword matching and regex patterns."""
-        text_lower = text.lower()
+        scan = as_document(text).scan(POLICY_MATCHER)
         facts = {}
 
         # Data Collection
-        email_keywords = ['email', 'e-mail', 'email address', 'contact information']
-        facts['collects_emails'] = any(keyword in text_lower for keyword in email_keywords)
-
-        tracking_keywords = ['analytics', 'tracking', 'cookies', 'google analytics', 'facebook pixel']
-        facts['uses_tracking'] = any(keyword in text_lower for keyword in tracking_keywords)
+        facts['collects_emails'] = scan.has('email')
+        facts['uses_tracking'] = scan.has('tracking')
 
         # Data Retention
-        retention_patterns = [
-            r'(\d+)\s*(year|month|day)s?',
-            r'(indefinitely|permanently)',
-            r'until.*?(delete|remove)',
-            r'as long as (necessary|needed)',
-            r'as required by law',
-            r'for the duration of your (account|relationship)'
-        ]
-        
-        retention_duration = 'unknown'
-        for pattern in retention_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                retention_duration = match.group(0)
-                break
-        facts['retention_duration'] = retention_duration
+        retention = scan.first('retention')
+        facts['retention_duration'] = retention.text if retention else 'unknown'
 
         # Data Sharing
-        sharing_keywords = ['third party', 'third-party', 'share', 'sharing', 'partners']
-        no_sharing_keywords = ['do not share', 'not share', 'no sharing']
-
-        facts['shares_data'] = any(keyword in text_lower for keyword in sharing_keywords)
-        if any(keyword in text_lower for keyword in no_sharing_keywords):
-            facts['shares_data'] = False
+        facts['shares_data'] = scan.has('sharing') and not scan.has('no_sharing')
 
         # Age Restrictions
-        age_patterns = [
-            r'(\d+)\s*years?\s*old',
-            r'age\s*of\s*(\d+)',
-            r'minimum\s*age\s*(\d+)'
-        ]
-        for pattern in age_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                facts['minimum_age'] = match.group(1)
-                break
+        age = scan.first('age')
+        if age:
+            facts['minimum_age'] = age.groups[0]
 
         # Location Data
-        location_keywords = ['location', 'gps', 'geolocation', 'ip address', 'country']
-        facts['collects_location'] = any(keyword in text_lower for keyword in location_keywords)
+        facts['collects_location'] = scan.has('location')
 
         return facts
     
     def extract_user_rights(self, text):
         """Extracts information about user rights from the policy."""
-        text_lower = text.lower()
+        scan = as_document(text).scan(POLICY_MATCHER)
         rights = {}
 
-        # Right to Delete
-        delete_keywords = ['right to delete', 'right to erasure', 'delete your data', 'remove your data']
-        rights['right_to_delete'] = any(keyword in text_lower for keyword in delete_keywords)
+        rights['right_to_delete'] = scan.has('delete')
+        rights['right_to_access'] = scan.has('access')
+        rights['data_portability'] = scan.has('portability')
+        rights['opt_out_rights'] = scan.has('optout')
+        rights['right_to_correction'] = scan.has('correction')
+
+        return rights
+
+    def nlp_extraction(self, text, batched=True, categories=None, evidence=True):
+        """
+        Uses Hugging Face API for zero-shot classification to extract facts.
+
+        With `evidence` on, each category is classified over its evidence
+        window only (see classify_evidence). Otherwise the whole text is sent:
+        in batched mode every category's labels are scored in one multi-label
+        request, falling back to one request per category if the batched
+        response is not usable. `categories` defaults to NLP_CATEGORIES.
+        """
+        categories = NLP_CATEGORIES if categories is None else categories
+        if not categories:
+            return {}
+        if evidence:
+            return {key: value for key, (value, _) in self.classify_evidence(text, categories).items()}
+        text = as_document(text).text
+        if batched:
+            results = self._classify_batched(text, categories)
+            if results is not None:
+                return results
+            print("⚠️ Batched classification unavailable, falling back to per-category calls")
+        return self._classify_per_category(text, categories)
 
-        # Right to Access
-        access_keywords = ['right to access', 'access your data', 'view your data', 'download your data']
-        rights['right_to_access'] = any(keyword in text_lower for keyword in access_keywords)
+    def evidence_window(self, text, key, budget=EVIDENCE_CHARS):
+        """
+        The passages most relevant to one fact, as (start, end) spans of the
+        document text in document order: passages with one of the fact's rule
+        cues first, then the rest by BM25 rank, skipping ones that overlap a
+        passage already picked, until `budget` characters are used.
+        """
+        document = as_document(text)
+        index = document.passage_index()
+        cues = [cue for group in RULE_CUES.get(key, ()) for cue in group]
+        ranked = index.ranked(EVIDENCE_QUERIES[key])
+        cued = [i for i in ranked if any(cue in index.passages[i].lower() for cue in cues)]
+        spans = []
+        used = 0
+        for i in cued + [i for i in ranked if i not in set(cued)]:
+            start, end = index.spans[i]
+            if any(start < e and s < end for s, e in spans):
+                continue
+            if used + end - start > budget:
+                if spans:
+                    continue
+                end = start + budget  # A single passage over budget is cut short
+            spans.append((start, end))
+            used += end - start
+            if budget - used < 80:
+                break
+        return sorted(spans)
 
-        # Data Portability
-        portability_keywords = ['data portability', 'export your data', 'transfer your data']
-        rights['data_portability'] = any(keyword in text_lower for keyword in portability_keywords)
+    def classify_evidence(self, text, categories=NLP_CATEGORIES):
+        """
+        Classifies each category over its own evidence window, all requests in
+        flight at once, so the bytes per fact stay flat as policies grow.
+        Returns {key: (True/False/None, spans)}; a category without evidence
+        is None without a request.
+        """
+        document = as_document(text)
+        with telemetry.span("evidence_retrieval"):
+            windows = {key: self.evidence_window(document, key) for key in categories}
+        tasks = [
+            (key, partial(self._classify_category, "\n".join(document.text[s:e] for s, e in windows[key]), labels))
+            for key, labels in categories.items() if windows[key]
+        ]
+        answers = {key: (None, []) for key in categories}
+        for key, result, error in run_tasks(tasks):
+            if isinstance(error, DeadlineExceeded):
+                raise error
+            if error is not None:
+                print(f"❌ Error classifying {key}: {str(error)}")
+            elif result is None:
+                print(f"❌ Invalid API response for {key}")
+            answers[key] = (result, windows[key])
+        telemetry.inc("evidence_windows_total", len(tasks))
+        return answers
 
-        # Opt-out Rights
-        optout_keywords = ['opt out', 'opt-out', 'unsubscribe', 'withdraw consent']
-        rights['opt_out_rights'] = any(keyword in text_lower for keyword in optout_keywords)
+    def _classify_batched(self, text, categories=NLP_CATEGORIES):
+        """Scores all category labels in a single multi-label request. Returns None if unsupported."""
+        labels = [label for pair in categories.values() for label in pair]
+        payload = {
+            "inputs": text,
+            "parameters": {
+                "candidate_labels": labels,
+                "multi_label": True
+            }
+        }
 
-        # Data Correction
-        correction_keywords = ['correct your data', 'update your data', 'modify your data']
-        rights['right_to_correction'] = any(keyword in text_lower for keyword in correction_keywords)
+        result = self._query_api(ZERO_SHOT_MODEL, payload)
 
-        return rights
+        if isinstance(result, list) and len(result) == 1:
+            result = result[0]
+        if not (isinstance(result, dict) and 'labels' in result and 'scores' in result):
+            return None
+        scores = dict(zip(result['labels'], result['scores']))
+        if any(label not in scores for label in labels):
+            return None
 
-    def nlp_extraction(self, text):
-        """Uses Hugging Face API for zero-shot classification to extract facts."""
-        categories = {
-            'collects_emails': ["collects email addresses", "does not collect emails"],
-            'uses_tracking': ["uses tracking tools", "no tracking or analytics"],
-            'shares_data': ["shares data with third parties", "does not share user data"],
-            'right_to_delete': ["users can delete their data", "users cannot delete their data"],
-            'right_to_access': ["users can access their data", "users cannot access their data"],
-            'data_portability': ["users can export their data", "users cannot export their data"]
+        # Each label is scored independently, so compare each pair directly
+        return {
+            key: scores[positive] > scores[negative]
+            for key, (positive, negative) in categories.items()
         }
 
+    def _classify_per_category(self, text, categories=NLP_CATEGORIES):
+        """Classifies each category with its own single-label request, all requests in flight at once."""
+        tasks = [(key, partial(self._classify_category, text, labels)) for key, labels in categories.items()]
         results = {}
-        
-        for key, labels in categories.items():
-            try:
-                payload = {
-                    "inputs": text,
-                    "parameters": {
-                        "candidate_labels": labels,
-                        "multi_label": False
-                    }
-                }
-                
-                result = self._query_api("facebook/bart-large-mnli", payload)
-                
-                if result and 'labels' in result and 'scores' in result:
-                    most_likely = result['labels'][0]
-                    results[key] = most_likely == labels[0]
-                else:
-                    print(f"❌ Invalid API response for {key}")
-                    results[key] = None
-                    
-            except Exception as e:
-                print(f"❌ Error classifying {key}: {str(e)}")
-                results[key] = None
-
+        for key, result, error in run_tasks(tasks):
+            if isinstance(error, DeadlineExceeded):
+                raise error
+            if error is not None:
+                print(f"❌ Error classifying {key}: {str(error)}")
+            elif result is None:
+                print(f"❌ Invalid API response for {key}")
+            results[key] = result
         return results
 
-    def qa_retention_extraction(self, text):
+    def _classify_category(self, text, labels):
+        """Returns True/False for one category's label pair, or None on an invalid response."""
+        payload = {
+            "inputs": text,
+            "parameters": {
+                "candidate_labels": labels,
+                "multi_label": False
+            }
+        }
+        
+        result = self._query_api(ZERO_SHOT_MODEL, payload)
+        
+        if result and 'labels' in result and 'scores' in result:
+            most_likely = result['labels'][0]
+            return most_likely == labels[0]
+        return None
+
+    def qa_retention_extraction(self, text, top_k=3):
         """
         Extracts data retention duration using a Question Answering model via Hugging Face API.
+        Only the `top_k` passages most relevant to retention are sent, concurrently,
+        and the best-scoring answer wins.
         """
         print("\n--- QA Retention Extraction (API) ---")
+        try:
+            return self.answer_retention(self.retention_passages(text, top_k))
+        except Exception as e:
+            print(f"❌ Error in QA Retention Extraction (API): {str(e)}")
+            return "Error (QA API)"
+
+    def retention_passages(self, text, top_k=3):
+        """The `top_k` passages most relevant to data retention."""
+        with telemetry.span("retention_retrieval"):
+            return as_document(text).passage_index().top_k(RETENTION_QUERY, k=top_k)
+
+    def answer_retention(self, passages):
+        """Asks the QA model about retention over each passage and returns the best answer over the threshold."""
         question = "How long is user data retained?"
         try:
-            result = self._query_api("deepset/roberta-base-squad2", {
-                "inputs": {
-                    "question": question,
-                    "context": text
-                }
-            })
+            if not passages:
+                return "Not found (QA API)"
+
+            tasks = [
+                (i, partial(self._query_api, QA_MODEL, {
+                    "inputs": {
+                        "question": question,
+                        "context": passage
+                    }
+                }))
+                for i, passage in enumerate(passages)
+            ]
+            outcomes = run_tasks(tasks)
+            answers = [result for _, result, error in outcomes if error is None and isinstance(result, dict)]
+            if not answers and any(isinstance(error, DeadlineExceeded) for _, _, error in outcomes):
+                raise DeadlineExceeded()
+            result = max(answers, key=lambda r: r.get('score', 0), default=None)
             print(f"QA Retention Raw Result: {result}")
             
             if isinstance(result, dict) and 'answer' in result and result['score'] > 0.02:
                 return result['answer']
             else:
                 return "Not found (QA API)"
+        except Cancelled:
+            raise
         except Exception as e:
             print(f"❌ Error in QA Retention Extraction (API): {str(e)}")
-            return "Error (QA API)"
\ No newline at end of file
+            return "Error (QA API)"
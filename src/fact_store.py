@@ -0,0 +1,348 @@
+"""
+Columnar store of the extracted facts of every analyzed policy.
+
+facts.bin (next to policies.db) is a memory-mapped policies x facts matrix
+of one-byte codes, laid out column by column: 0 is unknown, booleans are 1
+(False) or 2 (True), categorical facts use codes from a per-fact dictionary.
+Rows are keyed by website name, or by content hash for unnamed policies, and
+are overwritten in place when a newer analysis lands. Row keys and category
+names live in policies.db (fact_rows, fact_values). The CLI, the service and
+the app may share the matrix, so writes hold an flock on facts.bin.lock while
+they allocate rows and codes and write them, and reads take it shared while
+they reload.
+
+A query only reads the columns it filters on: each is translated to 0/1
+bytes and read as one big integer, the conditions are ANDed, and the result
+is counted or listed with bytes operations, all in C loops.
+
+    matrix = get_fact_matrix()
+    matrix.count(shares_data=True, right_to_delete=[False, None])
+"""
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+from database import (DB_PATH, clear_fact_rows, list_analyzed_facts, list_fact_rows, list_fact_values,
+                      save_fact_rows, save_fact_value)
+
+FACT_MATRIX_PATH = os.getenv("FACT_MATRIX_PATH", os.path.join(os.path.dirname(DB_PATH), "facts.bin"))
+
+BOOLEAN_FACTS = (
+    'collects_emails', 'uses_tracking', 'collects_location', 'shares_data',
+    'right_to_delete', 'right_to_access', 'data_portability', 'opt_out_rights', 'right_to_correction',
+)
+CATEGORICAL_FACTS = ('minimum_age', 'retention_period')
+FACTS = BOOLEAN_FACTS + CATEGORICAL_FACTS
+
+UNKNOWN, FALSE, TRUE = 0, 1, 2
+# Categorical values past the 254th distinct one share this code
+OTHER = 255
+
+# magic, schema checksum, rows, capacity, writes (bumped by every write, so caches of query results can key on it)
+HEADER = struct.Struct("<4sIIII")
+MAGIC = b"FCTM"
+SCHEMA = zlib.crc32(",".join(FACTS).encode("utf-8"))
+MIN_CAPACITY = 1024
+
+_PERIOD = re.compile(r"(\d+)\s*(day|week|month|year)s?", re.IGNORECASE)
+
+
+def retention_period(retention_duration):
+    """Buckets the free-text retention_duration fact: '30 days', 'as long as necessary', 'other' or None."""
+    if not retention_duration or retention_duration == 'unknown':
+        return None
+    match = _PERIOD.search(retention_duration)
+    if match:
+        count, unit = int(match.group(1)), match.group(2).lower()
+        return f"{count} {unit}" + ("s" if count != 1 else "")
+    lowered = retention_duration.lower()
+    if "as long as" in lowered or "necessary" in lowered:
+        return "as long as necessary"
+    return "other"
+
+
+class FactMatrix:
+    """The memory-mapped fact matrix. Thread-safe; `stale` means it disagrees with policies.db and needs a rebuild."""
+
+    def __init__(self, path=FACT_MATRIX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file = None
+        self._mm = None
+        self._lock_file = open(f"{path}.lock", "a+b")
+        with self._writing():
+            self._load()
+
+    # -- storage ---------------------------------------------------------
+
+    @contextmanager
+    def _writing(self):
+        """Holds the thread lock and the file lock shared with other processes using the matrix."""
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """_sync() under a shared file lock, so no other process is halfway through a write."""
+        fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+        try:
+            self._sync()
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        rows = list_fact_rows()
+        self.keys = [key for _, key, _, _ in rows]
+        self.websites = [website_name for _, _, website_name, _ in rows]
+        self.hashes = [digest for _, _, _, digest in rows]
+        self._rows = {key: i for i, key in enumerate(self.keys)}
+        self._load_codes()
+        contiguous = all(row == i for i, (row, _, _, _) in enumerate(rows))
+        self._map()
+        self.stale = not contiguous or self._header()[2] != len(self.keys)
+
+    def _load_codes(self):
+        self._codes = list_fact_values()
+        self._labels = {fact: {code: value for value, code in codes.items()} for fact, codes in self._codes.items()}
+
+    def _map(self):
+        """Maps the file, creating an empty matrix if it is missing or from another schema."""
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+        valid = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER.size:
+            with open(self.path, "rb") as f:
+                magic, schema, _, capacity, _ = HEADER.unpack(f.read(HEADER.size))
+            valid = magic == MAGIC and schema == SCHEMA and \
+                os.path.getsize(self.path) == HEADER.size + capacity * len(FACTS)
+        if not valid:
+            self._write_file(b"", 0, MIN_CAPACITY)
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._stat = os.fstat(self._file.fileno())
+
+    def _write_file(self, columns, rows, capacity, writes=0):
+        """Writes a new matrix file with `columns` (each `rows` bytes, concatenated) and swaps it in."""
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, SCHEMA, rows, capacity, writes))
+            for c in range(len(FACTS)):
+                f.write(columns[c * rows:(c + 1) * rows] if columns else b"")
+                f.write(bytes(capacity - rows))
+        os.replace(tmp, self.path)
+
+    def _header(self):
+        return HEADER.unpack(self._mm[:HEADER.size])
+
+    def _offset(self, column):
+        return HEADER.size + column * self._header()[3]
+
+    def _sync(self):
+        """Reloads if another process replaced the file or added rows."""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        if current is None or current.st_ino != self._stat.st_ino or self._header()[2] != len(self.keys):
+            self._load()
+
+    def _grow(self, rows_needed):
+        """Moves to a file with room for `rows_needed` rows, keeping the rows written so far."""
+        capacity = self._header()[3]
+        rows = len(self.keys)
+        if rows_needed <= capacity:
+            return
+        columns = b"".join(self._column(c, rows) for c in range(len(FACTS)))
+        self._write_file(columns, rows, max(capacity * 2, rows_needed), self._header()[4])
+        self._map()
+
+    def _column(self, column, rows=None):
+        rows = len(self.keys) if rows is None else rows
+        offset = self._offset(column)
+        return self._mm[offset:offset + rows]
+
+    # -- updates ---------------------------------------------------------
+
+    def _encode(self, fact, value):
+        if fact in BOOLEAN_FACTS:
+            return TRUE if value is True else FALSE if value is False else UNKNOWN
+        if value is None:
+            return UNKNOWN
+        value = str(value)
+        codes = self._codes.setdefault(fact, {})
+        code = codes.get(value)
+        if code is None:
+            if len(codes) >= OTHER - 1:
+                return OTHER
+            code = codes[value] = len(codes) + 1
+            self._labels.setdefault(fact, {})[code] = value
+            save_fact_value(fact, code, value)
+        return code
+
+    def _values(self, facts):
+        values = {fact: facts.get(fact) for fact in FACTS}
+        values['retention_period'] = retention_period(facts.get('retention_duration'))
+        return values
+
+    def _write_rows(self, entries):
+        """Writes (key, website_name, content_hash, facts) entries into their rows, appending new keys.
+
+        Called under _writing() after _sync(), so rows and codes are allocated past those other processes have added.
+        """
+        saved = []
+        for key, website_name, content_hash, facts in entries:
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self.keys)
+                self._grow(row + 1)
+                self._rows[key] = row
+                self.keys.append(key)
+                self.websites.append(website_name)
+                self.hashes.append(content_hash)
+            else:
+                self.websites[row] = website_name
+                self.hashes[row] = content_hash
+            values = self._values(facts)
+            capacity = self._header()[3]
+            for column, fact in enumerate(FACTS):
+                self._mm[HEADER.size + column * capacity + row] = self._encode(fact, values[fact])
+            saved.append((row, key, website_name, content_hash))
+        save_fact_rows(saved)
+        magic, schema, _, capacity, writes = self._header()
+        self._mm[:HEADER.size] = HEADER.pack(magic, schema, len(self.keys), capacity, writes + 1)
+        self._mm.flush()
+
+    def record(self, content_hash, website_name, facts):
+        """Stores the extracted facts of an analysis in the policy's row."""
+        with self._writing():
+            self._sync()
+            # Another process may have added categories without adding rows
+            self._load_codes()
+            self._write_rows([(website_name or content_hash, website_name, content_hash, facts)])
+
+    def rebuild(self, pipeline_version):
+        """Rebuilds the matrix from every stored analysis of this pipeline version. Returns the row count."""
+        with self._writing():
+            clear_fact_rows()
+            self._write_file(b"", 0, MIN_CAPACITY, self._header()[4] + 1)
+            self._load()
+            entries = [(website_name or digest, website_name, digest, facts)
+                       for digest, website_name, facts in list_analyzed_facts(pipeline_version)]
+            self._grow(len(entries))
+            self._write_rows(entries)
+            self.stale = False
+            print(f"✅ Rebuilt fact matrix ({len(self.keys)} policies)")
+            return len(self.keys)
+
+    # -- queries ---------------------------------------------------------
+
+    def _code(self, fact, value):
+        if fact in BOOLEAN_FACTS:
+            return TRUE if value is True else FALSE if value is False else UNKNOWN if value is None else -1
+        if value is None:
+            return UNKNOWN
+        if value == "other":
+            return OTHER
+        return self._codes.get(fact, {}).get(str(value), -1)
+
+    def _label(self, fact, code):
+        if fact in BOOLEAN_FACTS:
+            return {TRUE: True, FALSE: False}.get(code)
+        if code == OTHER:
+            return "other"
+        return self._labels.get(fact, {}).get(code)
+
+    def _mask(self, conditions):
+        """0x01 byte per matching row, as an int; each condition is a value or a list of accepted values."""
+        rows = len(self.keys)
+        mask = int.from_bytes(b"\x01" * rows, "little")
+        for fact, accepted in conditions.items():
+            if fact not in FACTS:
+                raise KeyError(f"Unknown fact: {fact}")
+            if not isinstance(accepted, (list, tuple, set, frozenset)):
+                accepted = [accepted]
+            codes = {self._code(fact, value) for value in accepted}
+            table = bytes(1 if code in codes else 0 for code in range(256))
+            mask &= int.from_bytes(self._column(FACTS.index(fact)).translate(table), "little")
+        return mask
+
+    def _matching_rows(self, mask, limit=None):
+        lanes = mask.to_bytes(len(self.keys), "little")
+        rows = []
+        at = lanes.find(1)
+        while at != -1 and (limit is None or len(rows) < limit):
+            rows.append(at)
+            at = lanes.find(1, at + 1)
+        return rows
+
+    def count(self, **conditions):
+        """Number of policies matching every condition, e.g. count(shares_data=True, right_to_delete=[False, None])."""
+        with self._lock:
+            self._refresh()
+            return self._mask(conditions).to_bytes(len(self.keys), "little").count(1)
+
+    def where(self, limit=None, **conditions):
+        """Policies matching every condition, in row order: dicts with key, website_name, content_hash and facts."""
+        with self._lock:
+            self._refresh()
+            rows = self._matching_rows(self._mask(conditions), limit)
+            offsets = [self._offset(column) for column in range(len(FACTS))]
+            return [
+                dict({'key': self.keys[row], 'website_name': self.websites[row], 'content_hash': self.hashes[row]},
+                     **{fact: self._label(fact, self._mm[offsets[c] + row]) for c, fact in enumerate(FACTS)})
+                for row in rows
+            ]
+
+    def aggregate(self, **conditions):
+        """{fact: {value: count}} over the policies matching every condition (None counts unknown)."""
+        with self._lock:
+            self._refresh()
+            rows = len(self.keys)
+            mask = self._mask(conditions)
+            selected = mask.to_bytes(rows, "little")
+            matched = selected.count(1)
+            # Spreading each 0x01 lane to 0xFF keeps the codes of matching rows and zeroes the rest
+            keep = mask * 0xFF
+            totals = {}
+            for column, fact in enumerate(FACTS):
+                values = self._column(column)
+                if conditions:
+                    values = (int.from_bytes(values, "little") & keep).to_bytes(rows, "little")
+                codes = (FALSE, TRUE) if fact in BOOLEAN_FACTS else list(self._labels.get(fact, {})) + [OTHER]
+                counts = {self._label(fact, code): values.count(code) for code in codes}
+                counts = {label: n for label, n in counts.items() if n}
+                counts[None] = matched - sum(counts.values())
+                totals[fact] = counts
+            return totals
+
+    @property
+    def version(self):
+        """Changes whenever the matrix does, in this process or another; a cache key for query results."""
+        with self._lock:
+            self._refresh()
+            return self._header()[4]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+_default_matrix = None
+_default_matrix_lock = threading.Lock()
+
+
+def get_fact_matrix():
+    """Returns the process-wide FactMatrix."""
+    global _default_matrix
+    with _default_matrix_lock:
+        if _default_matrix is None:
+            _default_matrix = FactMatrix()
+        return _default_matrix
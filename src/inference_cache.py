@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import telemetry
+from database import DB_PATH
+from pipeline import PIPELINE_VERSION
+
+CACHE_DB_PATH = os.path.join(os.path.dirname(DB_PATH), "inference_cache.db")
+
+
+def cache_key(model, payload, version=PIPELINE_VERSION):
+    """Content address of a request: sha256 over model, canonical JSON payload and version."""
+    canonical = json.dumps(
+        {"model": model, "payload": payload, "version": version},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class InferenceCache:
+    """
+    Two-tier cache of inference API responses.
+
+    An in-memory LRU sits in front of a SQLite table shared by every process
+    using the same file. Entries expire after `ttl` seconds; the memory tier
+    holds at most `max_entries` responses and the SQLite tier at most
+    `max_bytes` of JSON, evicting least recently used rows first.
+    """
+
+    def __init__(self, path=CACHE_DB_PATH, ttl=7 * 24 * 3600, max_entries=512, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS inference_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_inference_cache_accessed ON inference_cache (accessed_at)")
+
+    def get(self, model, payload):
+        """Returns the cached response for the request, or None."""
+        key = cache_key(model, payload)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, response = entry
+                if now - created_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    telemetry.inc("inference_cache_lookups_total", result="hit", tier="memory")
+                    return response
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM inference_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._conn.execute("UPDATE inference_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    response = json.loads(row[0])
+                    self._remember(key, row[1], response)
+                    self.hits += 1
+                    telemetry.inc("inference_cache_lookups_total", result="hit", tier="sqlite")
+                    return response
+            self.misses += 1
+            telemetry.inc("inference_cache_lookups_total", result="miss")
+            return None
+
+    def put(self, model, payload, response):
+        """Stores a successful response for the request."""
+        key = cache_key(model, payload)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            if self._conn is None:
+                return
+            data = json.dumps(response, separators=(",", ":"), ensure_ascii=False)
+            self._conn.execute(
+                """
+                INSERT INTO inference_cache (key, model, response, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    response = excluded.response, size = excluded.size,
+                    created_at = excluded.created_at, accessed_at = excluded.accessed_at
+                """,
+                (key, model, data, len(data), now, now)
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= 50:
+                self._trim(now)
+
+    def stats(self):
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'memory_entries': len(self._memory),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM inference_cache")
+
+    def _remember(self, key, created_at, response):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _trim(self, now):
+        """Drops expired rows, then least recently used rows until under max_bytes."""
+        self._puts_since_trim = 0
+        self._conn.execute("DELETE FROM inference_cache WHERE created_at <= ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM inference_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM inference_cache ORDER BY accessed_at"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM inference_cache WHERE key = ?", doomed)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_inference_cache():
+    """Returns the process-wide cache, or None when INFERENCE_CACHE=off."""
+    global _default_cache
+    if os.getenv("INFERENCE_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = InferenceCache(
+                ttl=float(os.getenv("INFERENCE_CACHE_TTL", 7 * 24 * 3600)),
+                max_entries=int(os.getenv("INFERENCE_CACHE_MAX_ENTRIES", 512)),
+                max_bytes=int(os.getenv("INFERENCE_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+            )
+        return _default_cache
@@ -0,0 +1,263 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+import cancellation
+import telemetry
+from inference_cache import get_inference_cache
+from telemetry import LatencyHistogram
+
+load_dotenv()
+
+DEFAULT_API_URL = "https://api-inference.huggingface.co/models"
+
+# Responses worth retrying: model still loading, rate limited, gateway trouble
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitBreaker:
+    """
+    Fails fast after `threshold` consecutive failures until `cooldown` seconds
+    pass, then lets a single trial call through to probe for recovery. A
+    trial that ends without an outcome must be handed back with release().
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._trial_thread = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_thread = threading.get_ident()
+                return True
+            return False
+
+    def release(self):
+        """Gives back this thread's trial call, if it holds one, without recording an outcome."""
+        with self._lock:
+            if self._trial_in_flight and self._trial_thread == threading.get_ident():
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+
+class InferenceClient:
+    """
+    Shared Hugging Face inference API client.
+
+    Keeps pooled keep-alive connections, applies a timeout to every call, and
+    retries model-loading (503), rate-limit (429) and transient errors with
+    jittered exponential backoff that honors `estimated_time` and `Retry-After`.
+    A per-model circuit breaker stops hammering a model that keeps failing.
+    Responses go through the inference cache.
+    """
+
+    def __init__(self, api_url=None, token=None, timeout=60.0, max_retries=3,
+                 backoff_base=1.0, backoff_cap=20.0, pool_size=16, latency_window=256):
+        self.api_url = api_url or os.getenv("HF_API_URL", DEFAULT_API_URL)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token or os.getenv('ACCESS_TOKEN')}"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.retries = 0
+        self._breakers = {}
+        self._histograms = {}
+        # Recent call latencies per model, for percentiles the histograms are too coarse for
+        self._recent = {}
+        self.latency_window = latency_window
+        self._lock = threading.Lock()
+
+    def query(self, model, payload, timeout=None, use_cache=True):
+        """
+        Posts `payload` to `model` and returns the decoded JSON response, or None
+        on failure. Raises cancellation.Cancelled once the calling thread's
+        CancelToken is cancelled; with a deadline on the token, no request
+        outlives it (cancellation.DeadlineExceeded).
+        """
+        with telemetry.span(f"model:{model}"):
+            return self._query(model, payload, timeout, use_cache)
+
+    def _query(self, model, payload, timeout, use_cache=True):
+        cache = get_inference_cache() if use_cache else None
+        if cache is not None:
+            cached = cache.get(model, payload)
+            if cached is not None:
+                return cached
+
+        breaker = self._breaker(model)
+        if not breaker.allow():
+            telemetry.inc("inference_api_calls_total", model=model, outcome="circuit_open")
+            print(f"API Error: circuit open for {model}, skipping call")
+            return None
+
+        # Whatever ends this call (cancellation, deadline, a client error) must not keep a
+        # half-open breaker's trial; outcomes already recorded have released it
+        try:
+            # Encode once; retries resend the same bytes
+            body = json.dumps(payload).encode("utf-8")
+            timeout = timeout or self.timeout
+            token = cancellation.current_token()
+            attempt = 0
+            while True:
+                call_timeout = timeout
+                if token is not None:
+                    token.raise_if_cancelled()
+                    remaining = token.remaining()
+                    if remaining is not None:
+                        call_timeout = min(timeout, remaining)
+                delay = None
+                start = time.perf_counter()
+                telemetry.inc("inference_payload_bytes_total", len(body), model=model, direction="sent")
+                try:
+                    response = self.session.post(
+                        f"{self.api_url}/{model}", data=body, timeout=call_timeout,
+                        headers={"Content-Type": "application/json"}
+                    )
+                    self._observe(model, time.perf_counter() - start)
+                    telemetry.inc("inference_payload_bytes_total", len(response.content), model=model,
+                                  direction="received")
+                    if response.status_code in RETRYABLE_STATUS:
+                        delay = self._retry_delay(response, attempt)
+                        error = f"{response.status_code} from {model}"
+                        telemetry.inc("inference_api_calls_total", model=model, outcome=str(response.status_code))
+                    else:
+                        response.raise_for_status()
+                        result = response.json()
+                        breaker.record_success()
+                        telemetry.inc("inference_api_calls_total", model=model, outcome="ok")
+                        if cache is not None:
+                            cache.put(model, payload, result)
+                        return result
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    self._observe(model, time.perf_counter() - start)
+                    telemetry.inc("inference_api_calls_total", model=model, outcome=type(e).__name__)
+                    delay = self._retry_delay(None, attempt)
+                    error = str(e)
+                except Exception as e:
+                    # Client errors and bad responses are not the model's fault
+                    telemetry.inc("inference_api_calls_total", model=model, outcome="error")
+                    print(f"API Error: {str(e)}")
+                    return None
+
+                if attempt >= self.max_retries:
+                    breaker.record_failure()
+                    print(f"API Error: {error} (gave up after {attempt + 1} attempts)")
+                    return None
+                if token is not None:
+                    token.raise_if_cancelled()
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                telemetry.inc("inference_api_retries_total", model=model)
+                print(f"⏳ Retrying {model} in {delay:.1f}s ({error})")
+                if token is not None:
+                    token.sleep(delay)
+                else:
+                    time.sleep(delay)
+        finally:
+            breaker.release()
+
+    def latency_stats(self):
+        """Returns per-model latency histograms."""
+        with self._lock:
+            return {model: histogram.snapshot() for model, histogram in self._histograms.items()}
+
+    def latency_quantile(self, model, q, min_samples=20):
+        """The q-quantile (0-1) of the model's recent call latencies, or None with fewer than `min_samples`."""
+        with self._lock:
+            recent = sorted(self._recent.get(model, ()))
+        if len(recent) < min_samples:
+            return None
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+    def breaker_states(self):
+        with self._lock:
+            return {model: breaker.state for model, breaker in self._breakers.items()}
+
+    def _breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker()
+            return self._breakers[model]
+
+    def _observe(self, model, seconds):
+        with self._lock:
+            if model not in self._histograms:
+                self._histograms[model] = LatencyHistogram()
+                self._recent[model] = deque(maxlen=self.latency_window)
+            self._histograms[model].observe(seconds)
+            self._recent[model].append(seconds)
+
+    def _retry_delay(self, response, attempt):
+        """Server hint when there is one, otherwise full-jitter exponential backoff."""
+        hint = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    hint = float(retry_after)
+                except ValueError:
+                    hint = None
+            if hint is None:
+                try:
+                    hint = float(response.json().get("estimated_time"))
+                except (ValueError, TypeError, AttributeError):
+                    hint = None
+        if hint is not None:
+            # A little jitter so replicas waiting on the same model do not stampede
+            return min(self.backoff_cap, hint) * random.uniform(1.0, 1.2)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_inference_client():
+    """Returns the process-wide InferenceClient."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = InferenceClient(
+                timeout=float(os.getenv("HF_TIMEOUT", 60)),
+                max_retries=int(os.getenv("HF_MAX_RETRIES", 3)),
+            )
+        return _default_client
@@ -0,0 +1,384 @@
+"""
+Process-wide gateway in front of the inference client.
+
+Every model call from the summarizer and the extractor goes through one
+gateway per process, which:
+
+- answers from the inference cache without queueing when it can,
+- single-flights identical requests, so sessions analyzing the same policy at
+  the same time share one API call,
+- queues the rest by priority (interactive analyses before bulk jobs),
+- micro-batches queued requests with the same model and parameters into one
+  API call with a list of inputs,
+- paces API calls with a token bucket so bursts stay under the rate limit,
+- hedges slow calls: a call still unanswered after the model's recent
+  latency percentile gets a duplicate, and the first answer wins.
+"""
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
+
+import cancellation
+import telemetry
+from cancellation import BULK, INTERACTIVE  # re-exported for callers choosing a priority
+from inference_cache import cache_key, get_inference_cache
+from inference_client import DEFAULT_API_URL, get_inference_client
+
+# The serverless Hugging Face API does not publish exact limits; this stays
+# well below where free tokens start getting 429s. Only applied to that API.
+DEFAULT_HF_REQUESTS_PER_MINUTE = 120
+
+# Response keys of pipelines that answer a single input with a one-item list
+_LIST_RESULT_KEYS = ("summary_text", "generated_text", "translation_text")
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self):
+        """Takes one token if one is available right now. Returns whether it did."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class _Request:
+    __slots__ = ("key", "model", "payload", "timeout", "deadline", "batch_key", "priority", "future", "waiters",
+                 "queued_at", "token")
+
+    def __init__(self, key, model, payload, timeout, priority, deadline=None):
+        self.key = key
+        self.model = model
+        self.payload = payload
+        self.timeout = timeout
+        self.deadline = deadline
+        self.batch_key = _batch_key(model, payload)
+        self.priority = priority
+        self.future = Future()
+        self.waiters = 1
+        self.queued_at = time.perf_counter()
+        # The CancelToken of the call serving this request, once it has started
+        self.token = None
+
+
+def _latest(deadline, other):
+    """The later of two deadlines, where None (no deadline) is the latest."""
+    if deadline is None or other is None:
+        return None
+    return max(deadline, other)
+
+
+def _batch_key(model, payload):
+    """Requests with equal batch keys can share one call; None if the payload can't be batched."""
+    if not isinstance(payload, dict) or set(payload) - {"inputs", "parameters"}:
+        return None
+    if not isinstance(payload.get("inputs"), (str, dict)):
+        return None
+    parameters = json.dumps(payload.get("parameters"), sort_keys=True)
+    return (model, type(payload["inputs"]).__name__, parameters)
+
+
+def _unbatch(item):
+    """Reshapes one item of a batched response into what a single-input call returns."""
+    if isinstance(item, dict) and any(k in item for k in _LIST_RESULT_KEYS):
+        return [item]
+    return item
+
+
+class InferenceGateway:
+    """
+    Coalescing, batching, prioritizing and rate limiting front for an
+    InferenceClient. `query` has the client's signature, so it can stand in
+    wherever a client is used.
+
+    batch_window: seconds a dispatched request waits for compatible ones to batch.
+    max_batch: most inputs per batched call; 1 turns batching off.
+    requests_per_minute: token bucket rate, None for no limit.
+    hedge_quantile: latency quantile (0-1) of the model's recent calls after
+                    which a single call is hedged; None turns hedging off.
+    hedge_budget: most hedges as a fraction of calls, so a slow model is not
+                  sent twice the traffic. Hedges also need a free rate token.
+    """
+
+    def __init__(self, client=None, max_in_flight=16, batch_window=0.01, max_batch=8,
+                 requests_per_minute=None, burst=10, hedge_quantile=0.95, hedge_budget=0.1):
+        self.client = client or get_inference_client()
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst) if requests_per_minute else None
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self._calls = 0
+        self._hedges = 0
+        self._hedge_pool = ThreadPoolExecutor(max_workers=2 * max_in_flight, thread_name_prefix="gateway-hedge")
+        self._queue = []
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        self._lock = threading.Condition()
+        self._slots = threading.Semaphore(max_in_flight)
+        self._workers = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="gateway")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="gateway-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def query(self, model, payload, timeout=None):
+        """Returns the model's response to `payload`, or None on failure, like InferenceClient.query."""
+        cache = get_inference_cache()
+        if cache is not None:
+            cached = cache.get(model, payload)
+            if cached is not None:
+                return cached
+
+        token = cancellation.current_token()
+        with telemetry.span(f"gateway:{model}"):
+            while True:
+                request = self._submit(model, payload, timeout, token)
+                try:
+                    return self._wait(request, token)
+                except cancellation.DeadlineExceeded:
+                    # The shared call stopped at an earlier caller's deadline; this one still has time
+                    if token is not None and token.expired:
+                        raise
+                    telemetry.inc("gateway_deadline_retries_total", model=model)
+
+    def _submit(self, model, payload, timeout, token):
+        """Joins the in-flight request for this payload, or queues a new one."""
+        priority = token.priority if token is not None else INTERACTIVE
+        deadline = token.deadline if token is not None else None
+        key = cache_key(model, payload)
+        with self._lock:
+            request = self._in_flight.get(key)
+            if request is not None and not request.future.done():
+                request.waiters += 1
+                # The shared call serves until the last of its callers' deadlines
+                request.deadline = _latest(request.deadline, deadline)
+                if request.token is not None:
+                    request.token.deadline = _latest(request.token.deadline, request.deadline)
+                # An interactive caller joining a queued bulk request must not wait behind the bulk backlog
+                if priority < request.priority:
+                    request.priority = priority
+                    self._requeue(request)
+                telemetry.inc("gateway_coalesced_total", model=model)
+            else:
+                request = self._in_flight[key] = _Request(key, model, payload, timeout, priority, deadline)
+                heapq.heappush(self._queue, (priority, next(self._sequence), request))
+                self._lock.notify()
+        return request
+
+    def _requeue(self, request):
+        """Moves `request` to its raised priority if it is still queued. Call with the lock held."""
+        for i, (_, sequence, queued) in enumerate(self._queue):
+            if queued is request:
+                self._queue[i] = (request.priority, sequence, request)
+                heapq.heapify(self._queue)
+                return
+
+    def _wait(self, request, token):
+        while True:
+            try:
+                return request.future.result(timeout=0.1)
+            except FutureTimeout:
+                if token is not None and (token.cancelled or token.expired):
+                    with self._lock:
+                        request.waiters -= 1
+                    token.raise_if_cancelled()
+
+    def _dispatch(self):
+        while True:
+            self._slots.acquire()
+            with self._lock:
+                while not self._queue:
+                    self._lock.wait()
+                _, _, first = heapq.heappop(self._queue)
+                batch = [first]
+                if first.batch_key is not None and self.max_batch > 1:
+                    deadline = time.perf_counter() + self.batch_window
+                    while True:
+                        batch += self._take_compatible(first.batch_key, self.max_batch - len(batch))
+                        remaining = deadline - time.perf_counter()
+                        if len(batch) >= self.max_batch or remaining <= 0:
+                            break
+                        self._lock.wait(remaining)
+                # Nobody is waiting for these any more
+                live = [request for request in batch if request.waiters > 0]
+                for request in batch:
+                    if request.waiters <= 0:
+                        self._forget(request)
+                        request.future.set_exception(cancellation.Cancelled())
+            if not live:
+                self._slots.release()
+                continue
+            if self.bucket is not None:
+                waited = self.bucket.acquire()
+                if waited:
+                    telemetry.observe("gateway_rate_limit_wait_seconds", waited)
+            now = time.perf_counter()
+            for request in live:
+                telemetry.observe("gateway_queue_wait_seconds", now - request.queued_at, priority=str(request.priority))
+            self._workers.submit(self._call, live)
+
+    def _take_compatible(self, batch_key, limit):
+        """Removes up to `limit` queued requests with this batch key, in priority order."""
+        if limit <= 0:
+            return []
+        taken = []
+        kept = []
+        for entry in sorted(self._queue):
+            if len(taken) < limit and entry[2].batch_key == batch_key:
+                taken.append(entry[2])
+            else:
+                kept.append(entry)
+        if taken:
+            self._queue = kept
+            heapq.heapify(self._queue)
+        return taken
+
+    def _call(self, batch):
+        try:
+            # The calls stop at the latest deadline of the requests they serve, including
+            # callers that join them later
+            token = cancellation.CancelToken(batch[0].priority)
+            with self._lock:
+                deadlines = [request.deadline for request in batch]
+                token.deadline = None if None in deadlines else max(deadlines)
+                for request in batch:
+                    request.token = token
+            if len(batch) == 1:
+                request = batch[0]
+                results = [self._hedged(request.model, partial(self.client.query, request.model, request.payload,
+                                                               request.timeout), token)]
+            else:
+                results = self._call_batched(batch, token)
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            with self._lock:
+                for request in batch:
+                    self._forget(request)
+            self._slots.release()
+
+    def _forget(self, request):
+        """Drops `request` from the in-flight map unless a newer request took its key. Call with the lock held."""
+        if self._in_flight.get(request.key) is request:
+            del self._in_flight[request.key]
+
+    def _hedged(self, model, call, token):
+        """
+        Runs `call` (a model call) bound to `token`, plus a duplicate if it is
+        still unanswered after the model's hedge quantile latency. Returns the
+        first successful response; the other call's response is dropped.
+        """
+        call = cancellation.bind(call, token)
+        with self._lock:
+            self._calls += 1
+        delay = self.client.latency_quantile(model, self.hedge_quantile) if self.hedge_quantile else None
+        if delay is None:
+            return call()
+
+        first = self._hedge_pool.submit(call)
+        done, _ = wait([first], timeout=delay)
+        if done or not self._take_hedge():
+            return first.result()
+        telemetry.inc("gateway_hedges_total", model=model)
+        second = self._hedge_pool.submit(call)
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result() is not None:
+                    if future is second:
+                        telemetry.inc("gateway_hedge_wins_total", model=model)
+                    return future.result()
+        # Both failed: report the first call's failure
+        return first.result()
+
+    def _take_hedge(self):
+        """Whether the hedge budget and the rate limit allow one more hedge; counts it if so."""
+        with self._lock:
+            if self._hedges + 1 > self.hedge_budget * self._calls:
+                return False
+            if self.bucket is not None and not self.bucket.try_acquire():
+                return False
+            self._hedges += 1
+            return True
+
+    def _call_batched(self, batch, token):
+        """One call with every request's input; falls back to one call each if the response doesn't fit."""
+        model = batch[0].model
+        payload = {"inputs": [request.payload["inputs"] for request in batch]}
+        if "parameters" in batch[0].payload:
+            payload["parameters"] = batch[0].payload["parameters"]
+        telemetry.inc("gateway_batches_total", model=model)
+        telemetry.inc("gateway_batched_requests_total", len(batch), model=model)
+        response = self._hedged(model, partial(self.client.query, model, payload, use_cache=False), token)
+        if not isinstance(response, list) or len(response) != len(batch):
+            telemetry.inc("gateway_batch_fallbacks_total", model=model)
+            query = cancellation.bind(self.client.query, token)
+            return [query(request.model, request.payload, request.timeout) for request in batch]
+        results = [_unbatch(item) for item in response]
+        cache = get_inference_cache()
+        if cache is not None:
+            for request, result in zip(batch, results):
+                cache.put(request.model, request.payload, result)
+        return results
+
+
+_default_gateway = None
+_default_gateway_lock = threading.Lock()
+
+
+def get_inference_gateway():
+    """Returns the process-wide InferenceGateway."""
+    global _default_gateway
+    with _default_gateway_lock:
+        if _default_gateway is None:
+            client = get_inference_client()
+            rate = os.getenv("HF_REQUESTS_PER_MINUTE")
+            if rate is None and client.api_url == DEFAULT_API_URL:
+                rate = DEFAULT_HF_REQUESTS_PER_MINUTE
+            _default_gateway = InferenceGateway(
+                client,
+                max_in_flight=int(os.getenv("INFERENCE_MAX_IN_FLIGHT", 16)),
+                batch_window=float(os.getenv("INFERENCE_BATCH_WINDOW_MS", 10)) / 1000,
+                max_batch=int(os.getenv("INFERENCE_MAX_BATCH", 8)),
+                requests_per_minute=float(rate) if rate else None,
+                hedge_quantile=float(os.getenv("INFERENCE_HEDGE_PERCENTILE", 95)) / 100 or None,
+                hedge_budget=float(os.getenv("INFERENCE_HEDGE_BUDGET", 0.1)),
+            )
+        return _default_gateway
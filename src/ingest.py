@@ -0,0 +1,475 @@
+"""
+Ingestion of uploaded HTML, PDF and plain-text policies.
+
+ingest_file reads an upload CHUNK_SIZE bytes at a time and never holds the
+raw file: HTML goes through an incremental parser, PDF content streams are
+decoded one at a time, and text is decoded line by line. Every format turns
+into blocks of text (paragraphs, headings, list items), which are cleaned:
+
+- markup that is not policy text is skipped: <head>, scripts, styles, forms,
+  and navigation, site headers and footers, sidebars and cookie or consent
+  banners, recognized by tag, ARIA role or id/class,
+- running headers and footers are dropped: short blocks at page edges (the
+  first and last lines of a PDF page or of a form-feed separated text page,
+  and what is left of article headers and footers in HTML) that repeat
+  across the document. So are page numbers and short UI strings ("Skip to
+  content", "Accept all cookies"),
+- whitespace is collapsed, Unicode is NFC-normalized, invisible characters
+  are removed and undecodable bytes are replaced.
+
+The cleaned text has one paragraph per block, separated by blank lines like
+the bundled policies, and comes with each paragraph's offsets. An HTML table
+row is one block, its cells separated by " | ".
+
+PDF support is for text-based PDFs with standard font encodings: scanned
+pages and fonts without a plain-text encoding give no usable text.
+"""
+import codecs
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter, namedtuple
+from html.parser import HTMLParser
+
+import telemetry
+
+CHUNK_SIZE = 64 * 1024
+
+# A page-edge block at most this long that appears at least this often is a running header or footer
+REPEATED_BLOCK_MAX_CHARS = 80
+REPEATED_BLOCK_MIN_COUNT = 3
+# Blocks at the top and at the bottom of a PDF page that may be running headers or footers
+PDF_EDGE_BLOCKS = 2
+
+# Separator of the cells of an HTML table row
+CELL_SEPARATOR = " | "
+
+# Paragraph separator of the cleaned text
+PARAGRAPH_SEPARATOR = "\n\n"
+
+IngestedPolicy = namedtuple('IngestedPolicy', ['text', 'paragraphs', 'source_format', 'source_bytes', 'dropped_blocks'])
+IngestedPolicy.__doc__ = "Cleaned policy text, (start, end) offsets of its paragraphs, and what was read and dropped."
+
+HTML_SKIP_TAGS = {"head", "script", "style", "noscript", "template", "svg", "iframe", "object", "nav", "aside",
+                  "form", "button", "select", "dialog", "menu"}
+HTML_BLOCK_TAGS = {"address", "article", "blockquote", "br", "caption", "dd", "div", "dl", "dt", "figcaption",
+                   "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "main", "ol", "p", "pre", "section", "table",
+                   "tr", "ul"}
+HTML_CELL_TAGS = {"td", "th"}
+# Elements whose text sits at the edge of a page
+HTML_EDGE_TAGS = {"header", "footer"}
+HTML_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+                  "track", "wbr"}
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog", "alertdialog",
+                     "menu", "menubar"}
+# Parts of id/class names (split on - and _) that mark page chrome
+BOILERPLATE_NAME_PARTS = {"nav", "navbar", "navigation", "menu", "breadcrumb", "breadcrumbs", "sidebar", "footer",
+                          "newsletter", "social", "skip", "toc", "masthead"}
+BOILERPLATE_NAMES = {"header", "site-header", "page-header", "global-header"}
+CONSENT_NAME_PARTS = {"cookie", "cookies", "consent", "gdpr", "ccpa"}
+BANNER_NAME_PARTS = {"banner", "bar", "notice", "popup", "modal", "dialog", "overlay", "wall", "prompt"}
+
+UI_BLOCK = re.compile(
+    r"(skip to (main )?content|back to top|(accept|allow|reject|decline)( all| necessary)?( cookies)?|"
+    r"(cookie|privacy) (settings|preferences)|manage (cookie )?(settings|preferences)|got it|ok|close|menu|"
+    r"print( this page)?|share( this page)?|sign in|log ?in|subscribe|search)[.!]?",
+    re.IGNORECASE
+)
+PAGE_NUMBER = re.compile(r"((page\s*)?\d+(\s*(of|/)\s*\d+)?|[-\u2013]\s*\d+\s*[-\u2013])", re.IGNORECASE)
+INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff\u00ad"))
+
+# The dictionary may not run past its own object's endobj into a later stream object
+_PDF_OBJECT = re.compile(rb"\d+\s+\d+\s+obj\s*(<<(?:(?!endobj).)*?>>)\s*stream\r?\n", re.DOTALL)
+_PDF_TOKEN = re.compile(
+    rb"\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)"  # literal string, one level of nested parentheses
+    rb"|<[0-9A-Fa-f\s]*>"                          # hex string
+    rb"|<<|>>|\[|\]"
+    rb"|/[^\s/\[\]()<>{}%]*"                       # name
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)"                  # number
+    rb"|[A-Za-z'\"*]+"                             # operator
+    rb"|%[^\r\n]*",                                # comment
+    re.DOTALL
+)
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def detect_format(head, filename=None):
+    """'html', 'pdf' or 'text', from the file name's extension or else the first bytes."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".html", ".htm", ".xhtml"):
+        return "html"
+    if extension == ".pdf" or head.startswith(b"%PDF-"):
+        return "pdf"
+    if extension in (".txt", ".text", ".md"):
+        return "text"
+    sample = head[:1024].lstrip().lower()
+    if sample.startswith((b"<!doctype html", b"<html", b"<?xml")) or b"<body" in sample or b"<p>" in sample:
+        return "html"
+    return "text"
+
+
+def _decoder(head, markup=False):
+    """Incremental decoder for a file starting with `head`: BOM, then <meta charset>, then UTF-8 or cp1252."""
+    encoding = None
+    for bom, name in ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"),
+                      (codecs.BOM_UTF16_BE, "utf-16")):
+        if head.startswith(bom):
+            encoding = name
+            break
+    if encoding is None and markup:
+        match = re.search(rb"""<meta[^>]+charset\s*=\s*["']?([\w-]+)""", head[:4096], re.IGNORECASE)
+        if match:
+            try:
+                encoding = codecs.lookup(match.group(1).decode("ascii")).name
+            except LookupError:
+                pass
+    if encoding is None:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "cp1252"
+    return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+
+def _is_boilerplate(tag, attrs, open_tags):
+    """Whether the element just opened (last of `open_tags`) is page chrome rather than policy text."""
+    if tag in ("header", "footer"):
+        # Article headers hold the title; only site-wide headers and footers are chrome
+        return not any(t in ("article", "main") for t in open_tags[:-1])
+    if tag in HTML_SKIP_TAGS:
+        return True
+    if attrs.get("role") in BOILERPLATE_ROLES or attrs.get("aria-hidden") == "true" or "hidden" in attrs:
+        return True
+    for name in ((attrs.get("id") or "") + " " + (attrs.get("class") or "")).lower().split():
+        parts = set(re.split(r"[-_]+", name))
+        if parts & BOILERPLATE_NAME_PARTS or name in BOILERPLATE_NAMES:
+            return True
+        if parts & CONSENT_NAME_PARTS and parts & BANNER_NAME_PARTS:
+            return True
+    return False
+
+
+class _HTMLBlocks(HTMLParser):
+    """
+    Incremental HTML parser collecting the text of block elements outside
+    page chrome in `blocks`, as (text, at a page edge) pairs.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._text = []
+        self._open = []
+        self._skip_depth = None
+        self._row_cells = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_BLOCK_TAGS:
+            self._flush()
+            self._row_cells = 0
+        elif tag in HTML_CELL_TAGS and self._skip_depth is None:
+            # Cells of a row stay together, so a "Yes" is still next to what it answers
+            if self._row_cells and self._text:
+                self._text.append(CELL_SEPARATOR)
+            self._row_cells += 1
+        if tag in HTML_VOID_TAGS:
+            return
+        self._open.append(tag)
+        if self._skip_depth is None and _is_boilerplate(tag, dict(attrs), self._open):
+            self._skip_depth = len(self._open)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in HTML_BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in HTML_BLOCK_TAGS:
+            self._flush()
+        if tag not in self._open:
+            return
+        # Closes unclosed children too (<li>, <p>)
+        while self._open:
+            if self._skip_depth == len(self._open):
+                self._skip_depth = None
+            if self._open.pop() == tag:
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth is None:
+            self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        if self._text:
+            self.blocks.append(("".join(self._text), any(tag in HTML_EDGE_TAGS for tag in self._open)))
+            self._text = []
+
+
+def _html_blocks(chunks, head):
+    decoder = _decoder(head, markup=True)
+    parser = _HTMLBlocks()
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield from parser.blocks
+        parser.blocks = []
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.blocks
+
+
+def _text_lines(chunks, head):
+    decoder = _decoder(head)
+    tail = ""
+    for chunk in chunks:
+        # Not splitlines: a form feed is a page break within the line, not a line break
+        lines = re.split(r"(?<=\n)", (tail + decoder.decode(chunk)).replace("\r\n", "\n").replace("\r", "\n"))
+        tail = lines.pop()
+        yield from lines
+    yield tail + decoder.decode(b"", final=True)
+
+
+def _text_blocks(chunks, head):
+    """(line, at a page edge) for the non-blank lines; pages are separated by form feeds."""
+    previous = None
+    page_start = True
+    for line in _text_lines(chunks, head):
+        for i, part in enumerate(line.split("\f")):
+            if i:
+                if previous is not None:
+                    previous[1] = True
+                page_start = True
+            if not part.strip():
+                continue
+            if previous is not None:
+                yield tuple(previous)
+            previous = [part, page_start]
+            page_start = False
+    if previous is not None:
+        yield previous[0], True
+
+
+def _pdf_string(token):
+    """Decodes a PDF literal or hex string token to text."""
+    if token.startswith(b"<"):
+        raw = bytes.fromhex(re.sub(rb"\s", b"", token[1:-1]).decode("ascii").ljust(2, "0"))
+    elif b"\\" not in token:
+        raw = token[1:-1]
+    else:
+        raw = re.sub(
+            rb"\\(\d{1,3}|\r\n|[\r\n]|.)",
+            lambda m: (bytes([int(m.group(1), 8) & 0xFF]) if m.group(1).isdigit()
+                       else b"" if m.group(1) in (b"\r\n", b"\r", b"\n")
+                       else _PDF_ESCAPES.get(m.group(1), m.group(1))),
+            token[1:-1], flags=re.DOTALL
+        )
+    if raw.startswith(codecs.BOM_UTF16_BE):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    return raw.decode("cp1252", errors="replace")
+
+
+def _pdf_lines(content):
+    """Text lines drawn by one content stream, in drawing order."""
+    lines, line, operands = [], [], []
+    array = None
+    last_y = None
+
+    def new_line():
+        if line:
+            lines.append("".join(line))
+            line.clear()
+
+    for token in _PDF_TOKEN.findall(content):
+        first = token[:1]
+        if first == b"%":
+            continue
+        if token == b"[":
+            array = []
+        elif token == b"]":
+            operands.append(array or [])
+            array = None
+        elif first in (b"(", b"<") and token != b"<<" and token != b">>":
+            (array if array is not None else operands).append(_pdf_string(token))
+        elif first and first in b"+-.0123456789":
+            (array if array is not None else operands).append(float(token))
+        elif first == b"/" or token in (b"<<", b">>"):
+            operands.append(token)
+        else:
+            op = token
+            if op == b"Tj" and operands and isinstance(operands[-1], str):
+                line.append(operands[-1])
+            elif op in (b"'", b'"') and operands and isinstance(operands[-1], str):
+                new_line()
+                line.append(operands[-1])
+            elif op == b"TJ" and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, str):
+                        line.append(item)
+                    elif item < -200:
+                        # A wide negative kern is a word space
+                        line.append(" ")
+            elif op in (b"Td", b"TD") and len(operands) >= 2 and isinstance(operands[-1], float):
+                if operands[-1]:
+                    new_line()
+                elif line and isinstance(operands[-2], float) and operands[-2] > 0:
+                    line.append(" ")
+            elif op == b"Tm" and len(operands) >= 6 and isinstance(operands[-1], float):
+                if last_y is not None and operands[-1] != last_y:
+                    new_line()
+                elif line:
+                    line.append(" ")
+                last_y = operands[-1]
+            elif op in (b"T*", b"ET"):
+                new_line()
+            if array is None:
+                operands = []
+    new_line()
+    return lines
+
+
+def _pdf_paragraphs(lines):
+    """Joins the lines of a page into paragraphs: a line well short of the page's longest ends one."""
+    lines = [" ".join(line.split()) for line in lines]
+    lines = [line for line in lines if line]
+    if not lines:
+        return
+    width = max(len(line) for line in lines)
+    paragraph = ""
+    for line in lines:
+        if paragraph.endswith("-") and not paragraph.endswith(" -"):
+            paragraph = paragraph[:-1] + line
+        else:
+            paragraph = f"{paragraph} {line}" if paragraph else line
+        if len(line) < 0.75 * width:
+            yield paragraph
+            paragraph = ""
+    if paragraph:
+        yield paragraph
+
+
+def _pdf_content(dictionary, data):
+    """The decoded bytes of a stream if it is a page or form content stream, else None."""
+    if re.search(rb"/(Subtype\s*/Image|Type\s*/(XRef|ObjStm|Metadata|EmbeddedFile|XObject\s*/Subtype\s*/Image)"
+                 rb"|Length[123]\b|FontFile)", dictionary):
+        return None
+    filters = re.findall(rb"/(FlateDecode|Fl|DCTDecode|LZWDecode|ASCII85Decode|ASCIIHexDecode|JBIG2Decode|"
+                         rb"CCITTFaxDecode|JPXDecode|RunLengthDecode)\b",
+                         dictionary.split(b"/DecodeParms")[0])
+    if not filters:
+        return data
+    if [f for f in filters if f not in (b"FlateDecode", b"Fl")]:
+        return None
+    try:
+        return zlib.decompressobj().decompress(data)
+    except zlib.error:
+        return None
+
+
+def _pdf_blocks(chunks):
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        position = 0
+        while True:
+            match = _PDF_OBJECT.search(buffer, position)
+            if match is None:
+                break
+            end = buffer.find(b"endstream", match.end())
+            if end == -1:
+                break
+            content = _pdf_content(bytes(match.group(1)), bytes(buffer[match.end():end]))
+            if content is not None and b"BT" in content:
+                paragraphs = list(_pdf_paragraphs(_pdf_lines(content)))
+                for i, paragraph in enumerate(paragraphs):
+                    yield paragraph, i < PDF_EDGE_BLOCKS or i >= len(paragraphs) - PDF_EDGE_BLOCKS
+            position = end + len(b"endstream")
+        # Keep only what may hold the start of the next stream object
+        keep_from = position if _PDF_OBJECT.search(buffer, position) else max(position, len(buffer) - 4096)
+        del buffer[:keep_from]
+
+
+def _chunks(source, chunk_size):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+    else:
+        yield from iter(lambda: source.read(chunk_size), b"")
+
+
+def _clean_block(block):
+    block = " ".join(block.translate(INVISIBLE).split())
+    return unicodedata.normalize("NFC", block)
+
+
+def ingest_file(source, filename=None, chunk_size=CHUNK_SIZE):
+    """
+    Reads an HTML, PDF or text policy from `source` (a path or a binary file
+    object) and returns an IngestedPolicy with the cleaned text. The format
+    comes from `filename` (or the path) and the file's first bytes.
+    """
+    if filename is None and isinstance(source, (str, os.PathLike)):
+        filename = os.fspath(source)
+    counted = {'bytes': 0}
+
+    def read():
+        for chunk in _chunks(source, chunk_size):
+            counted['bytes'] += len(chunk)
+            yield chunk
+
+    chunks = read()
+    # Enough of the start to sniff the format and encoding
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= 4096:
+            break
+    fmt = detect_format(head, filename)
+
+    def all_chunks():
+        yield head
+        yield from chunks
+
+    with telemetry.span(f"ingest:{fmt}"):
+        if fmt == "html":
+            raw_blocks = _html_blocks(all_chunks(), head)
+        elif fmt == "pdf":
+            raw_blocks = _pdf_blocks(all_chunks())
+        else:
+            raw_blocks = _text_blocks(all_chunks(), head)
+
+        # (text, running header or footer key) per block; only page-edge blocks have a key
+        blocks = []
+        repeats = Counter()
+        dropped = 0
+        for block, edge in raw_blocks:
+            block = _clean_block(block)
+            if not block:
+                continue
+            if len(block) <= 40 and (UI_BLOCK.fullmatch(block) or PAGE_NUMBER.fullmatch(block)):
+                dropped += 1
+                continue
+            key = None
+            if edge and len(block) <= REPEATED_BLOCK_MAX_CHARS:
+                key = re.sub(r"\d+", "#", block.lower())
+                repeats[key] += 1
+            blocks.append((block, key))
+
+        parts, paragraphs = [], []
+        offset = 0
+        for block, key in blocks:
+            if key is not None and repeats[key] >= REPEATED_BLOCK_MIN_COUNT:
+                dropped += 1
+                continue
+            if parts:
+                offset += len(PARAGRAPH_SEPARATOR)
+            parts.append(block)
+            paragraphs.append((offset, offset + len(block)))
+            offset += len(block)
+
+    telemetry.inc("ingest_documents_total", format=fmt)
+    telemetry.inc("ingest_bytes_total", counted['bytes'], format=fmt)
+    return IngestedPolicy(PARAGRAPH_SEPARATOR.join(parts), paragraphs, fmt, counted['bytes'], dropped)
@@ -0,0 +1,109 @@
+import re
+from collections import namedtuple
+
+# A matched span of a pattern family entry. `text` is the matched slice of the
+# scanned text and `groups` holds the entry's own capture groups.
+Span = namedtuple("Span", ["name", "start", "end", "text", "groups"])
+
+
+class LineRule:
+    """
+    Linear-time equivalent of the regex `start.*?(end1|end2|...)`.
+
+    Matches from the first `start` literal that is followed by one of the `ends`
+    literals on the same line, without the backtracking the lazy `.*?` causes
+    on long text with no match.
+    """
+
+    def __init__(self, start, ends):
+        self.start = start
+        self.ends = tuple(ends)
+
+    def search(self, text):
+        """Returns (start, end, matched end literal) of the first match in `text`, or None."""
+        at = text.find(self.start)
+        while at != -1:
+            line_end = text.find("\n", at)
+            if line_end == -1:
+                line_end = len(text)
+            after = at + len(self.start)
+            found = [(i, word) for word in self.ends for i in (text.find(word, after, line_end),) if i != -1]
+            if found:
+                i, word = min(found)
+                return at, i + len(word), word
+            # Any later start on this line sees a subset of the same ends, so skip to the next line
+            at = text.find(self.start, line_end)
+        return None
+
+
+class ScanResult:
+    """
+    Facts looked up in one lowercased text. Each group or family is only
+    searched when first asked for, and the search stops at its first hit.
+    """
+
+    def __init__(self, text_lower, literals, patterns):
+        self.text = text_lower
+        self._literals = literals
+        self._patterns = patterns
+        self._groups = {}
+        self._firsts = {}
+
+    def has(self, *groups):
+        """True if any literal of any of the given groups occurs in the text."""
+        return any(self._has(group) for group in groups)
+
+    def _has(self, group):
+        found = self._groups.get(group)
+        if found is None:
+            found = self._groups[group] = any(word in self.text for word in self._literals.get(group, ()))
+        return found
+
+    def first(self, family):
+        """Returns the Span of the highest-priority entry of `family` that matched, or None."""
+        if family not in self._firsts:
+            self._firsts[family] = self._first(family)
+        return self._firsts[family]
+
+    def _first(self, family):
+        for name, spec in self._patterns.get(family, ()):
+            if isinstance(spec, LineRule):
+                found = spec.search(self.text)
+                if found is not None:
+                    start, end, word = found
+                    return Span(name, start, end, self.text[start:end], (word,))
+                continue
+            match = spec.search(self.text)
+            if match:
+                return Span(name, match.start(), match.end(), match.group(0), match.groups())
+        return None
+
+
+class PolicyMatcher:
+    """
+    Matching engine for keyword and pattern based fact extraction.
+
+    Keyword groups are looked up with `in` and patterns, compiled once, with
+    re.search, both lazily and stopping at the first hit: in CPython that beats
+    one regex pass over every keyword (a prefix-factored trie) on policies of
+    every size, since most groups are settled by an early occurrence. The lazy
+    `until.*?(delete|remove)` rule is a LineRule, linear on long lines. Results
+    are identical to running `keyword in text` and `re.search(pattern, text)`
+    for each entry separately.
+    """
+
+    def __init__(self, literals, patterns=None):
+        """
+        literals: dict mapping a group name to a list of lowercase keywords.
+        patterns: dict mapping a family name to an ordered list of
+                  (entry name, regex string or LineRule) in priority order.
+        """
+        self._literals = {group: tuple(words) for group, words in literals.items()}
+        self._patterns = {
+            family: [(name, spec if isinstance(spec, LineRule) else re.compile(spec)) for name, spec in entries]
+            for family, entries in (patterns or {}).items()
+        }
+
+    def scan(self, text_lower):
+        """Returns the ScanResult for lowercased text; lookups run as they are asked for."""
+        return ScanResult(text_lower, self._literals, self._patterns)
@@ -0,0 +1,401 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import cancellation
+import telemetry
+from cancellation import INTERACTIVE, CancelToken, DeadlineExceeded
+from database import (find_similar_analyses, index_signature, list_policy_versions, load_analysis, load_task_results,
+                      save_analysis)
+from document import PolicyDocument, as_document
+from fact_store import get_fact_matrix
+
+# Upper bound on model calls in flight for a single analysis
+DEFAULT_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "8"))
+
+# Estimated similarity at or above which an analyzed policy counts as a near
+# duplicate whose task results a new policy may reuse
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))
+
+# Seconds an analysis may take before it returns what has finished; 0 for no limit
+ANALYSIS_DEADLINE = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "60")) or None
+
+# Bump when models, prompts, payload construction or result assembly change.
+# Cached inference responses and stored analyses from other versions are ignored.
+PIPELINE_VERSION = "4"
+
+
+_local = threading.local()
+
+
+def run_tasks(tasks, max_workers=None, executor=None):
+    """
+    Runs independent (key, callable) tasks concurrently.
+
+    Returns a list of (key, result, error) in the same order as `tasks`, where
+    error is the exception raised by the task or None. Uses `executor` when
+    given; inside a task started by run_tasks, the executor that task runs
+    on, so nested calls share the analysis's threads instead of each
+    starting a pool; otherwise a pool of at most `max_workers` threads.
+    In a nested call, tasks no thread has picked up by the time they are all
+    submitted run on the calling thread, so it never waits for a full pool
+    it is itself holding a thread of. Spans recorded by the tasks join the
+    caller's trace, and the caller's CancelToken applies to them.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    shared = getattr(_local, "executor", None)
+    executor = executor or shared
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers or DEFAULT_MAX_WORKERS)) as pool:
+            return run_tasks(tasks, executor=pool)
+
+    calls = [_Call(key, cancellation.bind(telemetry.bind(fn)), executor) for key, fn in tasks]
+    inline = executor is shared
+    for call in calls:
+        try:
+            executor.submit(call.run)
+        except RuntimeError:
+            inline = True  # The executor is shutting down; the rest run here
+            break
+    if inline:
+        for call in calls:
+            call.run()
+    for call in calls:
+        call.done.wait()
+    return [(call.key, call.result, call.error) for call in calls]
+
+
+class _Call:
+    """One task of run_tasks, run by whichever thread claims it first."""
+
+    __slots__ = ("key", "fn", "executor", "result", "error", "done", "_claim")
+
+    def __init__(self, key, fn, executor):
+        self.key = key
+        self.fn = fn
+        self.executor = executor
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self._claim = threading.Lock()
+
+    def run(self):
+        if not self._claim.acquire(blocking=False):
+            return
+        try:
+            self.result = _sharing(self.executor, self.fn)()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+def _sharing(executor, fn):
+    """Wraps `fn` so run_tasks calls made inside it run on `executor`."""
+    def run():
+        previous = getattr(_local, "executor", None)
+        _local.executor = executor
+        try:
+            return fn()
+        finally:
+            _local.executor = previous
+    return run
+
+
+def task_fingerprint(fn):
+    """
+    Identifies what a task computes: a hash of the function and the arguments
+    of a functools.partial. Returns None for anything else and for tasks over
+    a whole PolicyDocument, whose results can only be reused for the same
+    content, which the stored analysis already covers.
+    """
+    if not isinstance(fn, partial):
+        return None
+    if any(isinstance(arg, PolicyDocument) for arg in list(fn.args) + list(fn.keywords.values())):
+        return None
+    try:
+        identity = json.dumps(
+            [getattr(fn.func, "__qualname__", repr(fn.func)), fn.args, fn.keywords],
+            sort_keys=True, ensure_ascii=False
+        )
+    except TypeError:
+        return None
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def _reusable(result):
+    return result is not None and not (isinstance(result, str) and result.startswith("Error"))
+
+
+def is_complete(analysis):
+    """
+    Whether every task of the analysis finished and every fact was answered as
+    intended: nothing timed out or failed and no 'fact_status' is a fallback.
+    """
+    if analysis.get('timed_out') or analysis.get('failed'):
+        return False
+    # extractor's COMPLETE; the extractor imports this module, so not imported from there
+    return all(status == "complete" for status in analysis['extracted_facts'].get('fact_status', {}).values())
+
+
+# One step of a streamed analysis. kind is 'keywords' (local facts, before any
+# model call), 'summary' or 'facts' (the task `key` finished) or 'done'.
+# `analysis` is everything known so far, with 'pending' naming unfinished tasks.
+AnalysisEvent = namedtuple("AnalysisEvent", ["kind", "key", "analysis", "elapsed"])
+
+_Plan = namedtuple("_Plan", ["summary_order", "fingerprints", "reused", "tasks", "similar_to"])
+
+
+class AnalysisPipeline:
+    """
+    Runs the summarizer's and extractor's model calls for one policy at the
+    same time, so an analysis takes about as long as its slowest call.
+    `priority` places its model calls in the inference gateway's queue
+    (cancellation.INTERACTIVE or BULK). New policies at least
+    `similarity_threshold` similar to an analyzed one reuse its task
+    results; None turns the lookup off.
+
+    An analysis still running `deadline` seconds after it started stops
+    there: every model call is cut off at the deadline, and the analysis
+    holds whatever finished plus the keyword fallbacks, with the unfinished
+    tasks listed in 'timed_out' and each fact's status in the extracted
+    facts' 'fact_status'. None means no deadline.
+
+    Tasks that raised or returned an error are listed in 'failed'. An
+    analysis that is not complete (see is_complete) is stored only for its
+    successful task results: it is never loaded back as a whole, and the
+    next analysis of the same content reuses those results and retries the
+    rest.
+    """
+
+    def __init__(self, summarizer, extractor, max_workers=None, priority=INTERACTIVE,
+                 similarity_threshold=SIMILARITY_THRESHOLD, deadline=ANALYSIS_DEADLINE):
+        self.summarizer = summarizer
+        self.extractor = extractor
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.priority = priority
+        self.similarity_threshold = similarity_threshold
+        self.deadline = deadline
+
+    def analyze(self, policy_text, website_name=None):
+        """
+        Returns the stored analysis for this exact policy content when there is
+        one for the current pipeline version, otherwise runs and stores it.
+        The result carries 'from_store' to tell the two apart.
+
+        With a website_name, tasks whose inputs are unchanged since an earlier
+        saved version of that website's policy reuse that version's results
+        instead of calling the models; 'reused_tasks' counts them. So do tasks
+        unchanged since the most similar analyzed policy, named in 'similar_to'.
+        """
+        with telemetry.trace("analysis"):
+            for event in self.stream(policy_text, website_name):
+                pass
+            return event.analysis
+
+    def stream(self, policy_text, website_name=None, cancel=None):
+        """
+        Like analyze, but yields an AnalysisEvent as each result comes in:
+        keyword facts first, then every summary section and fact task as it
+        finishes, then the complete stored analysis.
+
+        Cancelling `cancel` (a CancelToken), or closing the generator, drops
+        the queued tasks and stops in-flight ones before their next model
+        call; the generator then raises cancellation.Cancelled. When the
+        deadline (the token's own, or the pipeline's from now) passes, the
+        'done' event comes right away with the partial analysis.
+        """
+        started = time.perf_counter()
+        cancel = cancel or CancelToken(self.priority)
+        if cancel.deadline is None and self.deadline is not None:
+            cancel.set_timeout(self.deadline)
+        document = as_document(policy_text)
+        stored = load_analysis(document.content_hash, PIPELINE_VERSION)
+        if stored is not None:
+            print("✅ Loaded stored analysis")
+            if website_name:
+                get_fact_matrix().record(document.content_hash, website_name, stored['extracted_facts'])
+            stored['from_store'] = True
+            yield AnalysisEvent('done', None, stored, time.perf_counter() - started)
+            return
+
+        print("\n=== Starting Streamed Analysis ===")
+        # What finished in an earlier, incomplete analysis of this content
+        reuse = load_task_results(document.content_hash, PIPELINE_VERSION)
+        if website_name:
+            for fingerprint, result in self.previous_results(website_name, document.content_hash).items():
+                reuse.setdefault(fingerprint, result)
+        similar_to = self.nearest_analysis(document)
+        if similar_to is not None:
+            for fingerprint, result in load_task_results(similar_to['content_hash'], PIPELINE_VERSION).items():
+                reuse.setdefault(fingerprint, result)
+        plan = self._plan(document, reuse, similar_to)
+        results = list(plan.reused)
+        pending_keys = [key for key, _ in plan.tasks]
+        yield AnalysisEvent('keywords', None, self._assemble(document, plan, results, pending_keys),
+                            time.perf_counter() - started)
+        telemetry.observe("time_to_first_result_seconds", time.perf_counter() - started)
+
+        # Every model call of the analysis, nested ones included, runs on these threads
+        pool = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        futures = {pool.submit(_sharing(pool, cancellation.bind(telemetry.bind(fn), cancel))): key
+                   for key, fn in plan.tasks}
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel.expired:
+                    break
+                cancel.raise_if_cancelled()
+                remaining = cancel.remaining()
+                done, pending = wait(pending, timeout=0.1 if remaining is None else min(0.1, remaining),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = futures[future]
+                    try:
+                        results.append((key, future.result(), None))
+                    except Exception as e:
+                        results.append((key, None, e))
+                    pending_keys.remove(key)
+                    yield AnalysisEvent(key[0], key[1], self._assemble(document, plan, results, pending_keys),
+                                        time.perf_counter() - started)
+        finally:
+            if pending and not cancel.expired:
+                cancel.cancel()
+                print("⏹️ Analysis cancelled")
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        # Past the deadline: in-flight calls time out on their own, nothing waits for them
+        results += [(futures[future], None, DeadlineExceeded()) for future in pending]
+        analysis = self._assemble(document, plan, results)
+        analysis['from_store'] = False
+        if analysis.get('timed_out'):
+            print(f"⏱️ Deadline reached after {time.perf_counter() - started:.1f}s, "
+                  f"returning partial results ({len(analysis['timed_out'])} tasks unfinished)")
+            telemetry.inc("analysis_deadline_exceeded_total")
+        complete = is_complete(analysis)
+        # An incomplete analysis only keeps its successful task results for the next attempt
+        save_analysis(document.content_hash, PIPELINE_VERSION, analysis, complete=complete)
+        index_signature(document.content_hash, document.minhash())
+        if complete:
+            get_fact_matrix().record(document.content_hash, website_name, analysis['extracted_facts'])
+        else:
+            print("⚠️ Analysis incomplete, keeping only its successful task results")
+            telemetry.inc("analysis_incomplete_total")
+        yield AnalysisEvent('done', None, analysis, time.perf_counter() - started)
+
+    def previous_results(self, website_name, content_hash, max_versions=5):
+        """Task results of the newest earlier versions of the website's policy that were analyzed."""
+        reuse = {}
+        for version in list_policy_versions(website_name)[:max_versions + 1]:
+            if version['content_hash'] != content_hash:
+                for fingerprint, result in load_task_results(version['content_hash'], PIPELINE_VERSION).items():
+                    reuse.setdefault(fingerprint, result)
+        return reuse
+
+    def nearest_analysis(self, document):
+        """
+        {'content_hash', 'similarity'} of the analyzed policy most similar to
+        `document`, if one reaches the similarity threshold, else None.
+        """
+        if self.similarity_threshold is None:
+            return None
+        with telemetry.span("similarity"):
+            matches = find_similar_analyses(document.minhash(), PIPELINE_VERSION, self.similarity_threshold,
+                                            exclude=document.content_hash)
+        if not matches:
+            return None
+        print(f"🧬 Found a near-duplicate analysis ({matches[0][1]:.0%} similar)")
+        telemetry.inc("near_duplicate_matches_total")
+        return {'content_hash': matches[0][0], 'similarity': matches[0][1]}
+
+    def run(self, policy_text, reuse=None):
+        """
+        Returns {'summary': ..., 'extracted_facts': ...} for the policy, plus
+        'task_results' (reusable results by task fingerprint) and
+        'reused_tasks'. Tasks whose fingerprint is in `reuse` are not run.
+        The calling thread's CancelToken, if any, sets the deadline; otherwise
+        the pipeline's applies.
+        """
+        print("\n=== Starting Concurrent Analysis ===")
+        with telemetry.trace("run"):
+            with telemetry.span("document"):
+                document = as_document(policy_text)
+            plan = self._plan(document, reuse or {})
+            token = cancellation.current_token() or CancelToken(self.priority, self.deadline)
+            results = list(plan.reused) + cancellation.bind(run_tasks, token)(plan.tasks, self.max_workers)
+            return self._assemble(document, plan, results)
+
+    def _plan(self, document, reuse, similar_to=None):
+        """Builds the analysis tasks, setting aside those with a reusable result."""
+        with telemetry.span("plan"):
+            summary_tasks = self.summarizer.summary_tasks(document)
+            fact_tasks = self.extractor.fact_tasks(document)
+
+        fingerprints = {}
+        reused = []
+        tasks = []
+        for stage, stage_tasks in (("summary", summary_tasks), ("facts", fact_tasks)):
+            for key, fn in stage_tasks:
+                fingerprint = task_fingerprint(fn)
+                fingerprints[(stage, key)] = fingerprint
+                if fingerprint in reuse:
+                    reused.append(((stage, key), reuse[fingerprint], None))
+                else:
+                    tasks.append(((stage, key), _staged(f"{stage}:{key}", fn)))
+        if reused:
+            print(f"♻️ Reusing {len(reused)} task results from earlier analyses")
+            telemetry.inc("analysis_tasks_reused_total", len(reused))
+        return _Plan([key for key, _ in summary_tasks], fingerprints, reused, tasks, similar_to)
+
+    def _assemble(self, document, plan, results, pending=None):
+        """Builds the analysis from the ((stage, key), result, error) outcomes so far."""
+        summary_results = [(key, result, error) for (stage, key), result, error in results if stage == "summary"]
+        fact_results = [(key, result, error) for (stage, key), result, error in results if stage == "facts"]
+        # Assemble in planning order, whichever tasks finished or were reused first
+        order = {key: i for i, key in enumerate(plan.summary_order)}
+        summary_results.sort(key=lambda outcome: order[outcome[0]])
+        with telemetry.span("assemble"):
+            analysis = {
+                'summary': self.summarizer.assemble_summary(summary_results) if summary_results else "",
+                'extracted_facts': self.extractor.assemble_facts(
+                    document, fact_results, [key for stage, key in pending or () if stage == "facts"]),
+                'task_results': {
+                    plan.fingerprints[task_key]: result for task_key, result, error in results
+                    if error is None and plan.fingerprints[task_key] and _reusable(result)
+                },
+                'reused_tasks': len(plan.reused),
+            }
+        if plan.similar_to is not None:
+            analysis['similar_to'] = plan.similar_to
+        failed = [key for (_, key), result, error in results
+                  if (error is not None and not isinstance(error, DeadlineExceeded)) or
+                  (error is None and not _reusable(result))]
+        if failed:
+            analysis['failed'] = failed
+        timed_out = [(stage, key) for (stage, key), _, error in results if isinstance(error, DeadlineExceeded)]
+        if timed_out:
+            analysis['timed_out'] = [key for _, key in timed_out]
+            if pending is None and analysis['summary'].startswith("Error") and \
+                    any(stage == "summary" for stage, _ in timed_out):
+                analysis['summary'] = "⏱️ The summary was not ready within the analysis time limit."
+        if pending is not None:
+            analysis['pending'] = [key for _, key in pending]
+            if any(stage == "summary" for stage, _ in pending) and analysis['summary'].startswith("Error"):
+                # Not a failure yet, just nothing to show
+                analysis['summary'] = ""
+        return analysis
+
+
+def _staged(name, fn):
+    """Wraps a task so its run is recorded as a span named `name`."""
+    def run():
+        with telemetry.span(name):
+            return fn()
+    return run
@@ -0,0 +1,75 @@
+import math
+import re
+from collections import Counter
+
+from chunking import split_sentences
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+class PassageIndex:
+    """
+    In-process BM25 index over overlapping sentence windows of one document.
+
+    Each passage is `window` consecutive sentences, starting every `stride`
+    sentences, so an answer that straddles two sentences still lands whole in
+    some passage.
+    """
+
+    def __init__(self, text, window=3, stride=2, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        sentences = [s for line in text.split("\n") for s in split_sentences(line)]
+        # (start, end) offsets of every sentence in `text`; sentences are stripped substrings, in order
+        offsets = []
+        cursor = 0
+        for sentence in sentences:
+            at = text.find(sentence, cursor)
+            offsets.append((at, at + len(sentence)))
+            cursor = at + len(sentence)
+        self.passages = []
+        self.spans = []
+        for start in range(0, max(1, len(sentences) - window + stride), stride):
+            passage = " ".join(sentences[start:start + window])
+            if passage:
+                self.passages.append(passage)
+                self.spans.append((offsets[start][0], offsets[min(start + window, len(sentences)) - 1][1]))
+
+        self._term_counts = [Counter(tokenize(p)) for p in self.passages]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        n = len(self.passages)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def score(self, query_terms):
+        """Returns the BM25 score of every passage for the query terms."""
+        scores = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            total = 0.0
+            for term in query_terms:
+                tf = counts.get(term)
+                if tf:
+                    total += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(total)
+        return scores
+
+    def ranked(self, query):
+        """Indices of the passages matching `query` (a string or term list) at all, most relevant first."""
+        terms = tokenize(query) if isinstance(query, str) else query
+        scores = self.score(terms)
+        return [i for i in sorted(range(len(self.passages)), key=lambda i: (-scores[i], i)) if scores[i] > 0]
+
+    def top_k(self, query, k=3):
+        """Returns up to k passages most relevant to `query` (a string or term list), best first."""
+        return [self.passages[i] for i in self.ranked(query)[:k]]
@@ -0,0 +1,83 @@
+"""
+Bundled sample policies and their precomputed analyses.
+
+Streamlit reruns app.py on every interaction, so the sample listing and texts
+are read once per process and memoized by modification time: a rerun only
+stats the files, and edited or added samples are still picked up.
+
+Analyses of the samples can be precomputed with the bulk CLI and shipped as
+data/sample_analyses.jsonl:
+
+    python cli.py data/companies --no-store --output data/sample_analyses.jsonl
+
+load_precomputed_analyses stores them at startup, so analyzing a sample is
+answered from the database without calling the models.
+"""
+import json
+import os
+import threading
+
+from database import load_analysis, save_analysis
+from fact_store import get_fact_matrix
+from pipeline import PIPELINE_VERSION
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data")
+SAMPLE_DIR = os.path.join(DATA_DIR, "companies")
+PRECOMPUTED_ANALYSES = os.path.join(DATA_DIR, "sample_analyses.jsonl")
+
+_listings = {}
+_texts = {}
+_lock = threading.Lock()
+
+
+def available_samples(directory=SAMPLE_DIR):
+    """Returns {display name: path} of the .txt samples in `directory`."""
+    mtime = os.stat(directory).st_mtime_ns
+    cached = _listings.get(directory)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    samples = {
+        os.path.splitext(fname)[0].capitalize(): os.path.join(directory, fname)
+        for fname in sorted(os.listdir(directory)) if fname.endswith('.txt')
+    }
+    with _lock:
+        _listings[directory] = (mtime, samples)
+    return samples
+
+
+def sample_text(path):
+    """Returns the text of a sample file, read again only when the file changed."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _texts.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    with _lock:
+        _texts[path] = (mtime, text)
+    return text
+
+
+def load_precomputed_analyses(path=PRECOMPUTED_ANALYSES):
+    """
+    Stores the analyses in a cli.py output file that are for the current
+    pipeline version, complete and not stored yet. Returns the number stored.
+    """
+    if not os.path.exists(path):
+        return 0
+    stored = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('pipeline_version') != PIPELINE_VERSION or 'error' in record or \
+                    not record.get('complete', 'timed_out' not in record):
+                continue
+            if load_analysis(record['content_hash'], PIPELINE_VERSION) is None:
+                save_analysis(record['content_hash'], PIPELINE_VERSION, record)
+                get_fact_matrix().record(record['content_hash'], record.get('id'), record['extracted_facts'])
+                stored += 1
+    if stored:
+        print(f"✅ Loaded {stored} precomputed sample analyses")
+    return stored
@@ -0,0 +1,77 @@
+"""
+MinHash signatures and LSH band keys for near-duplicate policy detection.
+
+A policy's signature is a one-permutation MinHash over its word 5-shingles:
+every shingle is hashed once, the low bits pick one of SIGNATURE_BINS bins
+and each bin keeps its smallest hash. The share of bins two signatures agree
+on estimates the Jaccard similarity of their shingle sets. Empty bins (only
+in very short texts) borrow the next filled bin's value, offset by the
+distance, so signatures stay comparable.
+
+For lookups the signature is cut into LSH_BANDS bands of LSH_ROWS bins, each
+hashed to one band key; policies sharing any band key are candidates. With
+16 bands of 4 rows, a pair with similarity 0.8 shares a key with
+probability 0.9998, a pair at 0.3 with probability 0.12.
+"""
+import hashlib
+import re
+from array import array
+
+SHINGLE_WORDS = 5
+SIGNATURE_BINS = 64
+LSH_BANDS = 16
+LSH_ROWS = SIGNATURE_BINS // LSH_BANDS
+
+_EMPTY = 1 << 64
+_WORD = re.compile(r"\w+")
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def minhash(text):
+    """MinHash signature of `text` (lowercased, word shingles) as an array of SIGNATURE_BINS uint64."""
+    words = _WORD.findall(text.lower())
+    mins = [_EMPTY] * SIGNATURE_BINS
+    mask = SIGNATURE_BINS - 1
+    for i in range(max(1, len(words) - SHINGLE_WORDS + 1)):
+        h = _hash64(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        b = h & mask
+        value = h >> 32
+        if value < mins[b]:
+            mins[b] = value
+    if all(value == _EMPTY for value in mins):
+        return array("Q", [0] * SIGNATURE_BINS)
+    signature = array("Q")
+    for b in range(SIGNATURE_BINS):
+        distance = 0
+        while mins[(b + distance) % SIGNATURE_BINS] == _EMPTY:
+            distance += 1
+        signature.append(mins[(b + distance) % SIGNATURE_BINS] + (distance << 32))
+    return signature
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_BINS
+
+
+def band_keys(signature):
+    """One signed 64-bit key per LSH band (SQLite INTEGER), distinct across bands."""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        key = _hash64(bytes([band]) + rows.tobytes())
+        keys.append(key - (1 << 64) if key >= 1 << 63 else key)
+    return keys
+
+
+def to_bytes(signature):
+    return signature.tobytes()
+
+
+def from_bytes(data):
+    signature = array("Q")
+    signature.frombytes(data)
+    return signature
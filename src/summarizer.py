@@ -1,8 +1,24 @@
-import os 
-from dotenv import load_dotenv
-import requests
+from functools import partial
+import telemetry
+from cancellation import DeadlineExceeded
+from chunking import CHUNK_CHARS, split_into_chunks
+from document import SENTENCE_SEPARATOR, as_document
+from inference_gateway import get_inference_gateway
+from pipeline import run_tasks
 
-load_dotenv()
+# Keywords that pull sentences into each section summary, in display order
+SECTION_KEYWORDS = {
+    "Data Collection": ["collect", "collection", "data we collect", "information we collect"],
+    "Data Usage": ["use", "usage", "how we use", "purpose"],
+    "Data Sharing": ["share", "sharing", "third party", "third-party"],
+    "User Rights": ["rights", "access", "delete", "portability", "control"],
+    "Data Security": ["security", "protect", "safeguard", "encrypt"]
+}
+
+OVERALL_SUMMARY = "Overall Summary"
+
+# Stop reducing after this many levels and summarize whatever is left
+MAX_REDUCE_LEVELS = 4
 
 class Policy_Summarizer:
     """
@@ -11,27 +27,17 @@ class Policy_Summarizer:
     """
     
     def __init__(self):
-        self.api_url = "https://api-inference.huggingface.co/models"
-        self.headers = {"Authorization": f"Bearer {os.getenv('ACCESS_TOKEN')}"}
+        self.client = get_inference_gateway()
+        self.chunk_chars = CHUNK_CHARS
 
     def _query_api(self, model, payload):
-        """Generic method to query Hugging Face API"""
-        try:
-            response = requests.post(
-                f"{self.api_url}/{model}",
-                headers=self.headers,
-                json=payload
-            )
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"API Error: {str(e)}")
-            return None
+        """Generic method to query Hugging Face API through the shared inference gateway"""
+        return self.client.query(model, payload)
 
     def summarize_with_api(self, text, max_length=150, min_length=50):
-        """Summarize text using Hugging Face API"""
+        """Summarize text using Hugging Face API in a single call (input is cut to one chunk)"""
         payload = {
-            "inputs": text[:1000],
+            "inputs": text[:self.chunk_chars],
             "parameters": {
                 "max_length": max_length,
                 "min_length": min_length,
@@ -45,50 +51,83 @@ class Policy_Summarizer:
             return result[0].get('summary_text', 'Unable to generate summary')
         return "Error: Unable to generate summary"
 
+    def summarize_text(self, text, max_length=150, min_length=50):
+        """
+        Summarize text of any length with a map-reduce over chunks.
+
+        Text that fits one chunk is summarized directly. Longer text is split
+        on paragraph and sentence boundaries, the chunks are summarized
+        concurrently, and the joined chunk summaries are reduced the same way
+        until they fit a single final call. Chunk boundaries are
+        content-defined, so after an edit the unchanged chunks produce the
+        same requests and are answered from the inference cache.
+        """
+        for level in range(MAX_REDUCE_LEVELS):
+            if len(text) <= self.chunk_chars:
+                break
+            chunks = split_into_chunks(text, self.chunk_chars)
+            print(f"Summarizing {len(chunks)} chunks (level {level + 1})")
+            tasks = [
+                (i, partial(self.summarize_with_api, chunk, max_length=min(max_length, 100), min_length=min(min_length, 30)))
+                for i, chunk in enumerate(chunks)
+            ]
+            outcomes = run_tasks(tasks)
+            for _, _, error in outcomes:
+                if isinstance(error, DeadlineExceeded):
+                    raise error
+            partials = [
+                summary for _, summary, error in outcomes
+                if error is None and summary and not summary.startswith("Error")
+            ]
+            if not partials:
+                return "Error: Unable to generate summary"
+            reduced = "\n".join(partials)
+            if len(reduced) >= len(text):
+                # Summaries are not shrinking the text; let the final call truncate
+                break
+            text = reduced
+        return self.summarize_with_api(text, max_length=max_length, min_length=min_length)
+
     def summarize_policy(self, policy_text):
         """Generate a comprehensive summary of the privacy policy focusing on user-relevant information."""
+        with telemetry.trace("summarize_policy"):
+            return self.assemble_summary(run_tasks(self.summary_tasks(policy_text)))
+
+    def summary_tasks(self, policy_text):
+        """Returns the independent (name, callable) summarization calls for a policy, sections first."""
+        document = as_document(policy_text)
+        policy_text = document.text
         print("Starting summarization process...")
         print(f"Input text length: {len(policy_text)} characters")
-        
+
+        tasks = []
+        for section_name, keywords in SECTION_KEYWORDS.items():
+            with telemetry.span("section_extraction"):
+                section_text = self._extract_section(document, keywords)
+            if section_text:
+                tasks.append((section_name, partial(self.summarize_text, section_text, max_length=100, min_length=30)))
+        tasks.append((OVERALL_SUMMARY, partial(self.summarize_text, policy_text, max_length=150, min_length=50)))
+        return tasks
+
+    def assemble_summary(self, results):
+        """Builds the markdown summary from the (name, result, error) outcomes of summary_tasks."""
         try:
-            # Generate section-specific summaries
-            sections = {
-                "Data Collection": self._extract_section(policy_text, ["collect", "collection", "data we collect", "information we collect"]),
-                "Data Usage": self._extract_section(policy_text, ["use", "usage", "how we use", "purpose"]),
-                "Data Sharing": self._extract_section(policy_text, ["share", "sharing", "third party", "third-party"]),
-                "User Rights": self._extract_section(policy_text, ["rights", "access", "delete", "portability", "control"]),
-                "Data Security": self._extract_section(policy_text, ["security", "protect", "safeguard", "encrypt"])
-            }
-            
             summaries = []
-            for section_name, section_text in sections.items():
-                if section_text:
-                    try:
-                        summary = self.summarize_with_api(
-                            section_text,
-                            max_length=100,
-                            min_length=30
-                        )
-                        if summary and not summary.startswith("Error"):
-                            summaries.append(f"### {section_name}\n{summary}")
-                    except Exception as e:
-                        print(f"Error summarizing {section_name}: {e}")
-                        continue
+            overall_summary = None
+            for section_name, summary, error in results:
+                if error is not None:
+                    print(f"Error summarizing {section_name}: {error}")
+                    continue
+                if section_name == OVERALL_SUMMARY:
+                    overall_summary = summary
+                elif summary and not summary.startswith("Error"):
+                    summaries.append(f"### {section_name}\n{summary}")
             
             if not summaries:
                 return "Error: No summary could be generated. Try with a shorter or different text."
             
-            # Generate overall summary
-            try:
-                overall_summary = self.summarize_with_api(
-                    policy_text,
-                    max_length=150,
-                    min_length=50
-                )
-                if overall_summary and not overall_summary.startswith("Error"):
-                    summaries.insert(0, f"### Overall Summary\n{overall_summary}")
-            except Exception as e:
-                print(f"Error generating overall summary: {e}")
+            if overall_summary and not overall_summary.startswith("Error"):
+                summaries.insert(0, f"### {OVERALL_SUMMARY}\n{overall_summary}")
             
             return "\n\n".join(summaries)
 
@@ -96,15 +135,9 @@ class Policy_Summarizer:
             return f"Error generating summary: {str(e)}"
     
     def _extract_section(self, text, keywords):
-        """Extract relevant section of text based on keywords."""
-        sentences = text.split('. ')
-        section_sentences = []
-        
-        for sentence in sentences:
-            if any(keyword.lower() in sentence.lower() for keyword in keywords):
-                section_sentences.append(sentence)
-        
-        return '. '.join(section_sentences) if section_sentences else ""
+        """Extract relevant section of text based on keywords, using the document's keyword index."""
+        section_sentences = as_document(text).sentences_with(keywords)
+        return SENTENCE_SEPARATOR.join(section_sentences) if section_sentences else ""
     
     def _format_as_bullets(self, text):
         """Format text as bullet points."""
@@ -0,0 +1,306 @@
+"""
+Lightweight tracing and metrics.
+
+Spans time pipeline stages, model calls and database operations; counters
+track API calls, retries, payload bytes, cache hits and DB operations. Spans
+opened inside `trace(...)` are also collected into that trace, including
+spans from worker threads started through `pipeline.run_tasks`, so the app
+can show where one analysis spent its time.
+
+Metrics export as Prometheus text (`export_prometheus`) or JSON
+(`export_json`). Set TELEMETRY=off to turn everything into no-ops.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Upper bounds (seconds) of latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+_enabled = os.getenv("TELEMETRY", "on").lower() not in ("off", "0", "false")
+_local = threading.local()
+
+
+class LatencyHistogram:
+    """Latency histogram with fixed bucket bounds; counts are per bucket, not cumulative."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'buckets': {("+Inf" if b == float("inf") else b): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms keyed by name and label set."""
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """Returns {'counters': [...], 'histograms': [...]} with one entry per name and label set."""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                'histograms': [
+                    dict({'name': name, 'labels': dict(labels)}, **histogram.snapshot())
+                    for (name, labels), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for counter in snapshot['counters']:
+            if counter['name'] not in typed:
+                typed.add(counter['name'])
+                lines.append(f"# TYPE {counter['name']} counter")
+            lines.append(f"{counter['name']}{_labels(counter['labels'])} {counter['value']}")
+        for histogram in snapshot['histograms']:
+            name = histogram['name']
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in histogram['buckets'].items():
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(histogram['labels'], le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(histogram['labels'])} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_labels(histogram['labels'])} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class Trace:
+    """Spans recorded while one analysis ran, with offsets relative to its start."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration, attrs):
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'start_ms': round((start - self.started) * 1000, 2),
+                'duration_ms': round(duration * 1000, 2),
+                'attrs': attrs,
+            })
+
+    def breakdown(self):
+        """Total time, call count and share of the trace per span name, slowest first."""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                total, calls = totals.get(span['name'], (0.0, 0))
+                totals[span['name']] = (total + span['duration_ms'], calls + 1)
+        trace_ms = (self.duration or 0) * 1000
+        return [
+            {'stage': name, 'total_ms': round(total, 1), 'calls': calls,
+             'share': round(total / trace_ms, 3) if trace_ms else 0.0}
+            for name, (total, calls) in sorted(totals.items(), key=lambda item: -item[1][0])
+        ]
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span['start_ms'])
+        return {
+            'name': self.name,
+            'duration_ms': round((self.duration or 0) * 1000, 1),
+            'spans': spans,
+            'breakdown': self.breakdown(),
+        }
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        metrics.observe("span_duration_seconds", duration, span=self.name)
+        if exc_type is not None:
+            metrics.inc("span_errors_total", span=self.name)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.add(self.name, self.start, duration, self.attrs)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+metrics = Metrics()
+_last_trace = None
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    """Turns recording on or off for the whole process."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def span(name, **attrs):
+    """Context manager timing a block as a span named `name`."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def inc(name, value=1, **labels):
+    if _enabled:
+        metrics.inc(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    if _enabled:
+        metrics.observe(name, seconds, **labels)
+
+
+def timed(name):
+    """Decorator recording every call of the function as a span."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class trace:
+    """
+    Context manager collecting the spans of one unit of work.
+
+    Inside an already active trace it is just a span of that trace, so
+    summarize_policy called on its own gets a trace while the same call made
+    by the pipeline is a stage of the pipeline's trace.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.trace = None
+        self._span = None
+
+    def __enter__(self):
+        if not _enabled:
+            return None
+        current = getattr(_local, "trace", None)
+        if current is not None:
+            self._span = _Span(self.name, {}).__enter__()
+            return current
+        self.trace = Trace(self.name)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        global _last_trace
+        if self._span is not None:
+            return self._span.__exit__(exc_type, exc, tb)
+        if self.trace is not None:
+            _local.trace = None
+            self.trace.duration = time.perf_counter() - self.trace.started
+            metrics.observe("trace_duration_seconds", self.trace.duration, trace=self.name)
+            _last_trace = self.trace
+        return False
+
+
+def bind(fn):
+    """Wraps `fn` so it records into the calling thread's trace when run on another thread."""
+    current = getattr(_local, "trace", None)
+    if current is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "trace", None)
+        _local.trace = current
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.trace = previous
+    return wrapper
+
+
+def last_trace():
+    """Returns the most recently finished top-level Trace, or None."""
+    return _last_trace
+
+
+def export_json():
+    return metrics.snapshot()
+
+
+def export_prometheus():
+    return metrics.to_prometheus()